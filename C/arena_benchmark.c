@@ -0,0 +1,83 @@
+/*
+Compares the arena allocator in throbac.c against the previous
+malloc-per-concatenation runtime, on the shape of code the translator
+generates for a loop that calls a NUMERUS function building strings with
+IUNGO and substring, and returning a length.
+
+Build and run from the repository root with
+
+    gcc -O2 -I C -o arena_benchmark C/arena_benchmark.c C/throbac.c
+    ./arena_benchmark
+
+Version: 2026-10-19
+*/
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <time.h>
+
+#include "throbac.h"
+
+#define ITERATIONS 2000000
+
+static size_t malloc_bytes = 0;
+
+// The runtime's concatenation before the arena: one malloc per call, never freed
+static char *malloc_cat(char *first, char *second) {
+    size_t length = strlen(first) + strlen(second) + 1;
+    char *value = malloc(length);
+    if (value == 0) {
+        abort();
+    }
+    malloc_bytes += length;
+    strcpy(value, first);
+    return strcat(value, second);
+}
+
+static char *malloc_substring(char *str, int start, int length) {
+    char *value = malloc(length + 1);
+    if (value == 0) {
+        abort();
+    }
+    malloc_bytes += length + 1;
+    memcpy(value, str + start, length);
+    value[length] = '\0';
+    return value;
+}
+
+static int label_malloc(int count) {
+    char *line = malloc_cat(malloc_cat("ITEM.", "NUMBER."), "\n");
+    return stringlength(malloc_cat(malloc_substring(line, 0, 5), "DONE")) + count % 2;
+}
+
+// What the translator now emits for the same function
+static int label_arena(int count) {
+    char *__throbac_mark = __throbac_arena_mark();
+    char *line = __throbac_cat(__throbac_cat("ITEM.", "NUMBER."), "\n");
+    return __throbac_arena_return(__throbac_mark,
+                                  stringlength(__throbac_cat(substring(line, 0, 5), "DONE")) + count % 2);
+}
+
+static double seconds_since(clock_t start) {
+    return (double) (clock() - start) / CLOCKS_PER_SEC;
+}
+
+int main() {
+    long total = 0;
+
+    clock_t start = clock();
+    for (int i = 0; i < ITERATIONS; i++) {
+        total += label_malloc(i);
+    }
+    printf("malloc per cat: %.3f s, %zu bytes never freed\n", seconds_since(start), malloc_bytes);
+
+    start = clock();
+    for (int i = 0; i < ITERATIONS; i++) {
+        total += label_arena(i);
+    }
+    printf("arena:          %.3f s, released on every return\n", seconds_since(start));
+
+    // keeps the loops from being optimized away
+    return total == 0;
+}
@@ -3,27 +3,217 @@ C implementations of the Throbac string concatenation function
 `__throbac_cat` (provided for you) and the two Throbac built-in
 functions `stringlength` and `substring`
 
+Every string these return is allocated from an arena: a list of large
+chunks handed out by bumping a pointer. Generated code takes a mark when
+entering a function that cannot return a string, and releases back to it
+when the function returns, so strings built inside such a function are
+reclaimed. Everything is freed at program exit.
+
+The __throbac_string functions at the end are the same operations on
+length-prefixed strings, which the translator can target instead of char*
+so that no operation needs to scan for the terminating NUL.
+
 Author: OCdt Aaron Brown and OCdt Liethan Velasco
 
 Version: 2022-01-23
 */
 
+#include <stdarg.h>
+#include <stdio.h>
 #include <stdlib.h>
 #include <string.h>
 
 #include "throbac.h"
 
+#define ARENA_CHUNK_SIZE (64 * 1024)
+
+// Allocations are rounded up to this, so that string headers are aligned
+#define ARENA_ALIGNMENT sizeof(void *)
+
+struct arena_chunk {
+    struct arena_chunk *previous;
+    char *end;
+    char data[];
+};
+
+// The newest chunk, the next free byte in it, and one released chunk kept
+// for reuse so that a loop crossing a chunk boundary doesn't malloc and free
+// on every iteration.
+static struct arena_chunk *arena = NULL;
+static char *arena_top = NULL;
+static struct arena_chunk *arena_spare = NULL;
+static int arena_freed_at_exit = 0;
+
+
+/*
+    Description:
+
+        Allocates size bytes from the arena, starting a new chunk when the
+        current one is full.
+
+    Arguments:
+        <size_t size> : The number of bytes needed.
+
+    Returns:
+        A pointer to the bytes, valid until the arena is released below it.
+*/
+char *__throbac_alloc(size_t size) {
+
+    size = (size + ARENA_ALIGNMENT - 1) & ~(ARENA_ALIGNMENT - 1);
+    if (arena == NULL || size > (size_t) (arena->end - arena_top)) {
+        struct arena_chunk *chunk;
+        if (arena_spare != NULL && size <= (size_t) (arena_spare->end - arena_spare->data)) {
+            chunk = arena_spare;
+            arena_spare = NULL;
+        } else {
+            size_t capacity = size > ARENA_CHUNK_SIZE ? size : ARENA_CHUNK_SIZE;
+            chunk = (struct arena_chunk *) malloc(sizeof(struct arena_chunk) + capacity);
+            if (chunk == 0) {
+                abort();
+            }
+            chunk->end = chunk->data + capacity;
+            if (!arena_freed_at_exit) {
+                atexit(__throbac_arena_reset);
+                arena_freed_at_exit = 1;
+            }
+        }
+        chunk->previous = arena;
+        arena = chunk;
+        arena_top = chunk->data;
+    }
+
+    char *value = arena_top;
+    arena_top += size;
+    return value;
+}
+
+
+/*
+    Description:
+
+        Returns the current top of the arena, to be passed to
+        __throbac_arena_release later.
+*/
+char *__throbac_arena_mark(void) {
+    return arena_top;
+}
+
+
+/*
+    Description:
+
+        Frees everything allocated from the arena since mark was taken.
+
+    Arguments:
+        <char* mark> : A value returned by __throbac_arena_mark.
+*/
+void __throbac_arena_release(char *mark) {
+
+    // Drop the chunks allocated after the mark, keeping one as the spare
+    while (arena != NULL && !(mark >= arena->data && mark <= arena->end)) {
+        struct arena_chunk *previous = arena->previous;
+        if (arena_spare == NULL) {
+            arena_spare = arena;
+        } else {
+            free(arena);
+        }
+        arena = previous;
+    }
+    arena_top = arena != NULL ? mark : NULL;
+}
+
+
+/*
+    Description:
+
+        Releases the arena to mark and returns value, so that a return
+        statement can compute its value before the release.
+*/
+int __throbac_arena_return(char *mark, int value) {
+    __throbac_arena_release(mark);
+    return value;
+}
+
+
+/*
+    Description:
+
+        Frees every chunk of the arena. Registered with atexit.
+*/
+void __throbac_arena_reset(void) {
+    __throbac_arena_release(NULL);
+    free(arena_spare);
+    arena_spare = NULL;
+}
+
+
 char *__throbac_cat(char *first, char *second) {
     size_t length = strlen(first) + strlen(second) + 1;
-    void *value = malloc(length);
-    if (value == 0) {
-        abort();
-    }
+    char *value = __throbac_alloc(length);
     strcpy((char *) value, first);
     return strcat((char *) value, second);
 }
 
 
+/*
+    Description:
+
+        Concatenates n strings with a single allocation. The translator
+        emits this for chains of three or more IUNGO operands, in place of
+        nested calls to __throbac_cat.
+
+    Arguments:
+        <int n> : The number of strings that follow.
+        <char* ...> : The strings to concatenate, in order.
+
+    Returns:
+        A newly allocated string holding the concatenation.
+*/
+char *__throbac_catn(int n, ...) {
+
+    // First pass: total length, so that we allocate once
+    va_list args;
+    va_start(args, n);
+    size_t length = 1;
+    for (int i = 0; i < n; i++) {
+        length += strlen(va_arg(args, char *));
+    }
+    va_end(args);
+
+    char *value = __throbac_alloc(length);
+
+    // Second pass: copy each string to the end of the previous one
+    char *end = value;
+    va_start(args, n);
+    for (int i = 0; i < n; i++) {
+        char *part = va_arg(args, char *);
+        size_t part_length = strlen(part);
+        memcpy(end, part, part_length);
+        end += part_length;
+    }
+    va_end(args);
+    *end = '\0';
+
+    return value;
+}
+
+
+/*
+    Description:
+
+        Compares two strings by content, as strcmp does. The translator
+        emits this for comparisons of LOCUTIO values when it knows their
+        types. Interned literals that are equal are the same pointer, so
+        those compare without reading them.
+*/
+int __throbac_compare(char *first, char *second) {
+    if (first == second) {
+        return 0;
+    }
+    return strcmp(first, second);
+}
+
+
 /*
     Description:
 
@@ -89,8 +279,8 @@ char* substring(char* str, int start, int length) {
         return NULL;
     }
 
-    // Otherwise, create substring using malloc
-    char* subStr = (char*) malloc(sizeof(char) * length + 1);
+    // Otherwise, create substring in the arena
+    char* subStr = __throbac_alloc(sizeof(char) * length + 1);
     // subStr[length] = '\0';
 
     // Push str pointer over to start index, then retrieve substring
@@ -106,3 +296,129 @@ char* substring(char* str, int start, int length) {
     subStr -= length;
     return subStr;
 }
+
+
+/*
+    Description:
+
+        Allocates a length-prefixed string with room for length characters
+        and a terminating NUL, which is set.
+*/
+static __throbac_string new_string(size_t length) {
+    __throbac_string value = (__throbac_string) __throbac_alloc(
+            sizeof(struct __throbac_string_header) + length + 1);
+    value->length = length;
+    value->text = value->data;
+    value->data[length] = '\0';
+    return value;
+}
+
+
+__throbac_string __throbac_string_cat(__throbac_string first, __throbac_string second) {
+    __throbac_string value = new_string(first->length + second->length);
+    memcpy(value->data, first->text, first->length);
+    memcpy(value->data + first->length, second->text, second->length);
+    return value;
+}
+
+
+/*
+    Description:
+
+        __throbac_catn for length-prefixed strings: the lengths are read
+        from the headers rather than counted.
+*/
+__throbac_string __throbac_string_catn(int n, ...) {
+
+    va_list args;
+    va_start(args, n);
+    size_t length = 0;
+    for (int i = 0; i < n; i++) {
+        length += va_arg(args, __throbac_string)->length;
+    }
+    va_end(args);
+
+    __throbac_string value = new_string(length);
+    char *end = value->data;
+    va_start(args, n);
+    for (int i = 0; i < n; i++) {
+        __throbac_string part = va_arg(args, __throbac_string);
+        memcpy(end, part->text, part->length);
+        end += part->length;
+    }
+    va_end(args);
+
+    return value;
+}
+
+
+/*
+    Description:
+
+        Whether two length-prefixed strings have the same characters. Strings
+        of different lengths are unequal without looking at the text.
+*/
+int __throbac_string_equal(__throbac_string first, __throbac_string second) {
+    return first->length == second->length
+           && (first->text == second->text || memcmp(first->text, second->text, first->length) == 0);
+}
+
+
+// Compares by content, as strcmp does
+int __throbac_string_compare(__throbac_string first, __throbac_string second) {
+    if (first == second) {
+        return 0;
+    }
+    size_t shorter = first->length < second->length ? first->length : second->length;
+    int result = memcmp(first->text, second->text, shorter);
+    if (result != 0) {
+        return result;
+    }
+    return (first->length > second->length) - (first->length < second->length);
+}
+
+
+int __throbac_string_length(__throbac_string str) {
+    return (int) str->length;
+}
+
+
+/*
+    Description:
+
+        substring for length-prefixed strings, with the same checks and
+        error messages. The result is a view into str: a new header whose
+        text points into str's characters, so nothing is copied. A view is
+        not NUL-terminated unless it reaches the end of str.
+
+        Returns the empty string if an error occurred, since the other
+        length-prefixed functions read the header of every string they're
+        given.
+*/
+__throbac_string __throbac_string_substring(__throbac_string str, int start, int length) {
+    static struct __throbac_string_header empty = {0, ""};
+
+    if (start < 0 || length < 0) {
+        printf("\nERROR: Inputted values can't be negative.");
+        return &empty;
+    }
+    if (start > (int) str->length - 1) {
+        printf("\nERROR: Inputted start index larger than string length.");
+        return &empty;
+    }
+    else if ((size_t) start + length > str->length) {
+        printf("\nERROR: Inputted start index and length exceeds string length.");
+        return &empty;
+    }
+
+    __throbac_string value = (__throbac_string) __throbac_alloc(sizeof(struct __throbac_string_header));
+    value->length = length;
+    value->text = str->text + start;
+    return value;
+}
+
+
+// Writes the string without needing a NUL, so views print without copying
+void __throbac_string_print(__throbac_string str) {
+    fwrite(str->text, 1, str->length, stdout);
+}
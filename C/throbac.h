@@ -7,10 +7,58 @@ Version: 2021-01-24
 #ifndef THROBAC_H
 #define THROBAC_H
 
+#include <stddef.h>
+
+char *__throbac_alloc(size_t size);
+
+char *__throbac_arena_mark(void);
+
+void __throbac_arena_release(char *mark);
+
+int __throbac_arena_return(char *mark, int value);
+
+void __throbac_arena_reset(void);
+
 char *__throbac_cat(char *first, char *second);
 
-int stringlenght(char *str);
+char *__throbac_catn(int n, ...);
+
+int __throbac_compare(char *first, char *second);
+
+int stringlength(char *str);
 
 char *substring(char* str, int start, int length);
 
+// A length-prefixed string: text points at length characters, which are
+// stored in data (followed by a NUL) for strings built by the runtime. For a
+// substring, text points into the string it was taken from and there is no
+// data; such views are only NUL-terminated if they reach the end.
+struct __throbac_string_header {
+    size_t length;
+    const char *text;
+    char data[];
+};
+
+typedef struct __throbac_string_header *__throbac_string;
+
+// A length-prefixed string literal, with static storage (uses a GNU C
+// statement expression, supported by gcc and clang)
+#define __throbac_string_literal(literal) (__extension__ ({ \
+    static struct __throbac_string_header __literal = {sizeof(literal) - 1, literal}; \
+    &__literal; }))
+
+__throbac_string __throbac_string_cat(__throbac_string first, __throbac_string second);
+
+__throbac_string __throbac_string_catn(int n, ...);
+
+int __throbac_string_equal(__throbac_string first, __throbac_string second);
+
+int __throbac_string_compare(__throbac_string first, __throbac_string second);
+
+int __throbac_string_length(__throbac_string str);
+
+__throbac_string __throbac_string_substring(__throbac_string str, int start, int length);
+
+void __throbac_string_print(__throbac_string str);
+
 #endif // THROBAC_H
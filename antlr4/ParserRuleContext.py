@@ -34,7 +34,9 @@ from antlr4.tree.Tree import ParseTreeListener, ParseTree, TerminalNodeImpl, Err
 ParserRuleContext = None
 
 class ParserRuleContext(RuleContext):
-    __slots__ = ('children', 'start', 'stop', 'exception')
+    # '__dict__' lets listeners and visitors still attach their own attributes
+    # to nodes; the dict is only allocated for nodes that actually get one.
+    __slots__ = ('children', 'start', 'stop', 'exception', '__dict__')
     def __init__(self, parent:ParserRuleContext = None, invokingStateNumber:int = None ):
         super().__init__(parent, invokingStateNumber)
         #* If we are debugging or building a parse tree for a visitor,
@@ -180,6 +182,7 @@ class ParserRuleContext(RuleContext):
 RuleContext.EMPTY = ParserRuleContext()
 
 class InterpreterRuleContext(ParserRuleContext):
+    __slots__ = 'ruleIndex'
 
     def __init__(self, parent:ParserRuleContext, invokingStateNumber:int, ruleIndex:int):
         super().__init__(parent, invokingStateNumber)
@@ -9,17 +9,23 @@ from antlr4.RuleContext import RuleContext
 from antlr4.Token import Token
 from antlr4.atn.ATNType import ATNType
 from antlr4.atn.ATNState import ATNState, DecisionState
+from antlr4.atn.Transition import Transition
 
 
 class ATN(object):
     __slots__ = (
         'grammarType', 'maxTokenType', 'states', 'decisionToState',
         'ruleToStartState', 'ruleToStopState', 'modeNameToStartState',
-        'ruleToTokenType', 'lexerActions', 'modeToStartState'
+        'ruleToTokenType', 'lexerActions', 'modeToStartState', 'closureFragments'
     )
 
     INVALID_ALT_NUMBER = 0
 
+    # Operations making up a closure fragment; see {@link #getClosureFragment}.
+    CLOSURE_ADD = 0
+    CLOSURE_ENTER = 1
+    CLOSURE_EXPAND = 2
+
     # Used for runtime deserialization of ATNs from strings#/
     def __init__(self, grammarType:ATNType , maxTokenType:int ):
         # The type of the ATN.
@@ -46,6 +52,9 @@ class ATN(object):
         # be referenced by action transitions in the ATN.
         self.lexerActions = None
         self.modeToStartState = []
+        # Memo of context-independent epsilon-closure fragments, keyed by
+        # ATN state number; filled lazily by {@link #getClosureFragment}.
+        self.closureFragments = dict()
 
     # Compute the set of valid tokens that can occur starting in state {@code s}.
     #  If {@code ctx} is null, the set of tokens will not include what can follow
@@ -72,6 +81,59 @@ class ATN(object):
         else:
             return self.nextTokensInContext(s, ctx)
 
+    # Returns the context-independent part of the epsilon closure from
+    #  {@code s}, as a tuple of {@code (op, state, transition)} steps in the
+    #  same depth-first order the simulators' closure would visit them:
+    #
+    #  <ul>
+    #  <li>{@link #CLOSURE_ADD}: a config for {@code state} joins the set.</li>
+    #  <li>{@link #CLOSURE_ENTER}: {@code state} was reached over plain epsilon
+    #  edges, but closure from it depends on the context (rule stop state,
+    #  precedence loop entry or non-greedy decision), so the simulator must run
+    #  its full closure from there.</li>
+    #  <li>{@link #CLOSURE_EXPAND}: {@code transition} leaves {@code state} and
+    #  is not a plain epsilon edge (rule, predicate, action or a match that can
+    #  see EOF); the simulator must follow it itself.</li>
+    #  </ul>
+    #
+    #  Plain epsilon edges never look at the prediction context, so a fragment
+    #  is valid for every context. Returns {@code null} if {@code s} itself is
+    #  one of the context-dependent states.
+    def getClosureFragment(self, s:ATNState):
+        fragment = self.closureFragments.get(s.stateNumber, self)
+        if fragment is self:
+            if self.closureDependsOnContext(s):
+                fragment = None
+            else:
+                ops = []
+                self.collectClosureFragment(s, ops)
+                fragment = tuple(ops)
+            self.closureFragments[s.stateNumber] = fragment
+        return fragment
+
+    def collectClosureFragment(self, s:ATNState, ops:list):
+        if not s.epsilonOnlyTransitions:
+            ops.append((ATN.CLOSURE_ADD, s, None))
+        for t in s.transitions:
+            kind = t.serializationType
+            if kind == Transition.EPSILON:
+                if self.closureDependsOnContext(t.target):
+                    ops.append((ATN.CLOSURE_ENTER, t.target, None))
+                else:
+                    self.collectClosureFragment(t.target, ops)
+            elif t.isEpsilon:
+                ops.append((ATN.CLOSURE_EXPAND, s, t))
+            elif kind in (Transition.ATOM, Transition.RANGE, Transition.SET) and t.matches(Token.EOF, 0, 1):
+                # only followed when treating EOF as epsilon
+                ops.append((ATN.CLOSURE_EXPAND, s, t))
+
+    def closureDependsOnContext(self, s:ATNState):
+        if s.stateType == ATNState.RULE_STOP:
+            return True
+        if s.stateType == ATNState.STAR_LOOP_ENTRY and s.isPrecedenceDecision:
+            return True
+        return isinstance(s, DecisionState) and s.nonGreedy
+
     def addState(self, state:ATNState):
         if state is not None:
             state.atn = self
@@ -23,7 +23,7 @@ ATNConfig = None
 class ATNConfig(object):
     __slots__ = (
         'state', 'alt', 'context', 'semanticContext', 'reachesIntoOuterContext',
-        'precedenceFilterSuppressed'
+        'precedenceFilterSuppressed', 'configSetKey', 'configSetHash'
     )
 
     def __init__(self, state:ATNState=None, alt:int=None, context:PredictionContext=None, semantic:SemanticContext=None, config:ATNConfig=None):
@@ -58,6 +58,12 @@ class ATNConfig(object):
         # accurate depth since I don't ever decrement. TODO: make it a boolean then
         self.reachesIntoOuterContext = 0 if config is None else config.reachesIntoOuterContext
         self.precedenceFilterSuppressed = False if config is None else config.precedenceFilterSuppressed
+        # The state, alt and semantic context never change once a config is
+        # built (only the context is replaced during merges), so the
+        # {@code (s, i, pi)} key used by {@link ATNConfigSet} and its hash
+        # are computed once here rather than on every lookup.
+        self.configSetKey = (None if state is None else state.stateNumber, alt, semantic)
+        self.configSetHash = hash(self.configSetKey)
 
     # An ATN configuration is equal to another if both have
     #  the same state, they predict the same alternative, and
@@ -69,17 +75,15 @@ class ATNConfig(object):
         elif not isinstance(other, ATNConfig):
             return False
         else:
-            return self.state.stateNumber==other.state.stateNumber \
-                and self.alt==other.alt \
+            return self.configSetKey==other.configSetKey \
                 and ((self.context is other.context) or (self.context==other.context)) \
-                and self.semanticContext==other.semanticContext \
                 and self.precedenceFilterSuppressed==other.precedenceFilterSuppressed
 
     def __hash__(self):
-        return hash((self.state.stateNumber, self.alt, self.context, self.semanticContext))
+        return hash((self.configSetHash, self.context))
 
     def hashCodeForConfigSet(self):
-        return hash((self.state.stateNumber, self.alt, hash(self.semanticContext)))
+        return self.configSetHash
 
     def equalsForConfigSet(self, other):
         if self is other:
@@ -87,9 +91,7 @@ class ATNConfig(object):
         elif not isinstance(other, ATNConfig):
             return False
         else:
-            return self.state.stateNumber==other.state.stateNumber \
-                and self.alt==other.alt \
-                and self.semanticContext==other.semanticContext
+            return self.configSetKey==other.configSetKey
 
     def __str__(self):
         with StringIO() as buf:
@@ -125,11 +127,14 @@ class LexerATNConfig(ATNConfig):
         # This is the backing field for {@link #getLexerActionExecutor}.
         self.lexerActionExecutor = lexerActionExecutor
         self.passedThroughNonGreedyDecision = False if config is None else self.checkNonGreedyDecision(config, state)
+        # Lexer config sets compare whole configs, so the lookup key covers
+        # every field that takes part in equality.
+        self.configSetKey = (self.state.stateNumber, self.alt, self.context, self.semanticContext,
+                             self.passedThroughNonGreedyDecision, self.lexerActionExecutor)
+        self.configSetHash = hash(self.configSetKey)
 
     def __hash__(self):
-        return hash((self.state.stateNumber, self.alt, self.context,
-                self.semanticContext, self.passedThroughNonGreedyDecision,
-                self.lexerActionExecutor))
+        return self.configSetHash
 
     def __eq__(self, other):
         if self is other:
@@ -34,8 +34,8 @@ class ATNConfigSet(object):
     # use a hash table that lets us specify the equals/hashcode operation.
 
     def __init__(self, fullCtx:bool=True):
-        # All configs but hashed by (s, i, _, pi) not including context. Wiped out
-        # when we go readonly as this set becomes a DFA state.
+        # All configs keyed by their (s, i, _, pi) tuple, not including context.
+        # Wiped out when we go readonly as this set becomes a DFA state.
         self.configLookup = dict()
         # Indicates that this configuration set is part of a full context
         #  LL prediction. It will be used to determine how to merge $. With SLL
@@ -81,18 +81,29 @@ class ATNConfigSet(object):
             self.hasSemanticContext = True
         if config.reachesIntoOuterContext > 0:
             self.dipsIntoOuterContext = True
-        existing = self.getOrAdd(config)
+        existing = self.configLookup.setdefault(config.configSetKey, config)
         if existing is config:
             self.cachedHashCode = -1
             self.configs.append(config)  # track order here
             return True
         # a previous (s,i,pi,_), merge with it and save result
-        rootIsWildcard = not self.fullCtx
-        merged = merge(existing.context, config.context, rootIsWildcard, mergeCache)
+        existingContext = existing.context
+        context = config.context
+        if existingContext is context:
+            merged = existingContext
+        elif not self.fullCtx:
+            # SLL: $ is a wildcard, so it absorbs anything merged with it
+            if existingContext is PredictionContext.EMPTY or context is PredictionContext.EMPTY:
+                merged = PredictionContext.EMPTY
+            else:
+                merged = merge(existingContext, context, True, mergeCache)
+        else:
+            merged = merge(existingContext, context, False, mergeCache)
         # no need to check for existing.context, config.context in cache
         # since only way to create new graphs is "call rule" and here.
         # We cache at both places.
-        existing.reachesIntoOuterContext = max(existing.reachesIntoOuterContext, config.reachesIntoOuterContext)
+        if config.reachesIntoOuterContext > existing.reachesIntoOuterContext:
+            existing.reachesIntoOuterContext = config.reachesIntoOuterContext
         # make sure to preserve the precedence filter suppression during the merge
         if config.precedenceFilterSuppressed:
             existing.precedenceFilterSuppressed = True
@@ -100,18 +111,7 @@ class ATNConfigSet(object):
         return True
 
     def getOrAdd(self, config:ATNConfig):
-        h = config.hashCodeForConfigSet()
-        l = self.configLookup.get(h, None)
-        if l is not None:
-            r = next((cfg for cfg in l if config.equalsForConfigSet(cfg)), None)
-            if r is not None:
-                return r
-        if l is None:
-            l = [config]
-            self.configLookup[h] = l
-        else:
-            l.append(config)
-        return config
+        return self.configLookup.setdefault(config.configSetKey, config)
 
     def getStates(self):
         return set(c.state for c in self.configs)
@@ -170,13 +170,7 @@ class ATNConfigSet(object):
     def __contains__(self, config):
         if self.configLookup is None:
             raise UnsupportedOperationException("This method is not implemented for readonly sets.")
-        h = config.hashCodeForConfigSet()
-        l = self.configLookup.get(h, None)
-        if l is not None:
-            for c in l:
-                if config.equalsForConfigSet(c):
-                    return True
-        return False
+        return config.configSetKey in self.configLookup
 
     def clear(self):
         if self.readonly:
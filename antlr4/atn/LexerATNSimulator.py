@@ -348,6 +348,26 @@ class LexerATNSimulator(ATNSimulator):
 
             return currentAltReachedAcceptState
 
+        fragment = self.atn.getClosureFragment(config.state)
+        if fragment is not None:
+            # replay the precomputed walk over plain epsilon edges
+            state = config.state
+            c = config
+            for op, s, t in fragment:
+                if s is not state:
+                    state = s
+                    c = LexerATNConfig(state=s, config=config)
+                if op == ATN.CLOSURE_ADD:
+                    if not currentAltReachedAcceptState or not c.passedThroughNonGreedyDecision:
+                        configs.add(c)
+                elif op == ATN.CLOSURE_ENTER:
+                    currentAltReachedAcceptState = self.closure(input, c, configs, currentAltReachedAcceptState, speculative, treatEofAsEpsilon)
+                else:
+                    target = self.getEpsilonTarget(input, c, t, configs, speculative, treatEofAsEpsilon)
+                    if target is not None:
+                        currentAltReachedAcceptState = self.closure(input, target, configs, currentAltReachedAcceptState, speculative, treatEofAsEpsilon)
+            return currentAltReachedAcceptState
+
         # optimization
         if not config.state.epsilonOnlyTransitions:
             if not currentAltReachedAcceptState or not config.passedThroughNonGreedyDecision:
@@ -1138,6 +1138,23 @@ class ParserATNSimulator(ATNSimulator):
     # Do the actual work of walking epsilon edges#
     def closure_(self, config:ATNConfig, configs:ATNConfigSet, closureBusy:set, collectPredicates:bool, fullCtx:bool, depth:int, treatEofAsEpsilon:bool):
         p = config.state
+        fragment = self.atn.getClosureFragment(p)
+        if fragment is not None:
+            # replay the precomputed walk over plain epsilon edges
+            state = p
+            c = config
+            for op, s, t in fragment:
+                if s is not state:
+                    state = s
+                    c = ATNConfig(state=s, config=config)
+                if op == ATN.CLOSURE_ADD:
+                    configs.add(c, self.mergeCache)
+                elif op == ATN.CLOSURE_ENTER:
+                    self.closureCheckingStopState(c, configs, closureBusy, collectPredicates, fullCtx, depth, treatEofAsEpsilon)
+                else:
+                    self.closureTransition(c, t, configs, closureBusy, collectPredicates, fullCtx, depth, treatEofAsEpsilon)
+            return
+
         # optimization
         if not p.epsilonOnlyTransitions:
             configs.add(config, self.mergeCache)
@@ -1150,41 +1167,43 @@ class ParserATNSimulator(ATNSimulator):
                 first = False
                 if self.canDropLoopEntryEdgeInLeftRecursiveRule(config):
                     continue
-
-            continueCollecting = collectPredicates and not isinstance(t, ActionTransition)
-            c = self.getEpsilonTarget(config, t, continueCollecting, depth == 0, fullCtx, treatEofAsEpsilon)
-            if c is not None:
-                newDepth = depth
-                if isinstance( config.state, RuleStopState):
-                    # target fell off end of rule; mark resulting c as having dipped into outer context
-                    # We can't get here if incoming config was rule stop and we had context
-                    # track how far we dip into outer context.  Might
-                    # come in handy and we avoid evaluating context dependent
-                    # preds if this is > 0.
-                    if self._dfa is not None and self._dfa.precedenceDfa:
-                        if t.outermostPrecedenceReturn == self._dfa.atnStartState.ruleIndex:
-                            c.precedenceFilterSuppressed = True
-                    c.reachesIntoOuterContext += 1
+            self.closureTransition(config, t, configs, closureBusy, collectPredicates, fullCtx, depth, treatEofAsEpsilon)
+
+    def closureTransition(self, config:ATNConfig, t:Transition, configs:ATNConfigSet, closureBusy:set, collectPredicates:bool, fullCtx:bool, depth:int, treatEofAsEpsilon:bool):
+        continueCollecting = collectPredicates and not isinstance(t, ActionTransition)
+        c = self.getEpsilonTarget(config, t, continueCollecting, depth == 0, fullCtx, treatEofAsEpsilon)
+        if c is not None:
+            newDepth = depth
+            if isinstance( config.state, RuleStopState):
+                # target fell off end of rule; mark resulting c as having dipped into outer context
+                # We can't get here if incoming config was rule stop and we had context
+                # track how far we dip into outer context.  Might
+                # come in handy and we avoid evaluating context dependent
+                # preds if this is > 0.
+                if self._dfa is not None and self._dfa.precedenceDfa:
+                    if t.outermostPrecedenceReturn == self._dfa.atnStartState.ruleIndex:
+                        c.precedenceFilterSuppressed = True
+                c.reachesIntoOuterContext += 1
+                if c in closureBusy:
+                    # avoid infinite recursion for right-recursive rules
+                    return
+                closureBusy.add(c)
+                configs.dipsIntoOuterContext = True # TODO: can remove? only care when we add to set per middle of this method
+                newDepth -= 1
+                if ParserATNSimulator.debug:
+                    print("dips into outer ctx: " + str(c))
+            else:
+                if not t.isEpsilon:
                     if c in closureBusy:
-                        # avoid infinite recursion for right-recursive rules
-                        continue
+                        # avoid infinite recursion for EOF* and EOF+
+                        return
                     closureBusy.add(c)
-                    configs.dipsIntoOuterContext = True # TODO: can remove? only care when we add to set per middle of this method
-                    newDepth -= 1
-                    if ParserATNSimulator.debug:
-                        print("dips into outer ctx: " + str(c))
-                else:
-                    if not t.isEpsilon:
-                        if c in closureBusy:
-                            # avoid infinite recursion for EOF* and EOF+
-                            continue
-                        closureBusy.add(c)
-                    if isinstance(t, RuleTransition):
-                        # latch when newDepth goes negative - once we step out of the entry context we can't return
-                        if newDepth >= 0:
-                            newDepth += 1
+                if isinstance(t, RuleTransition):
+                    # latch when newDepth goes negative - once we step out of the entry context we can't return
+                    if newDepth >= 0:
+                        newDepth += 1
 
-                self.closureCheckingStopState(c, configs, closureBusy, continueCollecting, fullCtx, newDepth, treatEofAsEpsilon)
+            self.closureCheckingStopState(c, configs, closureBusy, continueCollecting, fullCtx, newDepth, treatEofAsEpsilon)
 
 
 
@@ -12,22 +12,22 @@ from antlr4.Token import Token
 INVALID_INTERVAL = (-1, -2)
 
 class Tree(object):
-    pass
+    __slots__ = ()
 
 class SyntaxTree(Tree):
-    pass
+    __slots__ = ()
 
 class ParseTree(SyntaxTree):
-    pass
+    __slots__ = ()
 
 class RuleNode(ParseTree):
-    pass
+    __slots__ = ()
 
 class TerminalNode(ParseTree):
-    pass
+    __slots__ = ()
 
 class ErrorNode(TerminalNode):
-    pass
+    __slots__ = ()
 
 class ParseTreeVisitor(object):
     def visit(self, tree):
@@ -189,3 +189,130 @@ class ParseTreeWalker(object):
         listener.exitEveryRule(ctx)
 
 ParseTreeWalker.DEFAULT = ParseTreeWalker()
+
+
+class DispatchTableWalker(ParseTreeWalker):
+    """
+    A {@link ParseTreeWalker} that works out, once per listener class, which
+    listener method each context class dispatches to, and then calls those
+    methods directly instead of going through the {@code hasattr} probes in
+    the generated {@code enterRule}/{@code exitRule}. Handlers the listener
+    leaves as inherited no-ops (a body of just {@code pass}) are dropped, so
+    a listener that only implements {@code exit*} methods costs nothing on
+    entry, and terminal nodes aren't even created when the listener doesn't
+    visit them.
+    """
+
+    # listener class -> ListenerDispatchTable, shared by all walkers
+    tables = dict()
+
+    def walk(self, listener:ParseTreeListener, t:ParseTree):
+        table = self.tables.get(type(listener), None)
+        if table is None:
+            table = ListenerDispatchTable(type(listener))
+            self.tables[type(listener)] = table
+        if isinstance(t, ErrorNode):
+            if table.visitErrorNode is not None:
+                table.visitErrorNode(listener, t)
+        elif isinstance(t, TerminalNode):
+            if table.visitTerminal is not None:
+                table.visitTerminal(listener, t)
+        else:
+            self.walkRule(listener, table, t.getRuleContext())
+
+    def walkRule(self, listener:ParseTreeListener, table, ctx):
+        handlers = table.handlers.get(type(ctx), None)
+        if handlers is None:
+            handlers = table.resolve(type(ctx))
+        enter, exit = handlers
+        if table.enterEveryRule is not None:
+            table.enterEveryRule(listener, ctx)
+        if enter is not None:
+            enter(listener, ctx)
+        if table.visitsTerminals:
+            children = ctx.getChildren()
+        else:
+            children = ctx.children
+        if children is not None:
+            for child in children:
+                if isinstance(child, TerminalNode):
+                    if isinstance(child, ErrorNode):
+                        if table.visitErrorNode is not None:
+                            table.visitErrorNode(listener, child)
+                    elif table.visitTerminal is not None:
+                        table.visitTerminal(listener, child)
+                else:
+                    self.walkRule(listener, table, child)
+        if exit is not None:
+            exit(listener, ctx)
+        if table.exitEveryRule is not None:
+            table.exitEveryRule(listener, ctx)
+
+
+class ListenerDispatchTable(object):
+    """
+    The handlers a {@link DispatchTableWalker} calls for one listener class:
+    the generic {@link ParseTreeListener} methods, and an
+    {@code (enter, exit)} pair per context class, filled in as context
+    classes are met. Each entry is a plain function taking
+    {@code (listener, node)}, or {@code None} when there is nothing to call.
+    """
+    __slots__ = ('listenerClass', 'handlers', 'visitTerminal', 'visitErrorNode',
+                 'enterEveryRule', 'exitEveryRule', 'visitsTerminals')
+
+    def __init__(self, listenerClass:type):
+        self.listenerClass = listenerClass
+        self.handlers = dict()
+        self.visitTerminal = self.method('visitTerminal')
+        self.visitErrorNode = self.method('visitErrorNode')
+        self.enterEveryRule = self.method('enterEveryRule')
+        self.exitEveryRule = self.method('exitEveryRule')
+        self.visitsTerminals = self.visitTerminal is not None or self.visitErrorNode is not None
+
+    def method(self, name:str):
+        """
+        The listener's function called {@code name}, or {@code None} if it has
+        none or it does nothing.
+        """
+        fn = getattr(self.listenerClass, name, None)
+        return None if isNoOp(fn) else fn
+
+    def resolve(self, ctxClass:type):
+        """
+        Generated contexts for rule or label {@code X} are named
+        {@code XContext} and dispatch to {@code enterX}/{@code exitX}. A
+        context whose enterRule/exitRule isn't overridden dispatches to
+        nothing; one that overrides them but has no conventionally named
+        listener method falls back to calling its own enterRule/exitRule.
+        """
+        name = ctxClass.__name__
+        if name.endswith('Context'):
+            name = name[:-len('Context')]
+        handlers = (self.ruleHandler(ctxClass, 'enterRule', 'enter' + name),
+                    self.ruleHandler(ctxClass, 'exitRule', 'exit' + name))
+        self.handlers[ctxClass] = handlers
+        return handlers
+
+    def ruleHandler(self, ctxClass:type, dispatchName:str, listenerName:str):
+        if isNoOp(getattr(ctxClass, dispatchName, None)):
+            return None
+        if hasattr(self.listenerClass, listenerName):
+            return self.method(listenerName)
+        if dispatchName == 'enterRule':
+            return lambda listener, ctx: ctx.enterRule(listener)
+        return lambda listener, ctx: ctx.exitRule(listener)
+
+
+def _noop(self, node):
+    pass
+
+def isNoOp(fn):
+    """
+    True if {@code fn} is missing or is a plain function whose body does
+    nothing, such as the {@code pass} methods of generated listeners.
+    """
+    if fn is None:
+        return True
+    code = getattr(fn, '__code__', None)
+    return code is not None and code.co_code == _noop.__code__.co_code
+
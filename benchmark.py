@@ -0,0 +1,214 @@
+"""
+Times each stage of translating Throbac to C, separately, on synthetic
+corpora of increasing size:
+
+    load       FileStream reading the source
+    lex        ThrobacLexer tokenizing it (CommonTokenStream.fill)
+    parse      ThrobacParser.script on the tokens
+    translate  a ParseTreeWalker walking a Throbac2CTranslator
+    write      writing the C to a file
+
+Each corpus stresses one shape of program: `nesting` nests SI and DUM blocks,
+`iungo` builds one long IUNGO chain, `functions` defines many funcDefs and
+calls each, `variables` declares a huge varBlock, and `generated` is a
+`corpus_generator` script of that many functions. Sizes are multiples
+of each corpus's base size. Every stage is run `--repeat` times and its best
+and median times are reported; the parser's DFA cache is warmed by the first
+run, so the best time is the steady state.
+
+The results are written as JSON to `--output`. With `--compare BASELINE`, the
+best times are compared with those in an earlier results file, and the
+script exits with status 1 if any stage got slower by more than
+`--threshold` (a fraction).
+
+Version: 2026-10-19
+"""
+
+import argparse
+import json
+import os
+import os.path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+from antlr4 import FileStream, CommonTokenStream, ParseTreeWalker
+from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacParser import ThrobacParser
+from throbac2c import Throbac2CTranslator
+from corpus_generator import GeneratorOptions, generate, throbac_name, throbac_number
+
+STAGES = ['load', 'lex', 'parse', 'translate', 'write']
+
+
+def nesting_corpus(depth):
+    # alternately SI and DUM, each level printing and counting down; not
+    # indented, since indentation would make the source quadratic in depth
+    lines = ['x : NUMERUS MUTABILIS', 'x .I.NIL. VALORUM']
+    for level in range(depth):
+        lines.append(f'x SUPRA {throbac_number(level)} {"SI" if level % 2 == 0 else "DUM"} >')
+        lines.append('x NUMERUS.IMPRIMO')
+        lines.append('x x SUBTRAHO .I. VALORUM')
+    lines.extend('<' * depth)
+    return '\n'.join(lines) + '\n'
+
+
+def iungo_corpus(length):
+    operands = ' IUNGO '.join(f'^PART.{chr(ord("A") + i % 26)}^' for i in range(length))
+    return f's : LOCUTIO MUTABILIS\ns {operands} VALORUM\ns LOCUTIO.IMPRIMO\n'
+
+
+def functions_corpus(count):
+    lines = []
+    for i in range(count):
+        lines.append(f'APUD n : NUMERUS, s : LOCUTIO DEFINITIO {throbac_name(i)} PRAEBET NUMERUS >')
+        lines.append(f'    s IUNGO ^+^ LOCUTIO.IMPRIMO')
+        lines.append(f'    n ADDO {throbac_number(i)} REDEO')
+        lines.append('<')
+    lines.append('x : NUMERUS MUTABILIS')
+    for i in range(count):
+        lines.append(f'x APUD x, ^CALL^ VOCO {throbac_name(i)} VALORUM')
+    lines.append('x NUMERUS.IMPRIMO')
+    return '\n'.join(lines) + '\n'
+
+
+def variables_corpus(count):
+    types = ['NUMERUS', 'LOCUTIO', 'VERITAS']
+    lines = [f'{throbac_name(i)} : {types[i % 3]} MUTABILIS' for i in range(count)]
+    values = ['.IV.II.', '^VALUE^', 'VERUM']
+    lines.extend(f'{throbac_name(i)} {values[i % 3]} VALORUM' for i in range(count))
+    return '\n'.join(lines) + '\n'
+
+
+def generated_corpus(count):
+    return ''.join(generate(GeneratorOptions(functions=count)))
+
+
+# corpus name -> (function of size returning the source, base size)
+CORPORA = {
+    'nesting': (nesting_corpus, 25),
+    'iungo': (iungo_corpus, 100),
+    'functions': (functions_corpus, 50),
+    'variables': (variables_corpus, 200),
+    'generated': (generated_corpus, 20),
+}
+
+
+def time_stages(source_path, c_path):
+    """
+    Runs each stage once on the source at `source_path`, returning the
+    seconds each took.
+    """
+    times = {}
+    start = time.perf_counter()
+    stream = FileStream(source_path)
+    times['load'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tokens = CommonTokenStream(ThrobacLexer(stream))
+    tokens.fill()
+    times['lex'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parse_tree = ThrobacParser(tokens).script()
+    times['parse'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    translator = Throbac2CTranslator()
+    ParseTreeWalker().walk(translator, parse_tree)
+    times['translate'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with open(c_path, 'w') as c_file:
+        c_file.write(translator.c_translation[parse_tree])
+    times['write'] = time.perf_counter() - start
+    return times
+
+
+def run_benchmarks(corpora, scales, repeat, work_dir):
+    """
+    Returns {corpus: {size: {stage: {'best': s, 'median': s}}}}.
+    """
+    results = {}
+    for name in corpora:
+        make_source, base_size = CORPORA[name]
+        results[name] = {}
+        for scale in scales:
+            size = base_size * scale
+            source_path = os.path.join(work_dir, f'{name}_{size}.throbac')
+            with open(source_path, 'w') as source_file:
+                source_file.write(make_source(size))
+            runs = [time_stages(source_path, os.path.join(work_dir, f'{name}_{size}.c'))
+                    for _ in range(repeat)]
+            results[name][str(size)] = {stage: {'best': min(run[stage] for run in runs),
+                                                'median': statistics.median(run[stage] for run in runs)}
+                                        for stage in STAGES}
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints how each stage's best time compares with `baseline`, returning
+    the stages that are slower by more than `threshold`.
+    """
+    regressions = []
+    for name, sizes in results.items():
+        for size, stages in sizes.items():
+            for stage, times in stages.items():
+                try:
+                    before = baseline[name][size][stage]['best']
+                except KeyError:
+                    continue
+                ratio = times['best'] / before if before else float('inf')
+                flag = ''
+                if ratio > 1 + threshold:
+                    regressions.append((name, size, stage))
+                    flag = '  SLOWER'
+                print(f'{name:>10} {size:>6} {stage:>9} {before * 1000:10.3f} ms -> '
+                      f'{times["best"] * 1000:10.3f} ms  x{ratio:.2f}{flag}')
+    return regressions
+
+
+def print_results(results):
+    print(f'{"corpus":>10} {"size":>6} ' + ' '.join(f'{stage:>10}' for stage in STAGES) + '  (best, ms)')
+    for name, sizes in results.items():
+        for size, stages in sizes.items():
+            print(f'{name:>10} {size:>6} '
+                  + ' '.join(f'{stages[stage]["best"] * 1000:10.3f}' for stage in STAGES))
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Time each stage of translating Throbac to C.')
+    arg_parser.add_argument('--corpus', action='append', choices=list(CORPORA),
+                            help='a corpus to run (by default, all of them); may be repeated')
+    arg_parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 4, 8],
+                            help='the multiples of each corpus\'s base size to run')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='runs per stage')
+    arg_parser.add_argument('--output', default='benchmark_results.json', help='the JSON results file')
+    arg_parser.add_argument('--compare', metavar='BASELINE', help='an earlier results file to compare with')
+    arg_parser.add_argument('--threshold', type=float, default=0.1,
+                            help='the slowdown, as a fraction, that counts as a regression')
+    args = arg_parser.parse_args()
+
+    # deep nesting and long IUNGO chains make deep trees, and both the
+    # parser and the walker recurse on them
+    sys.setrecursionlimit(100000)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = run_benchmarks(args.corpus or list(CORPORA), args.scales, args.repeat, work_dir)
+
+    with open(args.output, 'w') as output_file:
+        json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                   'repeat': args.repeat, 'results': results}, output_file, indent=2)
+    print_results(results)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)['results']
+        print(f'\ncompared with {args.compare}')
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} stage(s) slower by more than {args.threshold:.0%}')
+            sys.exit(1)
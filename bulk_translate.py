@@ -3,25 +3,134 @@ Translates the Throbac programs in the THROBAC_DIR to equivalent C programs,
 assuming there's a correct implementation of a `Throbac2CTranslator` in the
 `throbac2c` module. Generated files will be placed in `PYTHON_DIR`.
 
+Pass `--translator visitor` to translate with `Throbac2CVisitor` instead of
+the listener; both produce the same C. Pass `--fold-constants` to fold
+literal-only NUMERUS, VERITAS and LOCUTIO expressions before translating,
+`--counted-strings` to use the runtime's length-prefixed strings, and
+`--intern-strings` to define each distinct string literal once. Pass
+`--typed` to type check each program first and translate using the types.
+
+Pass `--stats FILE` to write a JSON report (to standard output for `-`) of
+the time spent lexing, parsing, walking and writing each file and in total,
+with each file's token and parse-tree node counts, how many DFA states its
+parse added to `ThrobacParser.decisionsToDFA`, and the peak RSS of the
+process. The files are listed slowest first.
+
+Set THROBAC_PROFILE_DIR to profile slow parses and walks; see `profiling`.
+
 Author: Greg Phillips
 
 Version: 2022-12-26
 """
 
+import argparse
+from contextlib import contextmanager
+import json
 import os.path
 import sys
+import time
 import traceback
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 import generic_parser
-from antlr4 import ParseTreeWalker
+from antlr4 import DispatchTableWalker
 from throbac.ThrobacLexer import ThrobacLexer
 from throbac.ThrobacParser import ThrobacParser
-from throbac2c import Throbac2CTranslator
+from constant_folding import fold_constants
+from semantic_analysis import infer_types, TypeErrors
+from throbac2c import Throbac2CTranslator, Throbac2CVisitor
+from profiling import profiled
 
 THROBAC_DIR = 'throbac_source'
 C_DIR = 'generated_c'
 
+STAGES = ['lex', 'parse', 'fold', 'type_check', 'walk', 'write']
+
+
+@contextmanager
+def timed(stats, stage):
+    """
+    Records the seconds the block takes in `stats[stage]`, unless `stats`
+    is None.
+    """
+    start = time.perf_counter()
+    yield
+    if stats is not None:
+        stats[stage] = time.perf_counter() - start
+
+
+def dfa_state_count():
+    """
+    The number of DFA states the Throbac parser has cached so far.
+    """
+    return sum(len(dfa.states) for dfa in ThrobacParser.decisionsToDFA)
+
+
+def node_count(parse_tree):
+    """
+    The number of rule and terminal nodes in `parse_tree`.
+    """
+    count = 0
+    stack = [parse_tree]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if getattr(node, 'children', None):
+            stack.extend(node.children)
+    return count
+
+
+def peak_rss_kb():
+    """
+    The peak resident set size of this process in KiB, or None if it isn't
+    available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def stats_report(file_stats):
+    """
+    The JSON report for `--stats`, given the stats of each file.
+    """
+    totals = {stage: sum(stats.get(stage, 0.0) for stats in file_stats.values()) for stage in STAGES}
+    totals['time'] = sum(totals.values())
+    for counter in ['tokens', 'nodes', 'dfa_states_added']:
+        totals[counter] = sum(stats.get(counter, 0) for stats in file_stats.values())
+    totals['dfa_states'] = dfa_state_count()
+    totals['peak_rss_kb'] = peak_rss_kb()
+    totals['files'] = len(file_stats)
+    slowest_first = sorted(file_stats.items(), key=lambda item: item[1]['time'], reverse=True)
+    return {'total': totals, 'files': dict(slowest_first)}
+
+
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Translate Throbac programs to C.')
+    arg_parser.add_argument('--translator', choices=['listener', 'visitor'], default='listener',
+                            help='translate with Throbac2CTranslator (listener, the default) '
+                                 'or Throbac2CVisitor (visitor)')
+    arg_parser.add_argument('--fold-constants', action='store_true',
+                            help='evaluate literal-only NUMERUS, VERITAS and LOCUTIO expressions '
+                                 'during translation')
+    arg_parser.add_argument('--counted-strings', action='store_true',
+                            help='translate LOCUTIO to length-prefixed __throbac_string')
+    arg_parser.add_argument('--intern-strings', action='store_true',
+                            help='emit each distinct string literal once, in a table of constants')
+    arg_parser.add_argument('--typed', action='store_true',
+                            help='type check, then compare LOCUTIO by content and print VERITAS values')
+    arg_parser.add_argument('--stats', metavar='FILE',
+                            help='write per-file and total timings and counters as JSON to FILE '
+                                 '(- for standard output)')
+    args = arg_parser.parse_args()
+    file_stats = {}
+
     if not os.path.exists(C_DIR):
         os.makedirs(C_DIR)
     else:
@@ -32,28 +141,68 @@ if __name__ == '__main__':
     for throbac_name in os.listdir(THROBAC_DIR):
         if throbac_name.endswith('.throbac'):
             throbac_path = os.path.join(THROBAC_DIR, throbac_name)
+            # the timings are only recorded with --stats, since lexing
+            # separately from parsing is slightly slower
+            stats = {} if args.stats else None
             try:
+                dfa_states = dfa_state_count()
                 parse_tree = generic_parser.parse(throbac_path, 'script',
                                                   ThrobacLexer, ThrobacParser,
-                                                  from_file=True)
-                walker = ParseTreeWalker()
-                translator = Throbac2CTranslator()
+                                                  from_file=True, stats=stats)
+                if stats is not None:
+                    stats['nodes'] = node_count(parse_tree)
+                    stats['dfa_states_added'] = dfa_state_count() - dfa_states
 
                 # -----------------------------------------------------------
-                # translation happens here; the generated C is stored as
-                # parse_tree.c
-                walker.walk(translator, parse_tree)
+                # translation happens here
+                constants = None
+                if args.fold_constants:
+                    with timed(stats, 'fold'):
+                        constants = fold_constants(parse_tree)
+                types = None
+                if args.typed:
+                    with timed(stats, 'type_check'):
+                        types = infer_types(parse_tree)
+                with timed(stats, 'walk'), profiled('walk', throbac_path):
+                    if args.translator == 'visitor':
+                        visitor = Throbac2CVisitor(constants, args.counted_strings, args.intern_strings, types)
+                        c_text = visitor.visit(parse_tree)
+                    else:
+                        walker = DispatchTableWalker()
+                        translator = Throbac2CTranslator(constants, args.counted_strings,
+                                                         args.intern_strings, types)
+                        walker.walk(translator, parse_tree)
+                        c_text = translator.c_translation[parse_tree]
                 # -----------------------------------------------------------
 
-                c_name = '.'.join(throbac_name.split('.')[:-1]) + '.c'
-                c_path = os.path.join(C_DIR, c_name)
-                with open(c_path, 'w') as python_file:
-                    python_file.write(translator.c_translation[parse_tree])
+                with timed(stats, 'write'):
+                    c_name = '.'.join(throbac_name.split('.')[:-1]) + '.c'
+                    c_path = os.path.join(C_DIR, c_name)
+                    with open(c_path, 'w') as python_file:
+                        python_file.write(c_text)
 
             except generic_parser.SyntaxErrors as e:
                 print(f'\nSyntax errors in {throbac_path}\n\n{str(e)}',
                       file=sys.stderr)
 
+            except TypeErrors as e:
+                print(f'\nType errors in {throbac_path}\n\n{str(e)}',
+                      file=sys.stderr)
+
             except Exception as e:
                 print(f'\nError processing {throbac_path}\n\n{traceback.format_exc()}',
                       file=sys.stderr)
+
+            if stats is not None:
+                stats['time'] = sum(stats.get(stage, 0.0) for stage in STAGES)
+                # the process's peak so far, so the first file to reach it raised it
+                stats['peak_rss_kb'] = peak_rss_kb()
+                file_stats[throbac_path] = stats
+
+    if args.stats:
+        report = json.dumps(stats_report(file_stats), indent=2)
+        if args.stats == '-':
+            print(report)
+        else:
+            with open(args.stats, 'w') as stats_file:
+                stats_file.write(report + '\n')
@@ -0,0 +1,114 @@
+"""
+An optional constant-folding stage for Throbac parse trees. Walking a
+`ConstantFolder` over a tree records, in `self.values`, the value of every
+expression node built only from `NUMBER` and `BOOL` literals, as a Python
+`int` or `bool`, and of every `IUNGO` chain of `STRING` literals, as a `str`.
+The translators accept this dictionary and emit the folded value in place of
+the expression, so a literal-only concatenation costs no `__throbac_cat` call
+(and no allocation) at run time.
+
+Arithmetic follows C `int` semantics: division truncates toward zero, and
+anything that would divide by zero or leave the 32-bit range is left for the
+C compiler (and program) to deal with, as before. VERITAS operands are only
+folded for IDEM and NI.IDEM.
+"""
+
+from antlr4 import DispatchTableWalker
+from throbac.ThrobacListener import ThrobacListener
+from throbac.ThrobacParser import ThrobacParser
+from throbac2c import DIGIT_MAP
+
+INT_MIN = -2 ** 31
+INT_MAX = 2 ** 31 - 1
+
+INT_COMPARISONS = {'IDEM': lambda a, b: a == b, 'NI.IDEM': lambda a, b: a != b,
+                   'INFRA': lambda a, b: a < b, 'INFRA.IDEM': lambda a, b: a <= b,
+                   'SUPRA': lambda a, b: a > b, 'SUPRA.IDEM': lambda a, b: a >= b}
+
+
+def fold_constants(parse_tree):
+    """
+    Returns the folded values of the constant expressions in `parse_tree`.
+    """
+    folder = ConstantFolder()
+    DispatchTableWalker().walk(folder, parse_tree)
+    return folder.values
+
+
+def is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def c_int(value):
+    """
+    `value` if it fits in a C `int`, otherwise None so nothing is folded.
+    """
+    return value if INT_MIN <= value <= INT_MAX else None
+
+
+def c_divide(dividend, divisor):
+    """
+    Integer division truncating toward zero, as in C.
+    """
+    quotient = abs(dividend) // abs(divisor)
+    return quotient if (dividend < 0) == (divisor < 0) else -quotient
+
+
+class ConstantFolder(ThrobacListener):
+
+    def __init__(self):
+        self.values = {}
+
+    def record(self, ctx, value):
+        if value is not None:
+            self.values[ctx] = value
+
+    def exitNumber(self, ctx: ThrobacParser.NumberContext):
+        throbac_digits = ctx.getText().strip('.').split('.')
+        self.record(ctx, c_int(int(''.join(DIGIT_MAP[td] for td in throbac_digits))))
+
+    def exitBool(self, ctx: ThrobacParser.BoolContext):
+        self.values[ctx] = ctx.getText() == 'VERUM'
+
+    def exitString(self, ctx: ThrobacParser.StringContext):
+        self.values[ctx] = ctx.getText().strip('^').replace('+', '\n')
+
+    def exitParens(self, ctx: ThrobacParser.ParensContext):
+        self.record(ctx, self.values.get(ctx.expr()))
+
+    def exitNegation(self, ctx: ThrobacParser.NegationContext):
+        value = self.values.get(ctx.expr())
+        if ctx.op.text == 'NI' and isinstance(value, bool):
+            self.values[ctx] = not value
+        elif ctx.op.text == 'NEGANS' and is_int(value):
+            self.record(ctx, c_int(-value))
+
+    def exitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        left = self.values.get(ctx.expr(0))
+        right = self.values.get(ctx.expr(1))
+        if not (is_int(left) and is_int(right)):
+            return
+        if ctx.op.text == 'CONGERO':
+            self.record(ctx, c_int(left * right))
+        elif right != 0:
+            self.record(ctx, c_int(c_divide(left, right)))
+
+    def exitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        left = self.values.get(ctx.expr(0))
+        right = self.values.get(ctx.expr(1))
+        if is_int(left) and is_int(right):
+            self.record(ctx, c_int(left + right if ctx.op.text == 'ADDO' else left - right))
+
+    def exitCompare(self, ctx: ThrobacParser.CompareContext):
+        left = self.values.get(ctx.expr(0))
+        right = self.values.get(ctx.expr(1))
+        if is_int(left) and is_int(right):
+            self.values[ctx] = INT_COMPARISONS[ctx.op.text](left, right)
+        elif isinstance(left, bool) and isinstance(right, bool) and ctx.op.text in ('IDEM', 'NI.IDEM'):
+            self.values[ctx] = INT_COMPARISONS[ctx.op.text](left, right)
+
+    def exitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
+        left = self.values.get(ctx.expr(0))
+        right = self.values.get(ctx.expr(1))
+        if isinstance(left, str) and isinstance(right, str):
+            self.values[ctx] = left + right
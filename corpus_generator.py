@@ -0,0 +1,314 @@
+"""
+Generates large, valid, type-correct Throbac scripts for benchmarking and
+fuzzing. The generator follows the structure of `Throbac.g4`: a script is
+funcDefs followed by main, a body is a varBlock followed by a block, and
+statements and expressions are chosen among the grammar's alternatives,
+each expression built for the type its context needs.
+
+`GeneratorOptions` tunes the number of functions, the nesting depth of SI
+and DUM blocks, the number of statements per block, the number of
+operators per expression and the length of string literals. The output
+depends only on the options, including `seed`.
+
+`generate` yields the script one funcDef at a time and `write_corpus`
+streams it to a file, so scripts of any size are produced in constant
+memory: the signature of function i is drawn from its own seeded random
+generator, so calls to it can be generated without keeping a table of
+functions. A function only calls the few functions defined just before it
+whose call level (the index modulo `CALL_LEVELS`) is lower than its own,
+and never from inside a DUM loop, so a call runs at most a bounded number
+of others however many functions there are. DUM loops count a dedicated
+variable up to a small bound, every variable is assigned before it's used,
+and PARTIO divides by non-zero literals, so the programs terminate quickly.
+NUMERUS arithmetic may overflow.
+
+    python corpus_generator.py --functions 1000 --depth 4 -o big.throbac
+    python corpus_generator.py --megabytes 2048 --seed 7 -o huge.throbac
+
+Version: 2026-10-19
+"""
+
+import argparse
+from dataclasses import dataclass
+import random
+import sys
+
+from throbac2c import DIGIT_MAP
+
+NUMERUS = 'NUMERUS'
+LOCUTIO = 'LOCUTIO'
+VERITAS = 'VERITAS'
+TYPES = [NUMERUS, LOCUTIO, VERITAS]
+
+THROBAC_DIGITS = {digit: throbac for throbac, digit in DIGIT_MAP.items()}
+STRING_CHARACTERS = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ.+'
+
+COMPARE_OPS = ['IDEM', 'NI.IDEM', 'INFRA', 'INFRA.IDEM', 'SUPRA', 'SUPRA.IDEM']
+
+# how many of the preceding functions a function may call
+CALL_WINDOW = 8
+# a function calls only functions of a lower level, so calls nest at most
+# this deep below main
+CALL_LEVELS = 4
+# variables of each type declared in every body
+VARIABLES_PER_TYPE = 2
+MAX_PARAMETERS = 3
+LOOP_BOUND = 3
+
+
+def throbac_number(value):
+    return '.' + '.'.join(THROBAC_DIGITS[digit] for digit in str(value)) + '.'
+
+
+def throbac_name(index, prefix='zz'):
+    """
+    A Throbac ID for `index`, in lower case letters. The 'zz' prefix keeps
+    it clear of C and Python keywords and the runtime's functions.
+    """
+    letters = ''
+    while True:
+        letters = chr(ord('a') + index % 26) + letters
+        index //= 26
+        if index == 0:
+            return prefix + letters
+
+
+@dataclass
+class GeneratorOptions:
+    functions: int = 10
+    depth: int = 3
+    statements: int = 4
+    expression_size: int = 4
+    string_length: int = 8
+    seed: int = 0
+
+
+@dataclass
+class Signature:
+    name: str
+    parameter_types: list
+    return_type: str  # None if the function has no PRAEBET type
+
+
+def signature(options, index):
+    """
+    The signature of function `index`, which depends only on the seed and
+    the index.
+    """
+    rng = random.Random(f'{options.seed}:signature:{index}')
+    parameter_types = [rng.choice(TYPES) for _ in range(rng.randint(0, MAX_PARAMETERS))]
+    return Signature(throbac_name(index, 'zzf'), parameter_types, rng.choice(TYPES + [None]))
+
+
+class BodyGenerator:
+    """
+    Generates a function's body, or main's, which can call the functions
+    numbered `callable_indices` outside of DUM loops.
+    """
+
+    def __init__(self, options, rng, callable_indices, parameters=(), return_type=None):
+        self.options = options
+        self.rng = rng
+        self.callees = [signature(options, i) for i in callable_indices]
+        self.return_type = return_type
+        # how many DUM loops the statement being generated is in
+        self.loops = 0
+        # type -> names of the variables and parameters of that type
+        self.names = {t: [] for t in TYPES}
+        for name, t in parameters:
+            self.names[t].append(name)
+        self.locals = []
+        for t in TYPES:
+            for i in range(VARIABLES_PER_TYPE):
+                name = throbac_name(i, 'zz' + t[0].lower())
+                self.names[t].append(name)
+                self.locals.append((name, t))
+        self.loop_variables = [throbac_name(depth, 'zzi') for depth in range(options.depth)]
+
+    def body(self):
+        lines = [f'{name} : {t} MUTABILIS' for name, t in self.locals]
+        lines.extend(f'{name} : {NUMERUS} MUTABILIS' for name in self.loop_variables)
+        lines.extend(f'{name} {self.literal(t)} VALORUM' for name, t in self.locals)
+        lines.extend(self.block(0))
+        if self.return_type is not None:
+            lines.append(f'{self.expr(self.return_type, self.options.expression_size)} REDEO')
+        return lines
+
+    def block(self, depth):
+        lines = []
+        for _ in range(self.rng.randint(1, self.options.statements)):
+            lines.extend(self.statement(depth))
+        return lines
+
+    def statement(self, depth):
+        size = self.options.expression_size
+        choices = ['assignment', 'print', 'print', 'call']
+        if depth < self.options.depth:
+            choices += ['while', 'if', 'if']
+        choice = self.rng.choice(choices)
+        if choice == 'assignment':
+            t = self.rng.choice(TYPES)
+            return [f'{self.rng.choice(self.names[t])} {self.expr(t, size)} VALORUM']
+        if choice == 'print':
+            t = self.rng.choice(TYPES)
+            return [f'{self.expr(t, size)} {t}.IMPRIMO']
+        if choice == 'call' and self.callees and not self.loops:
+            return [self.call(self.rng.choice(self.callees), size)]
+        if choice == 'while':
+            counter = self.loop_variables[depth]
+            lines = [f'{counter} .NIL. VALORUM',
+                     f'{counter} INFRA {throbac_number(self.rng.randint(1, LOOP_BOUND))} DUM >']
+            self.loops += 1
+            lines += self.block(depth + 1)
+            self.loops -= 1
+            return lines + [f'{counter} {counter} ADDO .I. VALORUM', '<']
+        if choice == 'if':
+            lines = [f'{self.expr(VERITAS, size)} SI >'] + self.block(depth + 1) + ['<']
+            if self.rng.random() < 0.5:
+                lines += ['ALUID >'] + self.block(depth + 1) + ['<']
+            return lines
+        return [f'{self.expr(NUMERUS, size)} NUMERUS.IMPRIMO']
+
+    def literal(self, t):
+        if t == NUMERUS:
+            return throbac_number(self.rng.randint(0, 999))
+        if t == LOCUTIO:
+            length = self.rng.randint(1, max(1, self.options.string_length))
+            return '^' + ''.join(self.rng.choice(STRING_CHARACTERS) for _ in range(length)) + '^'
+        return self.rng.choice(['VERUM', 'FALSUM'])
+
+    def operand(self, t, size):
+        # compound operands are parenthesized, so the parse matches the types
+        expr = self.expr(t, size)
+        return f'({expr})' if ' ' in expr else expr
+
+    def expr(self, t, size):
+        """
+        An expression of type `t` with at most `size` operators.
+        """
+        rng = self.rng
+        if size <= 0 or rng.random() < 0.2:
+            return self.literal(t) if rng.random() < 0.5 else rng.choice(self.names[t])
+        size -= 1
+        left_size = rng.randint(0, size)
+        right_size = size - left_size
+        callees = [callee for callee in self.callees if callee.return_type == t and not self.loops]
+        if callees and rng.random() < 0.15:
+            return self.call(rng.choice(callees), size)
+        if t == NUMERUS:
+            choice = rng.choice(['addSub', 'addSub', 'mulDiv', 'negation', 'stringlength'])
+            if choice == 'addSub':
+                return (f'{self.operand(NUMERUS, left_size)} {rng.choice(["ADDO", "SUBTRAHO"])} '
+                        f'{self.operand(NUMERUS, right_size)}')
+            if choice == 'mulDiv':
+                if rng.random() < 0.5:
+                    return f'{self.operand(NUMERUS, left_size)} CONGERO {self.operand(NUMERUS, right_size)}'
+                return f'{self.operand(NUMERUS, size)} PARTIO {throbac_number(rng.randint(1, 9))}'
+            if choice == 'negation':
+                return f'NEGANS {self.operand(NUMERUS, size)}'
+            return f'APUD {self.expr(LOCUTIO, size)} VOCO stringlength'
+        if t == LOCUTIO:
+            if rng.random() < 0.2:
+                literal = self.literal(LOCUTIO)
+                start = rng.randint(0, len(literal) - 3)
+                length = rng.randint(0, len(literal) - 2 - start)
+                return f'APUD {literal}, {throbac_number(start)}, {throbac_number(length)} VOCO substring'
+            return f'{self.operand(LOCUTIO, left_size)} IUNGO {self.operand(LOCUTIO, right_size)}'
+        choice = rng.choice(['negation', 'compare', 'compare'])
+        if choice == 'negation':
+            return f'NI {self.operand(VERITAS, size)}'
+        compared = rng.choice(TYPES)
+        op = rng.choice(COMPARE_OPS if compared != VERITAS else COMPARE_OPS[:2])
+        return f'{self.operand(compared, left_size)} {op} {self.operand(compared, right_size)}'
+
+    def call(self, callee, size):
+        if not callee.parameter_types:
+            return f'VOCO {callee.name}'
+        arguments = ', '.join(self.expr(t, size // len(callee.parameter_types))
+                              for t in callee.parameter_types)
+        return f'APUD {arguments} VOCO {callee.name}'
+
+
+def callable_indices(index, level):
+    """
+    The functions that function `index`, or main, may call: those in the
+    window before `index` with a call level below `level`.
+    """
+    return [i for i in range(max(0, index - CALL_WINDOW), index) if i % CALL_LEVELS < level]
+
+
+def func_def(options, index):
+    """
+    The source of function `index`.
+    """
+    function = signature(options, index)
+    rng = random.Random(f'{options.seed}:body:{index}')
+    parameters = [(throbac_name(i, 'zzp'), t) for i, t in enumerate(function.parameter_types)]
+    generator = BodyGenerator(options, rng, callable_indices(index, index % CALL_LEVELS),
+                              parameters, function.return_type)
+    header = ', '.join(f'{name} : {t}' for name, t in parameters)
+    header = f'APUD {header} DEFINITIO {function.name}' if parameters else f'DEFINITIO {function.name}'
+    if function.return_type is not None:
+        header += f' PRAEBET {function.return_type}'
+    return '\n'.join([header + ' >'] + generator.body() + ['<']) + '\n'
+
+
+def main_body(options, function_count):
+    rng = random.Random(f'{options.seed}:main')
+    generator = BodyGenerator(options, rng, callable_indices(function_count, CALL_LEVELS))
+    return '\n'.join(generator.body()) + '\n'
+
+
+def generate(options, max_bytes=None):
+    """
+    Yields a script in pieces: each funcDef, then main. With `max_bytes`,
+    funcDefs are generated until the script is about that long, instead of
+    `options.functions` of them.
+    """
+    length = 0
+    index = 0
+    while index < options.functions if max_bytes is None else length < max_bytes:
+        piece = func_def(options, index)
+        length += len(piece)
+        index += 1
+        yield piece
+    yield main_body(options, index)
+
+
+def write_corpus(out, options, max_bytes=None):
+    """
+    Writes a generated script to the file `out`, returning its length.
+    """
+    length = 0
+    for piece in generate(options, max_bytes):
+        out.write(piece)
+        length += len(piece)
+    return length
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Generate a type-correct Throbac script.')
+    arg_parser.add_argument('--functions', type=int, default=GeneratorOptions.functions,
+                            help='the number of funcDefs')
+    arg_parser.add_argument('--megabytes', type=float,
+                            help='generate funcDefs until the script is about this big, instead')
+    arg_parser.add_argument('--depth', type=int, default=GeneratorOptions.depth,
+                            help='the deepest nesting of SI and DUM blocks')
+    arg_parser.add_argument('--statements', type=int, default=GeneratorOptions.statements,
+                            help='the most statements per block')
+    arg_parser.add_argument('--expression-size', type=int, default=GeneratorOptions.expression_size,
+                            help='the most operators per expression')
+    arg_parser.add_argument('--string-length', type=int, default=GeneratorOptions.string_length,
+                            help='the longest string literal')
+    arg_parser.add_argument('--seed', type=int, default=GeneratorOptions.seed)
+    arg_parser.add_argument('-o', '--output', default='-', help='the output file (- for standard output)')
+    args = arg_parser.parse_args()
+
+    options = GeneratorOptions(args.functions, args.depth, args.statements, args.expression_size,
+                               args.string_length, args.seed)
+    max_bytes = int(args.megabytes * 1024 * 1024) if args.megabytes is not None else None
+    if args.output == '-':
+        write_corpus(sys.stdout, options, max_bytes)
+    else:
+        with open(args.output, 'w') as out:
+            write_corpus(out, options, max_bytes)
@@ -8,11 +8,13 @@ Version: 2021-01-24
 """
 
 from dataclasses import dataclass
+import time
 
 from antlr4 import FileStream, InputStream, CommonTokenStream, Recognizer, RecognitionException, Token
+from profiling import profiled
 
 
-def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=False):
+def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=False, stats=None):
     """
     Creates a parser on the provided source or source file, adds a `SyntaxErrorLog` as
     error listener at both the lex and parse stages, and attempts the parse from the given
@@ -24,29 +26,46 @@ def parse(source_or_path, start_rule_name, lexer_class, parser_class, from_file=
     :param lexer_class: A generated ANTLR lexer class
     :param parser_class: A generated ANTLR parser class
     :param from_file: True if input is a file
+    :param stats: A dictionary to record the seconds taken to lex (including
+        reading the source) and to parse in, as 'lex' and 'parse', and the
+        number of tokens as 'tokens'. The source is then lexed completely
+        before parsing starts, rather than as the parser asks for tokens.
     :return: The computed ANTLR parse tree
+
+    Runs under `profiling.profiled`, so slow parses can be profiled.
     """
-    if from_file:
-        character_stream = FileStream(source_or_path)
-    else:
-        character_stream = InputStream(source_or_path)
-    lexer = lexer_class(character_stream)
-    token_stream = CommonTokenStream(lexer)
-    parser = parser_class(token_stream)
-
-    lexer.removeErrorListeners()
-    parser.removeErrorListeners()
-    error_log = SyntaxErrorLog()
-    lexer.addErrorListener(error_log)
-    parser.addErrorListener(error_log)
-
-    parse_function = parser.__getattribute__(start_rule_name)
-    parse_tree = parse_function()
-
-    if error_log.has_errors():
-        raise SyntaxErrors(error_log, parse_tree)
-    else:
-        return parse_tree
+    with profiled('parse', source_or_path if from_file else start_rule_name):
+        start = time.perf_counter()
+        if from_file:
+            character_stream = FileStream(source_or_path)
+        else:
+            character_stream = InputStream(source_or_path)
+        lexer = lexer_class(character_stream)
+        token_stream = CommonTokenStream(lexer)
+        parser = parser_class(token_stream)
+
+        lexer.removeErrorListeners()
+        parser.removeErrorListeners()
+        error_log = SyntaxErrorLog()
+        lexer.addErrorListener(error_log)
+        parser.addErrorListener(error_log)
+
+        if stats is not None:
+            token_stream.fill()
+            stats['tokens'] = len(token_stream.tokens)
+            stats['lex'] = time.perf_counter() - start
+            start = time.perf_counter()
+
+        parse_function = parser.__getattribute__(start_rule_name)
+        parse_tree = parse_function()
+
+        if stats is not None:
+            stats['parse'] = time.perf_counter() - start
+
+        if error_log.has_errors():
+            raise SyntaxErrors(error_log, parse_tree)
+        else:
+            return parse_tree
 
 
 class SyntaxErrors(Exception):
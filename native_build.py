@@ -0,0 +1,177 @@
+"""
+Compiles the C programs that `bulk_translate.py` writes to `C_DIR` into
+executables in `BUILD_DIR`. The runtime, `C/throbac.c`, is compiled once and
+linked into each program, and the programs are compiled in parallel.
+
+Every object and executable is cached in `CACHE_DIR` under a hash of
+everything that goes into it: the C source, `throbac.h` and the compiler
+flags for an object, and the objects' hashes for an executable. A program
+that hasn't changed since it was last built is copied out of the cache
+without running gcc.
+
+Pass `-O0` to `-O3` (`-O2` is the default) to set the optimization level,
+`--jobs` to set how many compilers run at once, and `--cc` to use a compiler
+other than gcc.
+
+Version: 2026-10-19
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import threading
+
+# the runtime and the build are found next to this file, wherever it's run
+# from; C_DIR is where bulk_translate.py writes, in the working directory
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RUNTIME_DIR = os.path.join(REPO_DIR, 'C')
+C_DIR = 'generated_c'
+BUILD_DIR = os.path.join(REPO_DIR, 'build')
+CACHE_DIR = os.path.join(BUILD_DIR, 'cache')
+
+RUNTIME_SOURCE = os.path.join(RUNTIME_DIR, 'throbac.c')
+RUNTIME_HEADER = os.path.join(RUNTIME_DIR, 'throbac.h')
+
+
+class BuildError(Exception):
+
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+
+    def __repr__(self):
+        return f'{self.path}\n\n{self.message}'
+
+    __str__ = __repr__
+
+
+def cache_key(*parts):
+    """
+    A hash of the given strings, as the name of a cached file.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode())
+        # separates the parts, so ('ab', 'c') and ('a', 'bc') differ
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def run_compiler(command, path):
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise BuildError(path, result.stderr)
+
+
+def cached(key, suffix, cache_dir, build):
+    """
+    The path of the cached file (or directory) for `key`, calling
+    `build(path)` to create it first if it isn't cached. The file is built
+    under a temporary name and then renamed, so an interrupted build never
+    leaves a bad file in the cache. Several threads or processes may build
+    the same key at once: each builds under its own name, and whichever
+    renames its file last wins.
+    """
+    path = os.path.join(cache_dir, key + suffix)
+    if not os.path.exists(path):
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            build(temporary_path)
+            try:
+                os.replace(temporary_path, path)
+            except OSError:
+                # a directory can't replace one that another build just made
+                if not os.path.exists(path):
+                    raise
+        finally:
+            if os.path.isdir(temporary_path):
+                shutil.rmtree(temporary_path)
+            elif os.path.exists(temporary_path):
+                os.remove(temporary_path)
+    return path
+
+
+def compile_object(c_path, flags, cc='gcc', cache_dir=CACHE_DIR):
+    """
+    Compiles the C file at `c_path` to an object, returning its key and its
+    path in the cache. Raises a `BuildError` if it doesn't compile.
+    """
+    with open(c_path) as c_file, open(RUNTIME_HEADER) as header_file:
+        key = cache_key(cc, *flags, header_file.read(), c_file.read())
+    path = cached(key, '.o', cache_dir,
+                  lambda object_path: run_compiler([cc, *flags, '-I', RUNTIME_DIR, '-c', c_path,
+                                                    '-o', object_path], c_path))
+    return key, path
+
+
+def link(program_object, runtime_object, cc='gcc', cache_dir=CACHE_DIR):
+    """
+    Links a program's object with the runtime's, each given as the (key,
+    path) from `compile_object`, returning the path of the cached executable.
+    """
+    key = cache_key(cc, program_object[0], runtime_object[0])
+    return cached(key, '', cache_dir,
+                  lambda executable_path: run_compiler([cc, program_object[1], runtime_object[1],
+                                                        '-o', executable_path], program_object[1]))
+
+
+def build(c_paths, optimization='2', jobs=None, cc='gcc', build_dir=BUILD_DIR, cache_dir=CACHE_DIR):
+    """
+    Builds an executable in `build_dir` for each of the C files in
+    `c_paths`, named after it. Returns the executables' paths, and a
+    `BuildError` for each file that failed, keyed by its C path.
+    `optimization` is the level that follows gcc's -O.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.makedirs(build_dir, exist_ok=True)
+    flags = [f'-O{optimization}']
+    runtime_object = compile_object(RUNTIME_SOURCE, flags, cc, cache_dir)
+
+    def build_one(c_path):
+        executable = link(compile_object(c_path, flags, cc, cache_dir), runtime_object, cc, cache_dir)
+        program_path = os.path.join(build_dir, os.path.splitext(os.path.basename(c_path))[0])
+        try:
+            shutil.copy2(executable, program_path)
+        except OSError as e:
+            raise BuildError(c_path, f'could not copy {executable} to {program_path}: {e}') from e
+        return program_path
+
+    # the compilers are subprocesses, so threads are enough to run them in parallel
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {c_path: executor.submit(build_one, c_path) for c_path in c_paths}
+    programs = {}
+    errors = {}
+    for c_path, future in futures.items():
+        try:
+            programs[c_path] = future.result()
+        except BuildError as e:
+            errors[c_path] = e
+    return programs, errors
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Compile the translated C programs.')
+    arg_parser.add_argument('-O', dest='optimization', default='2', choices=['0', '1', '2', '3', 's'],
+                            help='the optimization level, as for gcc (-O2 by default)')
+    arg_parser.add_argument('--jobs', type=int, default=None,
+                            help='how many files to compile at once (by default, one per CPU)')
+    arg_parser.add_argument('--cc', default='gcc', help='the C compiler')
+    args = arg_parser.parse_args()
+
+    c_paths = sorted(os.path.join(C_DIR, c_name) for c_name in os.listdir(C_DIR)
+                     if c_name.endswith('.c'))
+    try:
+        programs, errors = build(c_paths, args.optimization, args.jobs, args.cc)
+    except BuildError as e:
+        print(f'\nError compiling the runtime {str(e)}', file=sys.stderr)
+        sys.exit(1)
+
+    for c_path, e in errors.items():
+        print(f'\nError compiling {str(e)}', file=sys.stderr)
+    for c_path, program_path in programs.items():
+        print(f'{c_path} -> {program_path}')
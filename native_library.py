@@ -0,0 +1,183 @@
+"""
+Runs the functions of a Throbac script in this process: `load_library`
+translates the script with `Throbac2CTranslator`, compiles its functions
+(without main) and `C/throbac.c` into a shared library, and returns a
+`ThrobacLibrary` whose attributes call them through ctypes.
+
+    library = load_library(source)
+    library.factorial(5)
+
+NUMERUS, VERITAS and LOCUTIO arguments and results are Python ints, bools
+and strs. A LOCUTIO result is copied out of the runtime's arena, which is
+then released to where it was before the call, so calling a function
+millions of times doesn't grow the arena. What the functions print goes to
+the C stdout, which `ThrobacLibrary.flush` flushes.
+
+Compiled libraries are kept in an on-disk cache in `CACHE_DIR` keyed by a
+hash of the source, the runtime, the compiler flags and the translator's
+modules (`translation_cache.TRANSLATOR_VERSION`), along with the functions'
+signatures, so loading a cached script neither parses nor compiles, and a
+changed translator never loads a library that an older one translated. The
+cache holds at most `MAX_CACHED_LIBRARIES`, evicting the least recently
+loaded.
+
+Version: 2026-10-19
+"""
+
+import ctypes
+import json
+import os
+import os.path
+import shutil
+
+import generic_parser
+from antlr4 import DispatchTableWalker
+from native_build import BUILD_DIR, RUNTIME_DIR, RUNTIME_HEADER, RUNTIME_SOURCE, cache_key, cached, run_compiler
+from semantic_analysis import infer_types
+from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacParser import ThrobacParser
+from throbac2c import Throbac2CTranslator, c_string_table
+from translation_cache import TRANSLATOR_VERSION
+
+CACHE_DIR = os.path.join(BUILD_DIR, 'libraries')
+MAX_CACHED_LIBRARIES = 64
+
+C_TYPES = {'NUMERUS': ctypes.c_int, 'LOCUTIO': ctypes.c_char_p, 'VERITAS': ctypes.c_bool, None: None}
+
+# cache key -> ThrobacLibrary, for the libraries already loaded by this process
+loaded_libraries = {}
+
+
+def library_c(source):
+    """
+    The C for the functions of the Throbac script `source`, and their
+    signatures as {name: [parameter types, return type]}. LOCUTIO values are
+    compared by content, as with `bulk_translate.py --typed`.
+    """
+    parse_tree = generic_parser.parse(source, 'script', ThrobacLexer, ThrobacParser)
+    translator = Throbac2CTranslator(types=infer_types(parse_tree))
+    DispatchTableWalker().walk(translator, parse_tree)
+
+    func_defs = [translator.c_translation[func_def] for func_def in parse_tree.funcDef()]
+    # the same declarations exitScript makes, so the functions can call each other
+    declarations = ''.join(f'\n{func_def.splitlines()[0][:-2]};' for func_def in func_defs)
+    c_text = ('#include <stdio.h>\n#include <stdbool.h>\n#include "throbac.h"\n'
+              + c_string_table(translator.string_literals)
+              + declarations + '\n\n' + '\n'.join(func_defs) + '\n')
+
+    signatures = {}
+    for func_def in parse_tree.funcDef():
+        parameter_types = [name_def.TYPE().getText() for name_def in func_def.nameDef()]
+        return_type = func_def.TYPE().getText() if func_def.TYPE() is not None else None
+        signatures[func_def.ID().getText()] = [parameter_types, return_type]
+    return c_text, signatures
+
+
+def compile_library(source, optimization='2', cc='gcc', cache_dir=CACHE_DIR):
+    """
+    The cache key and cache directory of the compiled library for `source`,
+    compiling it first if it isn't cached. Raises a `native_build.BuildError`
+    if it doesn't compile.
+    """
+    flags = [f'-O{optimization}', '-shared', '-fPIC']
+    with open(RUNTIME_HEADER) as header_file, open(RUNTIME_SOURCE) as runtime_file:
+        key = cache_key(TRANSLATOR_VERSION, cc, *flags, header_file.read(), runtime_file.read(), source)
+
+    def build(library_dir):
+        os.makedirs(library_dir)
+        c_text, signatures = library_c(source)
+        c_path = os.path.join(library_dir, 'library.c')
+        with open(c_path, 'w') as c_file:
+            c_file.write(c_text)
+        with open(os.path.join(library_dir, 'signatures.json'), 'w') as signatures_file:
+            json.dump(signatures, signatures_file)
+        run_compiler([cc, *flags, '-I', RUNTIME_DIR, c_path, RUNTIME_SOURCE,
+                      '-o', os.path.join(library_dir, 'library.so')], c_path)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    library_dir = cached(key, '', cache_dir, build)
+    # the directory's modification time is its last use, for evict_libraries
+    os.utime(library_dir)
+    return key, library_dir
+
+
+def evict_libraries(cache_dir=CACHE_DIR, keep=MAX_CACHED_LIBRARIES):
+    """
+    Removes all but the `keep` most recently used libraries from the cache.
+    """
+    library_dirs = [os.path.join(cache_dir, name) for name in os.listdir(cache_dir)
+                    if not name.endswith('.tmp')]
+    library_dirs.sort(key=os.path.getmtime, reverse=True)
+    for library_dir in library_dirs[keep:]:
+        # a library that's loaded stays mapped after its file is removed
+        shutil.rmtree(library_dir, ignore_errors=True)
+
+
+def load_library(source, optimization='2', cc='gcc', cache_dir=CACHE_DIR):
+    """
+    A `ThrobacLibrary` for the functions of the Throbac script `source`.
+    """
+    key, library_dir = compile_library(source, optimization, cc, cache_dir)
+    if key not in loaded_libraries:
+        with open(os.path.join(library_dir, 'signatures.json')) as signatures_file:
+            signatures = json.load(signatures_file)
+        loaded_libraries[key] = ThrobacLibrary(os.path.join(library_dir, 'library.so'), signatures)
+        evict_libraries(cache_dir)
+    return loaded_libraries[key]
+
+
+class ThrobacLibrary:
+    """
+    The functions of a compiled Throbac script, as attributes and in
+    `self.functions`.
+    """
+
+    def __init__(self, path, signatures):
+        self.library = ctypes.CDLL(path)
+        # by item, since self.library.__throbac_* would be name-mangled
+        self.arena_mark = self.library['__throbac_arena_mark']
+        self.arena_mark.restype = ctypes.c_void_p
+        self.arena_release = self.library['__throbac_arena_release']
+        self.arena_release.argtypes = [ctypes.c_void_p]
+        self.functions = {name: self.wrap(name, parameter_types, return_type)
+                          for name, (parameter_types, return_type) in signatures.items()}
+
+    def wrap(self, name, parameter_types, return_type):
+        function = getattr(self.library, name)
+        function.argtypes = [C_TYPES[t] for t in parameter_types]
+        function.restype = C_TYPES[return_type]
+        encoded = [i for i, t in enumerate(parameter_types) if t == 'LOCUTIO']
+        if not encoded and return_type != 'LOCUTIO':
+            # a function that doesn't return a LOCUTIO releases its own strings
+            return function
+
+        mark = self.arena_mark
+        release = self.arena_release
+
+        def call(*arguments):
+            arguments = list(arguments)
+            for i in encoded:
+                arguments[i] = arguments[i].encode()
+            if return_type != 'LOCUTIO':
+                return function(*arguments)
+            arena_top = mark()
+            try:
+                result = function(*arguments)
+                return result.decode() if result is not None else None
+            finally:
+                release(arena_top)
+
+        call.__name__ = name
+        return call
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__['functions'][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def flush(self):
+        """
+        Flushes the C stdout, which the functions print to.
+        """
+        self.library.fflush(None)
@@ -0,0 +1,208 @@
+"""
+Opt-in profiling of individual parses and translation walks. The hook points,
+`generic_parser.parse` and the walks in `bulk_translate.py` and
+`translation_cache`, run in `profiled(stage)`, which does nothing unless
+profiling is on. When it is, each call is profiled, and if it took at least
+the threshold its profile is written to the profile directory, so only
+slow calls leave files behind.
+
+Profiling is turned on for the whole process by setting environment
+variables before it starts:
+
+    THROBAC_PROFILE_DIR           where to write profiles
+    THROBAC_PROFILE_THRESHOLD_MS  the slowest call not written (default 100)
+    THROBAC_PROFILE_FORMAT        pstats (default) or speedscope
+
+or for a block of code with the `profiling` context manager:
+
+    with profiling('profiles', threshold=0.05, format='speedscope'):
+        translate(source)
+
+The pstats format is a `cProfile` profile, for `pstats.Stats` or snakeviz.
+The speedscope format records every call and return, so the timeline at
+https://www.speedscope.app shows the exact call tree; it costs more to
+record than cProfile. Calls are profiled one at a time: a hook point
+reached inside a call being profiled is part of that call's profile.
+
+Version: 2026-10-19
+"""
+
+import cProfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import itertools
+import json
+import os
+import os.path
+import sys
+import threading
+import time
+
+FORMATS = ['pstats', 'speedscope']
+DEFAULT_THRESHOLD = 0.1
+
+
+@dataclass
+class ProfileSettings:
+    directory: str
+    threshold: float = DEFAULT_THRESHOLD  # seconds
+    format: str = 'pstats'
+    # the paths of the profiles written so far
+    written: list = field(default_factory=list)
+
+    def __post_init__(self):
+        if self.format not in FORMATS:
+            raise ValueError(f'profile format must be one of {", ".join(FORMATS)}, not {self.format}')
+
+
+def settings_from_environment(environment=os.environ):
+    """
+    The settings given by the THROBAC_PROFILE_* variables, or None if
+    THROBAC_PROFILE_DIR isn't set.
+    """
+    directory = environment.get('THROBAC_PROFILE_DIR')
+    if not directory:
+        return None
+    threshold = float(environment.get('THROBAC_PROFILE_THRESHOLD_MS', DEFAULT_THRESHOLD * 1000)) / 1000
+    return ProfileSettings(directory, threshold, environment.get('THROBAC_PROFILE_FORMAT', 'pstats'))
+
+
+# None when profiling is off
+settings = settings_from_environment()
+
+# numbers the profile files, which may be written from several threads
+profile_numbers = itertools.count()
+# set in a thread while one of its calls is being profiled
+active = threading.local()
+
+
+@contextmanager
+def profiling(directory, threshold=DEFAULT_THRESHOLD, format='pstats'):
+    """
+    Turns profiling on for the block, returning the `ProfileSettings`,
+    whose `written` lists the profiles written.
+    """
+    global settings
+    previous = settings
+    settings = ProfileSettings(directory, threshold, format)
+    try:
+        yield settings
+    finally:
+        settings = previous
+
+
+@contextmanager
+def profiled(stage, label=None):
+    """
+    Profiles the block if profiling is on, writing the profile if the block
+    took at least the threshold. `stage` names the hook point and `label`
+    (a file name, say) is recorded with the profile.
+    """
+    current = settings
+    if current is None or getattr(active, 'profiling', False):
+        yield
+        return
+
+    recorder = cProfile.Profile() if current.format == 'pstats' else EventRecorder()
+    active.profiling = True
+    try:
+        try:
+            recorder.enable()
+        except Exception:
+            # another profiler may be active (cProfile allows one at a time
+            # since Python 3.12, and EventRecorder won't replace a profile
+            # function), so the block runs unprofiled
+            recorder = None
+        start = time.perf_counter()
+        yield
+    finally:
+        active.profiling = False
+        if recorder is not None:
+            recorder.disable()
+            elapsed = time.perf_counter() - start
+            if elapsed >= current.threshold:
+                write_profile(current, recorder, stage, label, elapsed)
+
+
+def write_profile(current, recorder, stage, label, elapsed):
+    os.makedirs(current.directory, exist_ok=True)
+    name = f'{stage}-{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{next(profile_numbers)}'
+    if current.format == 'pstats':
+        path = os.path.join(current.directory, name + '.pstats')
+        recorder.dump_stats(path)
+    else:
+        path = os.path.join(current.directory, name + '.speedscope.json')
+        title = f'{stage} {label} ({elapsed * 1000:.1f} ms)' if label else f'{stage} ({elapsed * 1000:.1f} ms)'
+        with open(path, 'w') as profile_file:
+            json.dump(recorder.speedscope(title), profile_file)
+    current.written.append(path)
+
+
+class EventRecorder:
+    """
+    Records every Python and built-in call and return in this thread, with
+    `sys.setprofile`, as a speedscope evented profile.
+    """
+
+    def __init__(self):
+        # (name, file, line) -> index in self.frames
+        self.frame_indexes = {}
+        self.frames = []
+        self.events = []
+        # the frame indexes of the calls that are open
+        self.stack = []
+        self.start = None
+
+    def frame_index(self, key):
+        index = self.frame_indexes.get(key)
+        if index is None:
+            index = self.frame_indexes[key] = len(self.frames)
+            self.frames.append({'name': key[0], 'file': key[1], 'line': key[2]})
+        return index
+
+    def record(self, frame, event, arg):
+        if event == 'call':
+            code = frame.f_code
+            key = (code.co_qualname if hasattr(code, 'co_qualname') else code.co_name,
+                   code.co_filename, code.co_firstlineno)
+        elif event == 'c_call':
+            key = (getattr(arg, '__qualname__', repr(arg)), '<built-in>', 0)
+        else:
+            # a return, c_return or c_exception; returns from frames entered
+            # before recording started have nothing to close
+            if self.stack:
+                self.events.append({'type': 'C', 'frame': self.stack.pop(),
+                                    'at': time.perf_counter() - self.start})
+            return
+        index = self.frame_index(key)
+        self.stack.append(index)
+        self.events.append({'type': 'O', 'frame': index, 'at': time.perf_counter() - self.start})
+
+    def enable(self):
+        """
+        Starts recording, raising `RuntimeError` if another profile function
+        is installed in this thread, which `profiled` treats as it does a
+        cProfile that can't start.
+        """
+        if sys.getprofile() is not None:
+            raise RuntimeError('another profile function is already installed')
+        self.start = time.perf_counter()
+        sys.setprofile(self.record)
+
+    def disable(self):
+        sys.setprofile(None)
+        end = time.perf_counter() - self.start
+        # closes what's still open: the call to disable itself, at least
+        while self.stack:
+            self.events.append({'type': 'C', 'frame': self.stack.pop(), 'at': end})
+
+    def speedscope(self, name):
+        end = self.events[-1]['at'] if self.events else 0.0
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': self.frames},
+            'profiles': [{'type': 'evented', 'name': name, 'unit': 'seconds',
+                          'startValue': 0.0, 'endValue': end, 'events': self.events}],
+            'name': name,
+            'exporter': 'throbac profiling',
+        }
@@ -0,0 +1,250 @@
+"""
+A semantic-analysis pass for Throbac parse trees. Walking a `TypeAnnotator`
+over a script builds a symbol table for the functions and a scoped symbol
+table for the parameters and variables of each function (and of the main
+program), and records in `self.types` the Throbac type (`'NUMERUS'`,
+`'LOCUTIO'` or `'VERITAS'`) of every expression node. Calls to functions
+without a PRAEBET type have type None.
+
+Anything that doesn't type check is logged; `infer_types` raises a
+`TypeErrors` exception if anything was.
+"""
+
+from dataclasses import dataclass
+
+from antlr4 import DispatchTableWalker
+from throbac.ThrobacListener import ThrobacListener
+from throbac.ThrobacParser import ThrobacParser
+
+NUMERUS = 'NUMERUS'
+LOCUTIO = 'LOCUTIO'
+VERITAS = 'VERITAS'
+
+
+def infer_types(parse_tree):
+    """
+    Returns the type of every expression in `parse_tree`, keyed by node.
+    Raises a `TypeErrors` exception if the tree doesn't type check.
+    """
+    annotator = TypeAnnotator()
+    DispatchTableWalker().walk(annotator, parse_tree)
+    if annotator.errors:
+        raise TypeErrors(annotator.errors, annotator.types)
+    return annotator.types
+
+
+@dataclass
+class FunctionSymbol:
+    name: str
+    parameter_types: list
+    return_type: str  # None if the function has no PRAEBET type
+
+
+BUILT_IN_FUNCTIONS = {
+    'stringlength': FunctionSymbol('stringlength', [LOCUTIO], NUMERUS),
+    'substring': FunctionSymbol('substring', [LOCUTIO, NUMERUS, NUMERUS], LOCUTIO),
+}
+
+
+class SymbolTable:
+    """
+    The names defined in one scope, and the table of the enclosing scope
+    (None for the outermost).
+    """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.symbols = {}
+
+    def define(self, name, symbol):
+        """
+        Adds `name` to this scope, returning False if it was already there.
+        """
+        if name in self.symbols:
+            return False
+        self.symbols[name] = symbol
+        return True
+
+    def lookup(self, name):
+        """
+        The symbol for `name` in this or an enclosing scope, or None.
+        """
+        table = self
+        while table is not None:
+            if name in table.symbols:
+                return table.symbols[name]
+            table = table.parent
+        return None
+
+
+class TypeErrors(Exception):
+
+    def __init__(self, errors, types):
+        self.errors = errors
+        self.types = types
+
+    def __repr__(self):
+        return '\n'.join([str(e) for e in self.errors])
+
+    __str__ = __repr__
+
+
+@dataclass
+class TypeErrorRecord:
+    line: int
+    column: int
+    message: str
+
+    def __repr__(self):
+        return f'line {self.line} : {self.column} {self.message}'
+
+
+class TypeAnnotator(ThrobacListener):
+
+    def __init__(self):
+        self.types = {}
+        self.errors = []
+        self.functions = SymbolTable()
+        for name, function in BUILT_IN_FUNCTIONS.items():
+            self.functions.define(name, function)
+        self.scope = SymbolTable()
+        # the function whose body is being walked; None in the main program
+        self.function = None
+
+    def error(self, ctx, message):
+        self.errors.append(TypeErrorRecord(ctx.start.line, ctx.start.column, message))
+
+    def expect(self, ctx, expected, what):
+        """
+        Logs an error unless the expression `ctx` has the type `expected`. An
+        expression without a type already has an error logged, so it's skipped.
+        """
+        actual = self.types.get(ctx)
+        if actual is not None and actual != expected:
+            self.error(ctx, f'{what} must be {expected}, not {actual}')
+
+    def enterScript(self, ctx: ThrobacParser.ScriptContext):
+        # functions can be called before they're defined, so all of their
+        # signatures go in the table first
+        for func_def in ctx.funcDef():
+            name = func_def.ID().getText()
+            parameter_types = [name_def.TYPE().getText() for name_def in func_def.nameDef()]
+            return_type = func_def.TYPE().getText() if func_def.TYPE() is not None else None
+            if not self.functions.define(name, FunctionSymbol(name, parameter_types, return_type)):
+                self.error(func_def, f'function {name} is already defined')
+
+    def enterFuncDef(self, ctx: ThrobacParser.FuncDefContext):
+        self.function = self.functions.lookup(ctx.ID().getText())
+        self.scope = SymbolTable(self.scope)
+
+    def exitFuncDef(self, ctx: ThrobacParser.FuncDefContext):
+        self.function = None
+        self.scope = self.scope.parent
+
+    def enterMain(self, ctx: ThrobacParser.MainContext):
+        self.scope = SymbolTable(self.scope)
+
+    def exitMain(self, ctx: ThrobacParser.MainContext):
+        self.scope = self.scope.parent
+
+    def exitNameDef(self, ctx: ThrobacParser.NameDefContext):
+        name = ctx.ID().getText()
+        if not self.scope.define(name, ctx.TYPE().getText()):
+            self.error(ctx, f'{name} is already defined')
+
+    def exitAssignment(self, ctx: ThrobacParser.AssignmentContext):
+        name = ctx.ID().getText()
+        variable_type = self.scope.lookup(name)
+        if variable_type is None:
+            self.error(ctx, f'{name} is not defined')
+        else:
+            self.expect(ctx.expr(), variable_type, f'the value assigned to {name}')
+
+    def exitWhile(self, ctx: ThrobacParser.WhileContext):
+        self.expect(ctx.expr(), VERITAS, 'a DUM condition')
+
+    def exitIf(self, ctx: ThrobacParser.IfContext):
+        self.expect(ctx.expr(), VERITAS, 'an SI condition')
+
+    def exitPrintNumber(self, ctx: ThrobacParser.PrintNumberContext):
+        self.expect(ctx.expr(), NUMERUS, 'the value printed by NUMERUS.IMPRIMO')
+
+    def exitPrintString(self, ctx: ThrobacParser.PrintStringContext):
+        self.expect(ctx.expr(), LOCUTIO, 'the value printed by LOCUTIO.IMPRIMO')
+
+    def exitPrintBool(self, ctx: ThrobacParser.PrintBoolContext):
+        self.expect(ctx.expr(), VERITAS, 'the value printed by VERITAS.IMPRIMO')
+
+    def exitReturn(self, ctx: ThrobacParser.ReturnContext):
+        return_type = self.function.return_type if self.function is not None else None
+        if ctx.expr() is None:
+            if return_type is not None:
+                self.error(ctx, f'{self.function.name} must return a {return_type}')
+        elif return_type is None:
+            self.error(ctx, 'only a function with a PRAEBET type can return a value')
+        else:
+            self.expect(ctx.expr(), return_type, f'the value returned by {self.function.name}')
+
+    def exitNumber(self, ctx: ThrobacParser.NumberContext):
+        self.types[ctx] = NUMERUS
+
+    def exitString(self, ctx: ThrobacParser.StringContext):
+        self.types[ctx] = LOCUTIO
+
+    def exitBool(self, ctx: ThrobacParser.BoolContext):
+        self.types[ctx] = VERITAS
+
+    def exitVariable(self, ctx: ThrobacParser.VariableContext):
+        name = ctx.getText()
+        self.types[ctx] = self.scope.lookup(name)
+        if self.types[ctx] is None:
+            self.error(ctx, f'{name} is not defined')
+
+    def exitParens(self, ctx: ThrobacParser.ParensContext):
+        self.types[ctx] = self.types.get(ctx.expr())
+
+    def exitNegation(self, ctx: ThrobacParser.NegationContext):
+        self.types[ctx] = VERITAS if ctx.op.text == 'NI' else NUMERUS
+        self.expect(ctx.expr(), self.types[ctx], f'the operand of {ctx.op.text}')
+
+    def exitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        self.types[ctx] = NUMERUS
+        for operand in ctx.expr():
+            self.expect(operand, NUMERUS, f'an operand of {ctx.op.text}')
+
+    def exitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        self.types[ctx] = NUMERUS
+        for operand in ctx.expr():
+            self.expect(operand, NUMERUS, f'an operand of {ctx.op.text}')
+
+    def exitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
+        self.types[ctx] = LOCUTIO
+        for operand in ctx.expr():
+            self.expect(operand, LOCUTIO, 'an operand of IUNGO')
+
+    def exitCompare(self, ctx: ThrobacParser.CompareContext):
+        self.types[ctx] = VERITAS
+        left_type = self.types.get(ctx.expr(0))
+        if left_type is not None:
+            self.expect(ctx.expr(1), left_type, f'the right operand of {ctx.op.text}')
+        if left_type == VERITAS and ctx.op.text not in ('IDEM', 'NI.IDEM'):
+            self.error(ctx, 'VERITAS values can only be compared with IDEM and NI.IDEM')
+
+    def exitFuncCallExpr(self, ctx: ThrobacParser.FuncCallExprContext):
+        self.types[ctx] = self.types.get(ctx.funcCall())
+        if self.types[ctx] is None and ctx.funcCall() in self.types:
+            self.error(ctx, f'{ctx.funcCall().ID().getText()} has no PRAEBET type to use as a value')
+
+    def exitFuncCall(self, ctx: ThrobacParser.FuncCallContext):
+        name = ctx.ID().getText()
+        function = self.functions.lookup(name)
+        if function is None:
+            self.error(ctx, f'function {name} is not defined')
+            return
+        self.types[ctx] = function.return_type
+        arguments = ctx.expr()
+        if len(arguments) != len(function.parameter_types):
+            self.error(ctx, f'{name} takes {len(function.parameter_types)} arguments, not {len(arguments)}')
+            return
+        for i, (argument, parameter_type) in enumerate(zip(arguments, function.parameter_types)):
+            self.expect(argument, parameter_type, f'argument {i + 1} of {name}')
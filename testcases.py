@@ -6,22 +6,50 @@ Author: OCdt Aaron Brown and OCdt Liethan Velasco
 Version: February 8 2023
 """
 
+import asyncio
+import io
+import json
+import os.path
+import pstats
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
+from unittest import mock
 
 import generic_parser
-from antlr4 import ParseTreeWalker
+from constant_folding import fold_constants
+from semantic_analysis import infer_types, TypeErrors
+from antlr4 import ParseTreeWalker, DispatchTableWalker
 from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacListener import ThrobacListener
 from throbac.ThrobacParser import ThrobacParser
-from throbac2c import Throbac2CTranslator
+from throbac2c import Throbac2CTranslator, Throbac2CVisitor
+import throbac_vm
+import throbac2py
+import native_build
+import native_library
+import translation_cache
+import benchmark
+import corpus_generator
+import bulk_translate
+import profiling
+import translation_server
 
 
-def as_c(source, start_rule):
+def as_c(source, start_rule, walker_class=ParseTreeWalker, fold=False, counted_strings=False,
+         intern_strings=False, typed=False):
     """
     Translates the given Throbac source string to C, using start_rule for parsing.
     """
     parse_tree = generic_parser.parse(source, start_rule, ThrobacLexer, ThrobacParser)
-    walker = ParseTreeWalker()
-    translator = Throbac2CTranslator()
+    walker = walker_class()
+    translator = Throbac2CTranslator(fold_constants(parse_tree) if fold else None, counted_strings,
+                                     intern_strings, infer_types(parse_tree) if typed else None)
     walker.walk(translator, parse_tree)
     if parse_tree in translator.c_translation:
         return translator.c_translation[parse_tree]
@@ -29,6 +57,17 @@ def as_c(source, start_rule):
         return 'No generated C found'
 
 
+def as_c_by_visitor(source, start_rule, fold=False, counted_strings=False, intern_strings=False,
+                    typed=False):
+    """
+    Translates the given Throbac source string to C with `Throbac2CVisitor`.
+    """
+    parse_tree = generic_parser.parse(source, start_rule, ThrobacLexer, ThrobacParser)
+    constants = fold_constants(parse_tree) if fold else None
+    types = infer_types(parse_tree) if typed else None
+    return Throbac2CVisitor(constants, counted_strings, intern_strings, types).visit(parse_tree)
+
+
 """
  `TEST_CASES` is a list of triples, where the first element is the expected
  C equivalent, the second is the Throbac source, and the third is the parser
@@ -80,8 +119,12 @@ TEST_CASES = [
 
     # concatenation
     ('__throbac_cat("HELLO.WORLD", "ISHERE")', '^HELLO.WORLD^ IUNGO ^ISHERE^', 'expr'),
-    ('__throbac_cat(__throbac_cat("WHYARE", "YOU"), "SCREAMING.\\nSTOP.")',
+    ('__throbac_catn(3, "WHYARE", "YOU", "SCREAMING.\\nSTOP.")',
      '^WHYARE^ IUNGO ^YOU^ IUNGO ^SCREAMING.+STOP.^', 'expr'),
+    ('__throbac_catn(4, a, b, c, d)', 'a IUNGO b IUNGO c IUNGO d', 'expr'),
+    ('__throbac_catn(4, a, b, c, (d))', '(a IUNGO b) IUNGO (c IUNGO (d))', 'expr'),
+    ('__throbac_cat(a, (substring(__throbac_catn(3, b, c, d), 0, 1)))',
+     'a IUNGO (APUD b IUNGO c IUNGO d, .NIL., .I. VOCO substring)', 'expr'),
     (r'__throbac_cat(message, "\n")', 'message IUNGO ^+^ ', 'expr'),
     ('__throbac_cat("HELLO", "WORLD")', '^HELLO^ IUNGO ^WORLD^', 'expr'),
 
@@ -167,6 +210,32 @@ TEST_CASES = [
     ('printf("%s", "!(true)");', 'NI VERUM VERITAS.IMPRIMO', 'statement'),
     ('printf("%s", "!(!(false))");', 'NI NI FALSUM VERITAS.IMPRIMO', 'statement'),
 
+
+    # functions that may build strings release them to the arena when they return
+    ('int shout(int n) {\n\tchar *__throbac_mark = __throbac_arena_mark();\n\tchar* s = NULL;'
+     '\n\ts = __throbac_cat("HI", "\\n");\n\tprintf("%s", s);'
+     '\n\treturn __throbac_arena_return(__throbac_mark, n);\n}',
+     'APUD n : NUMERUS DEFINITIO shout PRAEBET NUMERUS > s : LOCUTIO MUTABILIS '
+     's ^HI^ IUNGO ^+^ VALORUM s LOCUTIO.IMPRIMO n REDEO <', 'funcDef'),
+    ('void greet(char* word, int n) {\n\tchar *__throbac_mark = __throbac_arena_mark();'
+     '\n\tif (n > 0) {\n\t\t__throbac_arena_release(__throbac_mark);\n\t\treturn;\n\t}'
+     '\n\tprintf("%s", substring(word, 0, n));\n\t__throbac_arena_release(__throbac_mark);\n}',
+     'APUD word : LOCUTIO, n : NUMERUS DEFINITIO greet > n SUPRA .NIL. SI > REDEO < '
+     'APUD word, .NIL., n VOCO substring LOCUTIO.IMPRIMO <', 'funcDef'),
+    # the release after the last statement doesn't depend on the names in it
+    ('void greet(char* returned) {\n\tchar *__throbac_mark = __throbac_arena_mark();'
+     '\n\treturned = __throbac_cat(returned, "\\n");\n\t__throbac_arena_release(__throbac_mark);\n}',
+     'APUD returned : LOCUTIO DEFINITIO greet > returned returned IUNGO ^+^ VALORUM <', 'funcDef'),
+    # a LOCUTIO result lives in the arena, so it isn't released
+    ('char* shout(char* word) {\n\treturn __throbac_cat(word, "\\n");\n}',
+     'APUD word : LOCUTIO DEFINITIO shout PRAEBET LOCUTIO > word IUNGO ^+^ REDEO <', 'funcDef'),
+    # stringlength doesn't allocate
+    ('int size(char* word) {\n\treturn stringlength(word);\n}',
+     'APUD word : LOCUTIO DEFINITIO size PRAEBET NUMERUS > APUD word VOCO stringlength REDEO <', 'funcDef'),
+    # main's strings last until the program exits
+    ('int main() {\n\tchar* s = NULL;\n\ts = __throbac_cat("HI", "\\n");\n\tprintf("%s", s);\n\treturn 0;\n}',
+     's : LOCUTIO MUTABILIS s ^HI^ IUNGO ^+^ VALORUM s LOCUTIO.IMPRIMO', 'main'),
+
     #
     # # block
     # ('printf("%s", "HELLOWORLD");\nreturn 2;', '^HELLOWORLD^ LOCUTIO.IMPRIMO .II. REDEO', 'block'),
@@ -241,6 +310,53 @@ TEST_CASES = [
     # ('', '', 'script'),
 ]
 
+"""
+ `FOLDING_CASES` has the same layout as `TEST_CASES`, for translation with
+ constant folding turned on.
+"""
+FOLDING_CASES = [
+    ('14', '.II. ADDO .III. CONGERO .IV.', 'expr'),
+    ('-3', '(NEGANS .VII.) PARTIO .II.', 'expr'),
+    ('-1', '.VII. PARTIO (NEGANS .IV.)', 'expr'),
+    ('x * 5', 'x CONGERO (.II. ADDO .III.)', 'expr'),
+    ('x + 1 + 2', 'x ADDO .I. ADDO .II.', 'expr'),
+    ('1 / 0', '.I. PARTIO .NIL.', 'expr'),
+    ('x / 0', 'x PARTIO (.I. SUBTRAHO .I.)', 'expr'),
+    ('2147483647 + 1', '.II.I.IV.VII.IV.VIII.III.VI.IV.VII. ADDO .I.', 'expr'),
+    ('true', '.II. INFRA .III.', 'expr'),
+    ('false', 'NI (VERUM IDEM VERUM)', 'expr'),
+    ('true < false', 'VERUM INFRA FALSUM', 'expr'),
+    ('printf("%d", 6);', '.II. CONGERO .III. NUMERUS.IMPRIMO', 'statement'),
+    ('', '.I. SUPRA .II. DUM > x .I. VALORUM <', 'statement'),
+    ('while (true) {\n\tx = 1;\n}', '.I. INFRA .II. DUM > x .I. VALORUM <', 'statement'),
+    ('x = 1;', '.I. INFRA .II. SI > x .I. VALORUM < ALUID > x .II. VALORUM <', 'statement'),
+    ('x = 2;', '.I. SUPRA .II. SI > x .I. VALORUM < ALUID > x .II. VALORUM <', 'statement'),
+    ('', 'FALSUM SI > x .I. VALORUM <', 'statement'),
+    ('x = 1;\ny = 2;', 'x .I. VALORUM FALSUM SI > x .II. VALORUM < y .II. VALORUM', 'block'),
+    (r'"GET.READY\n"', '^GET.READY^ IUNGO ^+^', 'expr'),
+    ('"WHYAREYOUSCREAMING.\\nSTOP."', '^WHYARE^ IUNGO (^YOU^ IUNGO ^SCREAMING.+STOP.^)', 'expr'),
+    (r'__throbac_cat(message, "\n")', 'message IUNGO ^+^', 'expr'),
+    ('__throbac_cat(message, "AB")', 'message IUNGO (^A^ IUNGO ^B^)', 'expr'),
+    ('__throbac_catn(3, message, "A", "B")', 'message IUNGO ^A^ IUNGO ^B^', 'expr'),
+    ('"A" == "A"', '^A^ IDEM ^A^', 'expr'),
+]
+
+"""
+ `COUNTED_STRING_CASES` has the same layout as `TEST_CASES`, for translation
+ to the runtime's length-prefixed strings.
+"""
+COUNTED_STRING_CASES = [
+    ('__throbac_string_literal("HELLO\\n")', '^HELLO+^', 'expr'),
+    ('__throbac_string_cat(message, __throbac_string_literal("\\n"))', 'message IUNGO ^+^', 'expr'),
+    ('__throbac_string_catn(3, a, b, c)', 'a IUNGO b IUNGO c', 'expr'),
+    ('__throbac_string_length(word)', 'APUD word VOCO stringlength', 'expr'),
+    ('__throbac_string_substring(word, 1, 2)', 'APUD word, .I., .II. VOCO substring', 'expr'),
+    ('__throbac_string_print(word);', 'word LOCUTIO.IMPRIMO', 'statement'),
+    ('__throbac_string word = NULL;', 'word : LOCUTIO MUTABILIS', 'varDec'),
+    ('__throbac_string echo(__throbac_string word) {\n\treturn word;\n}',
+     'APUD word : LOCUTIO DEFINITIO echo PRAEBET LOCUTIO > word REDEO <', 'funcDef'),
+]
+
 
 class TranslationTest(unittest.TestCase):
 
@@ -251,3 +367,748 @@ class TranslationTest(unittest.TestCase):
                               throbac=throbac,
                               rule=rule):
                 self.assertEqual(c, as_c(throbac, rule))
+
+    def test_all_cases_with_dispatch_table_walker(self):
+        self.maxDiff = None
+        for c, throbac, rule in TEST_CASES:
+            with self.subTest(c=c,
+                              throbac=throbac,
+                              rule=rule):
+                self.assertEqual(c, as_c(throbac, rule, walker_class=DispatchTableWalker))
+
+    def test_all_cases_by_visitor(self):
+        self.maxDiff = None
+        for c, throbac, rule in TEST_CASES:
+            with self.subTest(c=c,
+                              throbac=throbac,
+                              rule=rule):
+                self.assertEqual(c, as_c_by_visitor(throbac, rule))
+
+    def test_folding_cases(self):
+        self.maxDiff = None
+        for c, throbac, rule in FOLDING_CASES:
+            with self.subTest(c=c,
+                              throbac=throbac,
+                              rule=rule):
+                self.assertEqual(c, as_c(throbac, rule, fold=True))
+                self.assertEqual(c, as_c_by_visitor(throbac, rule, fold=True))
+
+    def test_counted_string_cases(self):
+        self.maxDiff = None
+        for c, throbac, rule in COUNTED_STRING_CASES:
+            with self.subTest(c=c,
+                              throbac=throbac,
+                              rule=rule):
+                self.assertEqual(c, as_c(throbac, rule, counted_strings=True))
+                self.assertEqual(c, as_c_by_visitor(throbac, rule, counted_strings=True))
+
+    def test_interned_string_literals(self):
+        self.maxDiff = None
+        throbac = '^HI^ LOCUTIO.IMPRIMO ^+^ LOCUTIO.IMPRIMO ^HI^ IUNGO ^+^ LOCUTIO.IMPRIMO'
+        table = ('#include <stdio.h>\n#include <stdbool.h>\n#include "throbac.h"\n'
+                 '\nstatic char *const __throbac_literal_0 = "HI";'
+                 '\nstatic char *const __throbac_literal_1 = "\\n";\n')
+        body = ('\nint main() {\n\tprintf("%s", __throbac_literal_0);\n\tprintf("%s", __throbac_literal_1);'
+                '\n\tprintf("%s", __throbac_cat(__throbac_literal_0, __throbac_literal_1));\n\treturn 0;\n}\n')
+        self.assertEqual(table + body, as_c(throbac, 'script', intern_strings=True))
+        self.assertEqual(table + body, as_c_by_visitor(throbac, 'script', intern_strings=True))
+        self.assertEqual('__throbac_literal_0 == __throbac_literal_0',
+                         as_c('^A^ IDEM ^A^', 'expr', intern_strings=True))
+        self.assertEqual('(&__throbac_literal_0)', as_c('^A^', 'expr', counted_strings=True, intern_strings=True))
+
+    def test_typed_translation(self):
+        self.maxDiff = None
+        throbac = ('APUD a : LOCUTIO, b : LOCUTIO DEFINITIO same PRAEBET VERITAS > a IDEM b REDEO < '
+                   'APUD ^A^, ^B^ VOCO same VERITAS.IMPRIMO '
+                   '^A^ INFRA ^B^ VERITAS.IMPRIMO .I. INFRA .II. VERITAS.IMPRIMO')
+        c = ('#include <stdio.h>\n#include <stdbool.h>\n#include "throbac.h"\n\n'
+             'bool same(char* a, char* b);\nint main() {'
+             '\n\tprintf("%s", (same("A", "B")) ? "true" : "false");'
+             '\n\tprintf("%s", (__throbac_compare("A", "B") < 0) ? "true" : "false");'
+             '\n\tprintf("%s", (1 < 2) ? "true" : "false");\n\treturn 0;\n}'
+             '\nbool same(char* a, char* b) {\n\treturn __throbac_compare(a, b) == 0;\n}')
+        self.assertEqual(c, as_c(throbac, 'script', typed=True))
+        self.assertEqual(c, as_c_by_visitor(throbac, 'script', typed=True))
+        counted = as_c(throbac, 'script', typed=True, counted_strings=True)
+        self.assertIn('return __throbac_string_equal(a, b);', counted)
+        self.assertIn('__throbac_string_compare(__throbac_string_literal("A"), '
+                      '__throbac_string_literal("B")) < 0', counted)
+
+    def test_scoped_symbol_tables(self):
+        throbac = ('APUD x : NUMERUS DEFINITIO f PRAEBET NUMERUS > y : LOCUTIO MUTABILIS x REDEO < '
+                   'APUD x : LOCUTIO DEFINITIO g PRAEBET LOCUTIO > y : NUMERUS MUTABILIS x REDEO < '
+                   'x : VERITAS MUTABILIS x APUD .I. VOCO f IDEM .I. VALORUM')
+        tree = generic_parser.parse(throbac, 'script', ThrobacLexer, ThrobacParser)
+        types = infer_types(tree)
+        f, g = tree.funcDef()
+        self.assertEqual('NUMERUS', types[f.body().block().statement(0).expr()])
+        self.assertEqual('LOCUTIO', types[g.body().block().statement(0).expr()])
+        self.assertEqual('VERITAS', types[tree.main().body().block().statement(0).expr()])
+
+    def test_type_errors(self):
+        throbac = ('APUD a : NUMERUS DEFINITIO f PRAEBET NUMERUS > a IUNGO ^X^ REDEO < '
+                   'x : NUMERUS MUTABILIS x : LOCUTIO MUTABILIS '
+                   'y ^A^ VALORUM ^A^ INFRA .I. VERITAS.IMPRIMO APUD .I., .II. VOCO f')
+        tree = generic_parser.parse(throbac, 'script', ThrobacLexer, ThrobacParser)
+        with self.assertRaises(TypeErrors) as raised:
+            infer_types(tree)
+        self.assertEqual(['an operand of IUNGO must be LOCUTIO, not NUMERUS',
+                          'the value returned by f must be NUMERUS, not LOCUTIO',
+                          'x is already defined',
+                          'y is not defined',
+                          'the right operand of INFRA must be LOCUTIO, not NUMERUS',
+                          'f takes 1 arguments, not 2'],
+                         [error.message for error in raised.exception.errors])
+
+    def test_visitor_matches_listener_on_scripts(self):
+        for name in ('countdown.throbac', 'Testingfile.throbac'):
+            with open(os.path.join(os.path.dirname(__file__), 'throbac_source', name)) as f:
+                source = f.read()
+            with self.subTest(name=name):
+                self.assertEqual(as_c(source, 'script'), as_c_by_visitor(source, 'script'))
+
+    def test_visitor_matches_listener_interning_folded_scripts(self):
+        self.maxDiff = None
+        sources = {'folded branches': (
+            'x : NUMERUS MUTABILIS '
+            '.I. IDEM .II. SI > ^IF^ LOCUTIO.IMPRIMO < ALUID > ^ELSE^ LOCUTIO.IMPRIMO < '
+            'VERUM SI > ^TAKEN^ LOCUTIO.IMPRIMO < ALUID > ^NOT.TAKEN^ LOCUTIO.IMPRIMO < '
+            'FALSUM DUM > ^NEVER^ LOCUTIO.IMPRIMO < '
+            'APUD ^WHILE^ VOCO stringlength SUPRA x DUM > ^BODY^ IUNGO (^C^ IUNGO ^D^) LOCUTIO.IMPRIMO '
+            'x x ADDO .I. VALORUM < ^TAKEN^ LOCUTIO.IMPRIMO')}
+        for name in ('countdown.throbac', 'Testingfile.throbac'):
+            with open(os.path.join(os.path.dirname(__file__), 'throbac_source', name)) as f:
+                sources[name] = f.read()
+        for seed in range(3):
+            sources[f'generated {seed}'] = ''.join(corpus_generator.generate(
+                corpus_generator.GeneratorOptions(functions=5, seed=seed)))
+        for name, source in sources.items():
+            with self.subTest(name=name):
+                c = as_c(source, 'script', fold=True, intern_strings=True)
+                self.assertEqual(c, as_c_by_visitor(source, 'script', fold=True, intern_strings=True))
+                # every literal in the table is used
+                for literal in set(re.findall(r'__throbac_literal_\d+', c)):
+                    self.assertGreater(len(re.findall(rf'\b{literal}\b', c)), 1, literal)
+
+        c = as_c(sources['folded branches'], 'script', fold=True, intern_strings=True)
+        for unused in ('"IF"', '"NOT.TAKEN"', '"NEVER"'):
+            self.assertNotIn(unused, c)
+        self.assertIn('__throbac_literal_0 = "ELSE"', c)
+        self.assertIn('__throbac_literal_2 = "WHILE"', c)
+
+    def test_dispatch_table_walker_event_order(self):
+        class Recorder(ThrobacListener):
+            def __init__(self):
+                self.events = []
+
+            def enterEveryRule(self, ctx):
+                self.events.append(('enterEvery', ctx))
+
+            def exitEveryRule(self, ctx):
+                self.events.append(('exitEvery', ctx))
+
+            def visitTerminal(self, node):
+                self.events.append(('terminal', node.getText()))
+
+            def exitAddSub(self, ctx):
+                self.events.append(('exitAddSub', ctx))
+
+        tree = generic_parser.parse('x .I. ADDO (y SUBTRAHO .II.) VALORUM', 'statement',
+                                    ThrobacLexer, ThrobacParser)
+        expected, actual = Recorder(), Recorder()
+        ParseTreeWalker().walk(expected, tree)
+        DispatchTableWalker().walk(actual, tree)
+        self.assertEqual(expected.events, actual.events)
+
+
+def run_in_vm(source):
+    """
+    Compiles and runs the given Throbac script with `throbac_vm`, returning
+    what it prints.
+    """
+    out = io.StringIO()
+    throbac_vm.run(throbac_vm.compile_source(source), out)
+    return out.getvalue()
+
+
+class VMTest(unittest.TestCase):
+
+    def test_countdown(self):
+        with open(os.path.join(os.path.dirname(__file__), 'throbac_source', 'countdown.throbac')) as f:
+            source = f.read()
+        self.assertEqual('10\n9\n8\n7\n6\n5\n4GET.READY\n3\n2\n1\nLIFTOFF\n', run_in_vm(source))
+
+    def test_numerus(self):
+        self.assertEqual('-3\n-3\n2\n-2147483648\n',
+                         run_in_vm('(NEGANS .VII.) PARTIO .II. NUMERUS.IMPRIMO ^+^ LOCUTIO.IMPRIMO '
+                                   '.VII. PARTIO NEGANS .II. NUMERUS.IMPRIMO ^+^ LOCUTIO.IMPRIMO '
+                                   '.I. ADDO .II. CONGERO (.III. SUBTRAHO .II.) PARTIO .II. NUMERUS.IMPRIMO '
+                                   '^+^ LOCUTIO.IMPRIMO '
+                                   '.II.I.IV.VII.IV.VIII.III.VI.IV.VII. ADDO .I. NUMERUS.IMPRIMO ^+^ LOCUTIO.IMPRIMO'))
+
+    def test_locutio_and_veritas(self):
+        self.assertEqual('AB\n3BCtruefalsetrue',
+                         run_in_vm('s : LOCUTIO MUTABILIS s ^A^ IUNGO ^B+^ VALORUM s LOCUTIO.IMPRIMO '
+                                   'APUD s VOCO stringlength NUMERUS.IMPRIMO '
+                                   'APUD ^ABCD^, .I., .II. VOCO substring LOCUTIO.IMPRIMO '
+                                   's IDEM ^AB^ IUNGO ^+^ VERITAS.IMPRIMO '
+                                   'NI (.I. INFRA .II.) VERITAS.IMPRIMO '
+                                   '^A^ INFRA ^B^ VERITAS.IMPRIMO'))
+
+    def test_calls_and_recursion(self):
+        source = ('APUD n : NUMERUS DEFINITIO factorial PRAEBET NUMERUS > '
+                  'n INFRA .II. SI > .I. REDEO < n CONGERO APUD n SUBTRAHO .I. VOCO factorial REDEO < '
+                  'APUD n : NUMERUS DEFINITIO show > n NUMERUS.IMPRIMO ^+^ LOCUTIO.IMPRIMO < '
+                  'i : NUMERUS MUTABILIS i .I. VALORUM '
+                  'i INFRA.IDEM .V. DUM > APUD APUD i VOCO factorial VOCO show i i ADDO .I. VALORUM <')
+        self.assertEqual('1\n2\n6\n24\n120\n', run_in_vm(source))
+
+    def test_runtime_errors(self):
+        with self.assertRaises(throbac_vm.ThrobacRuntimeError):
+            run_in_vm('APUD ^AB^, .I., .II. VOCO substring LOCUTIO.IMPRIMO')
+        with self.assertRaises(throbac_vm.ThrobacRuntimeError):
+            run_in_vm('x : NUMERUS MUTABILIS .I. PARTIO x NUMERUS.IMPRIMO')
+
+
+def run_as_python(source):
+    """
+    Runs the given Throbac script through its Python translation, returning
+    what it prints.
+    """
+    out = io.StringIO()
+    throbac2py.run_source(source, out)
+    return out.getvalue()
+
+
+class PythonTranslationTest(unittest.TestCase):
+
+    def test_same_output_as_vm(self):
+        with open(os.path.join(os.path.dirname(__file__), 'throbac_source', 'countdown.throbac')) as f:
+            countdown = f.read()
+        sources = [
+            countdown,
+            '(NEGANS .VII.) PARTIO .II. NUMERUS.IMPRIMO ^+^ LOCUTIO.IMPRIMO '
+            '.II.I.IV.VII.IV.VIII.III.VI.IV.VII. ADDO .I. NUMERUS.IMPRIMO '
+            'NEGANS (.I. SUBTRAHO .III.) CONGERO .II. NUMERUS.IMPRIMO',
+            'APUD ^ABCD^, .I., .II. VOCO substring IUNGO ^+^ LOCUTIO.IMPRIMO '
+            'APUD ^ABC^ VOCO stringlength INFRA .II. INFRA VERUM VERITAS.IMPRIMO '
+            '^A^ IUNGO ^B^ IDEM ^AB^ VERITAS.IMPRIMO',
+            'APUD n : NUMERUS DEFINITIO fib PRAEBET NUMERUS > '
+            'n INFRA .II. SI > n REDEO < '
+            'APUD n SUBTRAHO .I. VOCO fib ADDO APUD n SUBTRAHO .II. VOCO fib REDEO < '
+            'APUD in : NUMERUS, is : VERITAS DEFINITIO if > is SI > in NUMERUS.IMPRIMO < < '
+            'APUD APUD .I.V. VOCO fib, VERUM VOCO if',
+        ]
+        for source in sources:
+            with self.subTest(source=source):
+                self.assertEqual(run_in_vm(source), run_as_python(source))
+
+    def test_code_cache(self):
+        source = '^CACHED^ LOCUTIO.IMPRIMO'
+        code = throbac2py.compile_source(source)
+        self.assertIs(code, throbac2py.compile_source(source))
+        self.assertEqual('CACHED', run_as_python(source))
+
+        # the least recently used code is evicted
+        with mock.patch('throbac2py.MAX_CACHED_CODE', 2):
+            throbac2py.compile_source('.I. NUMERUS.IMPRIMO')
+            throbac2py.compile_source(source)
+            throbac2py.compile_source('.II. NUMERUS.IMPRIMO')
+            self.assertEqual(2, len(throbac2py.CODE_CACHE))
+            self.assertIs(code, throbac2py.compile_source(source))
+
+    def test_runtime_errors(self):
+        with self.assertRaises(throbac_vm.ThrobacRuntimeError):
+            run_as_python('.I. PARTIO (.II. SUBTRAHO .II.) NUMERUS.IMPRIMO')
+
+
+@unittest.skipUnless(shutil.which('gcc'), 'needs gcc')
+class NativeBuildTest(unittest.TestCase):
+
+    def test_build_and_cache(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            c_path = os.path.join(build_dir, 'hello.c')
+            with open(c_path, 'w') as c_file:
+                c_file.write(as_c('APUD ^AB^, .I., .I. VOCO substring IUNGO ^+^ LOCUTIO.IMPRIMO', 'script'))
+            bad_path = os.path.join(build_dir, 'bad.c')
+            with open(bad_path, 'w') as c_file:
+                c_file.write('int main() { return undefined; }')
+            cache_dir = os.path.join(build_dir, 'cache')
+
+            programs, errors = native_build.build([c_path, bad_path], '1', build_dir=build_dir,
+                                                  cache_dir=cache_dir)
+            self.assertEqual([bad_path], list(errors))
+            output = subprocess.run([programs[c_path]], capture_output=True, text=True).stdout
+            self.assertEqual('B\n', output)
+
+            # nothing has changed, so the compiler doesn't run again
+            with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                programs, errors = native_build.build([c_path], '1', build_dir=build_dir,
+                                                      cache_dir=cache_dir)
+            run.assert_not_called()
+            self.assertEqual([c_path], list(programs))
+
+            # but other flags are a different build
+            with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                native_build.build([c_path], '0', build_dir=build_dir, cache_dir=cache_dir)
+            self.assertEqual(3, run.call_count)
+
+    def test_build_from_another_directory(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            c_path = os.path.join(build_dir, 'hello.c')
+            with open(c_path, 'w') as c_file:
+                c_file.write(as_c('^AB^ LOCUTIO.IMPRIMO', 'script'))
+            program_dir = os.path.join(build_dir, 'not', 'made', 'yet')
+            cwd = os.getcwd()
+            os.chdir(build_dir)
+            try:
+                programs, errors = native_build.build([c_path], build_dir=program_dir,
+                                                      cache_dir=os.path.join(build_dir, 'cache'))
+            finally:
+                os.chdir(cwd)
+            self.assertEqual({}, errors)
+            output = subprocess.run([programs[c_path]], capture_output=True, text=True).stdout
+            self.assertEqual('AB', output)
+
+    def test_interned_comparisons(self):
+        source = ('s : LOCUTIO MUTABILIS s ^AB^ VALORUM ^AB^ IDEM ^AB^ VERITAS.IMPRIMO s IDEM ^AB^ VERITAS.IMPRIMO '
+                  '^AB^ INFRA.IDEM s VERITAS.IMPRIMO s IUNGO ^C^ SUPRA ^AB^ VERITAS.IMPRIMO')
+        for counted_strings in (False, True):
+            with self.subTest(counted_strings=counted_strings):
+                result = run_native(source, counted_strings=counted_strings, intern_strings=True, typed=True)
+                self.assertEqual('truetruetruetrue', result.stdout)
+
+    def test_identical_sources_in_parallel(self):
+        with tempfile.TemporaryDirectory() as build_dir:
+            c_paths = []
+            for i in range(8):
+                c_paths.append(os.path.join(build_dir, f'copy{i}.c'))
+                with open(c_paths[-1], 'w') as c_file:
+                    c_file.write(as_c('^SAME+^ LOCUTIO.IMPRIMO', 'script'))
+
+            # every thread builds the same object and executable at once
+            programs, errors = native_build.build(c_paths, '0', jobs=8, build_dir=build_dir,
+                                                  cache_dir=os.path.join(build_dir, 'cache'))
+            self.assertEqual({}, errors)
+            for c_path in c_paths:
+                output = subprocess.run([programs[c_path]], capture_output=True, text=True).stdout
+                self.assertEqual('SAME\n', output)
+            self.assertFalse([name for name in os.listdir(os.path.join(build_dir, 'cache'))
+                              if name.endswith('.tmp')])
+
+
+def run_native(source, **options):
+    """
+    Translates, builds and runs the Throbac script `source`, returning the
+    completed process. The options are those of `as_c`, and
+    `memory_limit`, in bytes, limits the program's address space.
+    """
+    memory_limit = options.pop('memory_limit', None)
+
+    def limit_memory():
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+    with tempfile.TemporaryDirectory() as build_dir:
+        c_path = os.path.join(build_dir, 'program.c')
+        with open(c_path, 'w') as c_file:
+            c_file.write(as_c(source, 'script', **options))
+        programs, errors = native_build.build([c_path], '2', build_dir=build_dir,
+                                              cache_dir=os.path.join(build_dir, 'cache'))
+        if errors:
+            raise errors[c_path]
+        return subprocess.run([programs[c_path]], capture_output=True, text=True,
+                              preexec_fn=limit_memory if memory_limit is not None else None)
+
+
+@unittest.skipUnless(shutil.which('gcc'), 'needs gcc')
+class ArenaTest(unittest.TestCase):
+
+    def test_strings_built_in_a_function_are_released(self):
+        # each call builds 12 KB of strings, 100 MB in all, which only fits
+        # in the limit if every call releases them
+        source = ('APUD n : NUMERUS DEFINITIO build PRAEBET NUMERUS > '
+                  's : LOCUTIO MUTABILIS i : NUMERUS MUTABILIS s ^^ VALORUM i .NIL. VALORUM '
+                  'i INFRA n DUM > s s IUNGO ^ABCDEFGHIJ^ VALORUM i i ADDO .I. VALORUM < '
+                  'APUD s VOCO stringlength REDEO < '
+                  'total : NUMERUS MUTABILIS calls : NUMERUS MUTABILIS calls .NIL. VALORUM '
+                  'calls INFRA .VIII.NIL.NIL.NIL. DUM > '
+                  'total total ADDO APUD .V.NIL. VOCO build VALORUM calls calls ADDO .I. VALORUM < '
+                  'total NUMERUS.IMPRIMO')
+        result = run_native(source, memory_limit=48 * 1024 * 1024)
+        self.assertEqual((0, '4000000'), (result.returncode, result.stdout))
+
+    def test_locutio_results_outlive_the_call(self):
+        source = ('APUD word : LOCUTIO DEFINITIO shout PRAEBET LOCUTIO > word IUNGO ^+^ REDEO < '
+                  'APUD word : LOCUTIO DEFINITIO twice > APUD word VOCO shout IUNGO word LOCUTIO.IMPRIMO < '
+                  's : LOCUTIO MUTABILIS s APUD ^HI^ IUNGO ^THERE^ VOCO shout VALORUM '
+                  'APUD s VOCO twice s LOCUTIO.IMPRIMO')
+        result = run_native(source)
+        self.assertEqual(run_in_vm(source), result.stdout)
+
+
+@unittest.skipUnless(shutil.which('gcc'), 'needs gcc')
+class CountedStringTest(unittest.TestCase):
+
+    def test_substring_views(self):
+        # views short of the end, views of views, and views reaching the end,
+        # printed, concatenated, compared and returned
+        source = ('APUD word : LOCUTIO DEFINITIO middle PRAEBET LOCUTIO > '
+                  'APUD word, .I., APUD word VOCO stringlength SUBTRAHO .II. VOCO substring REDEO < '
+                  's : LOCUTIO MUTABILIS v : LOCUTIO MUTABILIS w : LOCUTIO MUTABILIS '
+                  's ^ABCDEFGH^ VALORUM '
+                  'v APUD s, .I., .V. VOCO substring VALORUM '
+                  'w APUD v, .I., .III. VOCO substring VALORUM '
+                  'v IUNGO ^+^ LOCUTIO.IMPRIMO w LOCUTIO.IMPRIMO ^+^ LOCUTIO.IMPRIMO '
+                  'w IUNGO ^.^ IUNGO v IUNGO APUD v, .IV., .NIL. VOCO substring '
+                  'IUNGO APUD s, .V., .III. VOCO substring IUNGO ^+^ LOCUTIO.IMPRIMO '
+                  'w IDEM ^CDE^ VERITAS.IMPRIMO w IDEM APUD s, .II., .III. VOCO substring VERITAS.IMPRIMO '
+                  'w IDEM v VERITAS.IMPRIMO w INFRA v VERITAS.IMPRIMO '
+                  'APUD v, .NIL., .III. VOCO substring INFRA w VERITAS.IMPRIMO '
+                  '^+^ LOCUTIO.IMPRIMO APUD w VOCO stringlength NUMERUS.IMPRIMO '
+                  'APUD APUD v VOCO middle VOCO middle IUNGO ^+^ LOCUTIO.IMPRIMO')
+        result = run_native(source, counted_strings=True, typed=True)
+        self.assertEqual('BCDEF\nCDE\nCDE.BCDEFFGH\ntruetruefalsefalsetrue\n3D\n', result.stdout)
+        self.assertEqual(run_in_vm(source), result.stdout)
+
+    def test_substring_out_of_range(self):
+        # the error leaves an empty string, which can still be used
+        source = ('s : LOCUTIO MUTABILIS s APUD ^ABC^, .II., .V. VOCO substring VALORUM '
+                  's LOCUTIO.IMPRIMO APUD s VOCO stringlength NUMERUS.IMPRIMO '
+                  's IUNGO ^D^ LOCUTIO.IMPRIMO s IDEM ^^ VERITAS.IMPRIMO '
+                  'APUD ^ABC^, .V., .I. VOCO substring LOCUTIO.IMPRIMO')
+        result = run_native(source, counted_strings=True, typed=True)
+        self.assertEqual(0, result.returncode)
+        self.assertEqual('\nERROR: Inputted start index and length exceeds string length.0Dtrue'
+                         '\nERROR: Inputted start index larger than string length.', result.stdout)
+
+
+@unittest.skipUnless(shutil.which('gcc'), 'needs gcc')
+class NativeLibraryTest(unittest.TestCase):
+
+    SOURCE = ('APUD n : NUMERUS DEFINITIO factorial PRAEBET NUMERUS > '
+              'n INFRA .II. SI > .I. REDEO < n CONGERO APUD n SUBTRAHO .I. VOCO factorial REDEO < '
+              'APUD s : LOCUTIO, n : NUMERUS DEFINITIO twice PRAEBET LOCUTIO > '
+              'APUD s IUNGO s, .NIL., n VOCO substring REDEO < '
+              'APUD a : LOCUTIO, b : LOCUTIO DEFINITIO same PRAEBET VERITAS > a IDEM b REDEO < ')
+
+    def test_calls(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            library = native_library.load_library(self.SOURCE, cache_dir=cache_dir)
+            self.assertEqual(3628800, library.factorial(10))
+            self.assertEqual('ABA', library.twice('AB', 3))
+            self.assertIs(True, library.same('AB', 'AB'))
+            self.assertIs(False, library.functions['same']('AB', 'BA'))
+            # LOCUTIO results don't accumulate in the arena
+            mark = library.arena_mark()
+            for _ in range(1000):
+                library.twice('ABC', 4)
+            self.assertEqual(mark, library.arena_mark())
+
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            native_library.load_library(self.SOURCE, cache_dir=cache_dir)
+            with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                native_library.loaded_libraries.clear()
+                library = native_library.load_library(self.SOURCE, cache_dir=cache_dir)
+            run.assert_not_called()
+            self.assertEqual(6, library.factorial(3))
+
+            # a changed translator translates and compiles it again
+            with mock.patch('native_library.TRANSLATOR_VERSION', 'changed'), \
+                    mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                native_library.load_library(self.SOURCE, cache_dir=cache_dir)
+            self.assertEqual(1, run.call_count)
+
+            # the least recently used library is evicted
+            native_library.load_library(self.SOURCE, '0', cache_dir=cache_dir)
+            native_library.evict_libraries(cache_dir, keep=1)
+            self.assertEqual(1, len(os.listdir(cache_dir)))
+            with mock.patch('subprocess.run', wraps=subprocess.run) as run:
+                native_library.load_library(self.SOURCE, '0', cache_dir=cache_dir)
+            run.assert_not_called()
+
+
+class TranslationCacheTest(unittest.TestCase):
+
+    def test_memory_tier(self):
+        cache = translation_cache.TranslationCache(max_entries=2)
+        first = '.I. NUMERUS.IMPRIMO'
+        self.assertEqual(as_c(first, 'statement'), cache.translate(first, 'statement'))
+        self.assertEqual(as_c(first, 'statement'), cache.translate(first, 'statement'))
+        self.assertEqual('printf("%d", 3);', cache.translate('.I. ADDO .II. NUMERUS.IMPRIMO', 'statement',
+                                                             fold=True))
+        # the options are part of the key
+        cache.translate('.I. ADDO .II. NUMERUS.IMPRIMO', 'statement')
+        self.assertEqual((1, 3), (cache.statistics.hits, cache.statistics.misses))
+        # only the two most recently used are kept
+        self.assertEqual(2, len(cache.entries))
+        cache.translate(first, 'statement')
+        self.assertEqual((1, 4), (cache.statistics.hits, cache.statistics.misses))
+        self.assertEqual(0.2, cache.statistics.hit_rate)
+
+    def test_disk_tier(self):
+        with tempfile.TemporaryDirectory() as disk_dir:
+            source = 'APUD .I.NIL., ^GO^ VOCO countdown'
+            c_text = translation_cache.TranslationCache(disk_dir=disk_dir).translate(source)
+            cache = translation_cache.TranslationCache(disk_dir=disk_dir)
+            self.assertEqual(c_text, cache.translate(source))
+            self.assertEqual(c_text, cache.translate(source))
+            self.assertEqual((1, 1, 0), (cache.statistics.hits, cache.statistics.disk_hits,
+                                         cache.statistics.misses))
+
+    def test_errors_not_cached(self):
+        cache = translation_cache.TranslationCache()
+        for _ in range(2):
+            with self.assertRaises(generic_parser.SyntaxErrors):
+                cache.translate('.I. NUMERUS.IMPRIMO ^!^', 'statement')
+        self.assertEqual(0, len(cache.entries))
+
+
+class BenchmarkTest(unittest.TestCase):
+
+    def test_corpora_translate(self):
+        for name, (make_source, base_size) in benchmark.CORPORA.items():
+            with self.subTest(corpus=name):
+                as_c(make_source(base_size), 'script')
+
+    def test_compare(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            results = benchmark.run_benchmarks(['iungo'], [1], 1, work_dir)
+        self.assertEqual(set(benchmark.STAGES), set(results['iungo']['100']))
+        baseline = {'iungo': {'100': {stage: {'best': times['best'] / 2}
+                                      for stage, times in results['iungo']['100'].items()}}}
+        with mock.patch('sys.stdout', io.StringIO()):
+            self.assertEqual(len(benchmark.STAGES), len(benchmark.compare(results, baseline, 0.1)))
+            self.assertEqual([], benchmark.compare(results, results, 0.1))
+
+
+class CorpusGeneratorTest(unittest.TestCase):
+
+    def test_generated_scripts_type_check(self):
+        for seed in range(10):
+            options = corpus_generator.GeneratorOptions(functions=seed, depth=seed % 4,
+                                                        expression_size=seed % 6, seed=seed)
+            with self.subTest(seed=seed):
+                source = ''.join(corpus_generator.generate(options))
+                parse_tree = generic_parser.parse(source, 'script', ThrobacLexer, ThrobacParser)
+                infer_types(parse_tree)
+                # the programs terminate, and run the same in the VM and as Python
+                self.assertEqual(run_in_vm(source), run_as_python(source))
+
+    def test_call_depth_is_bounded(self):
+        options = corpus_generator.GeneratorOptions(functions=300, seed=5)
+        pieces = list(corpus_generator.generate(options))
+        for index, piece in enumerate(pieces):
+            level = index % corpus_generator.CALL_LEVELS if index < 300 else corpus_generator.CALL_LEVELS
+            blocks = []
+            for line in piece.splitlines():
+                for callee in re.findall(r'VOCO zzf(\w+)', line):
+                    # nothing is called inside a loop
+                    self.assertNotIn('DUM', blocks)
+                    callee_index = 0
+                    for letter in callee:
+                        callee_index = callee_index * 26 + ord(letter) - ord('a')
+                    self.assertLess(callee_index % corpus_generator.CALL_LEVELS, level)
+                    self.assertLessEqual(index - callee_index, corpus_generator.CALL_WINDOW)
+                if line.endswith('>'):
+                    blocks.append(line.split()[-2])
+                elif line == '<':
+                    blocks.pop()
+
+    def test_reproducible_and_streaming(self):
+        options = corpus_generator.GeneratorOptions(functions=5, seed=42)
+        pieces = list(corpus_generator.generate(options))
+        self.assertEqual(6, len(pieces))
+        self.assertEqual(pieces, list(corpus_generator.generate(options)))
+        self.assertNotEqual(pieces, list(corpus_generator.generate(
+            corpus_generator.GeneratorOptions(functions=5, seed=43))))
+
+        out = io.StringIO()
+        length = corpus_generator.write_corpus(out, options, max_bytes=20000)
+        self.assertEqual(length, len(out.getvalue()))
+        self.assertGreaterEqual(length, 20000)
+
+
+class TranslationStatsTest(unittest.TestCase):
+
+    def test_parse_stats(self):
+        stats = {}
+        parse_tree = generic_parser.parse('x .I. VALORUM // set x\n', 'statement', ThrobacLexer, ThrobacParser,
+                                          stats=stats)
+        # x, .I., VALORUM, the comment and EOF
+        self.assertEqual(5, stats['tokens'])
+        self.assertGreater(stats['lex'], 0)
+        self.assertGreater(stats['parse'], 0)
+        # statement(assignment) holding x, expr(number) holding .I., and VALORUM
+        self.assertEqual(5, bulk_translate.node_count(parse_tree))
+
+    def test_report(self):
+        report = bulk_translate.stats_report({
+            'a.throbac': {'lex': 1.0, 'parse': 2.0, 'walk': 0.5, 'write': 0.5, 'time': 4.0, 'tokens': 10},
+            'b.throbac': {'lex': 3.0, 'parse': 3.0, 'walk': 1.0, 'write': 1.0, 'time': 8.0, 'tokens': 5},
+        })
+        self.assertEqual(['b.throbac', 'a.throbac'], list(report['files']))
+        self.assertEqual(12.0, report['total']['time'])
+        self.assertEqual(4.0, report['total']['lex'])
+        self.assertEqual(15, report['total']['tokens'])
+        self.assertEqual(2, report['total']['files'])
+
+
+class ProfilingTest(unittest.TestCase):
+
+    def test_profiles_written_over_threshold(self):
+        source = 'x .I. ADDO .II. VALORUM'
+        with tempfile.TemporaryDirectory() as directory:
+            with profiling.profiling(directory, threshold=0) as settings:
+                translation_cache.translate_uncached(source, 'statement')
+            self.assertEqual(['parse', 'walk'], [os.path.basename(path).split('-')[0]
+                                                 for path in settings.written])
+            self.assertTrue(all(path.endswith('.pstats') for path in settings.written))
+            self.assertGreater(pstats.Stats(settings.written[0]).total_calls, 0)
+
+            with profiling.profiling(directory, threshold=60) as settings:
+                translation_cache.translate_uncached(source, 'statement')
+            self.assertEqual([], settings.written)
+        # and off again outside the block
+        self.assertIsNone(profiling.settings)
+
+    def test_speedscope(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with profiling.profiling(directory, threshold=0, format='speedscope') as settings:
+                generic_parser.parse('x .I. VALORUM', 'statement', ThrobacLexer, ThrobacParser)
+            with open(settings.written[0]) as profile_file:
+                profile = json.load(profile_file)
+        events = profile['profiles'][0]['events']
+        names = {profile['shared']['frames'][event['frame']]['name'] for event in events}
+        self.assertIn('ThrobacParser.statement', names)
+        # every call is closed, most recent first
+        open_frames = []
+        for event in events:
+            if event['type'] == 'O':
+                open_frames.append(event['frame'])
+            else:
+                self.assertEqual(open_frames.pop(), event['frame'])
+        self.assertEqual([], open_frames)
+
+    def test_profiler_that_cannot_start(self):
+        failure = ValueError('Another profiling tool is already active')
+        with tempfile.TemporaryDirectory() as directory:
+            with profiling.profiling(directory, threshold=0) as settings:
+                with mock.patch('cProfile.Profile.enable', side_effect=failure):
+                    tree = generic_parser.parse('x .I. VALORUM', 'statement', ThrobacLexer, ThrobacParser)
+                self.assertEqual('x.I.VALORUM', tree.getText())
+                self.assertEqual([], settings.written)
+                # and this thread can still profile afterwards
+                generic_parser.parse('x .I. VALORUM', 'statement', ThrobacLexer, ThrobacParser)
+                self.assertEqual(1, len(settings.written))
+
+    def test_speedscope_leaves_an_outer_profile_function(self):
+        def outer(frame, event, arg):
+            pass
+
+        with tempfile.TemporaryDirectory() as directory:
+            with profiling.profiling(directory, threshold=0, format='speedscope') as settings:
+                sys.setprofile(outer)
+                try:
+                    generic_parser.parse('x .I. VALORUM', 'statement', ThrobacLexer, ThrobacParser)
+                    self.assertIs(outer, sys.getprofile())
+                finally:
+                    sys.setprofile(None)
+            self.assertEqual([], settings.written)
+
+    def test_environment(self):
+        self.assertIsNone(profiling.settings_from_environment({}))
+        settings = profiling.settings_from_environment({'THROBAC_PROFILE_DIR': 'profiles',
+                                                        'THROBAC_PROFILE_THRESHOLD_MS': '250',
+                                                        'THROBAC_PROFILE_FORMAT': 'speedscope'})
+        self.assertEqual(('profiles', 0.25, 'speedscope'),
+                         (settings.directory, settings.threshold, settings.format))
+
+
+async def http_request(reader, writer, method, target, body=None):
+    """
+    Sends one HTTP request on a kept-alive connection, returning the status
+    and the JSON body of the response.
+    """
+    content = json.dumps(body).encode() if body is not None else b''
+    writer.write(f'{method} {target} HTTP/1.1\r\nContent-Length: {len(content)}\r\n\r\n'.encode()
+                 + content)
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := (await reader.readline()).strip()):
+        name, _, value = line.decode().partition(':')
+        headers[name.lower()] = value.strip()
+    return status, json.loads(await reader.readexactly(int(headers['content-length'])))
+
+
+class TranslationServerTest(unittest.TestCase):
+
+    def test_translations(self):
+        async def run():
+            server = translation_server.TranslationServer(workers=2)
+            await server.start()
+            try:
+                with tempfile.TemporaryDirectory() as directory:
+                    await server.listen(path=os.path.join(directory, 'throbac.sock'))
+                    reader, writer = await asyncio.open_unix_connection(os.path.join(directory, 'throbac.sock'))
+                    source = 'x : NUMERUS MUTABILIS x .I. ADDO .II. VALORUM x NUMERUS.IMPRIMO'
+                    self.assertEqual((200, {'c': as_c(source, 'script', fold=True)}),
+                                     await http_request(reader, writer, 'POST', '/translate',
+                                                        {'source': source, 'fold': True}))
+                    status, body = await http_request(reader, writer, 'POST', '/translate',
+                                                      {'source': 'x ^A^ VALORUM', 'typed': True})
+                    self.assertEqual((422, 'type'), (status, body['kind']))
+                    for bad_request in ({}, {'source': 42}, {'source': 'x', 'rule': 'reset'},
+                                        {'source': 'x', 'rule': '__class__'}, {'source': 'x', 'rule': 7}):
+                        with self.subTest(request=bad_request):
+                            self.assertEqual(400, (await http_request(reader, writer, 'POST', '/translate',
+                                                                      bad_request))[0])
+
+                    # a burst is answered in batches
+                    results = await asyncio.gather(*[
+                        server.translate(f'{corpus_generator.throbac_number(i)} NUMERUS.IMPRIMO', 'statement')
+                        for i in range(40)])
+                    self.assertEqual({200}, {status for status, _ in results})
+                    status, statistics = await http_request(reader, writer, 'GET', '/stats')
+                    self.assertEqual(42, statistics['requests'])
+                    self.assertLess(statistics['batches'], statistics['requests'])
+                    writer.close()
+            finally:
+                await server.close()
+        asyncio.run(run())
+
+    def test_body_too_large(self):
+        async def run():
+            server = translation_server.TranslationServer(workers=1, max_body=64)
+            await server.start()
+            try:
+                with tempfile.TemporaryDirectory() as directory:
+                    path = os.path.join(directory, 'throbac.sock')
+                    await server.listen(path=path)
+                    reader, writer = await asyncio.open_unix_connection(path)
+                    status, body = await http_request(reader, writer, 'POST', '/translate',
+                                                      {'source': '.I. NUMERUS.IMPRIMO ' * 10})
+                    self.assertEqual(413, status)
+                    # the unread body ends the connection
+                    self.assertEqual(b'', await reader.read())
+                    writer.close()
+                    self.assertEqual(0, server.statistics.requests)
+            finally:
+                await server.close()
+        asyncio.run(run())
+
+    def test_backpressure_and_deadlines(self):
+        async def run():
+            # without workers nothing leaves the queue
+            server = translation_server.TranslationServer(max_pending=1)
+            waiting = asyncio.create_task(server.translate('.I. NUMERUS.IMPRIMO', 'statement', deadline=0.05))
+            await asyncio.sleep(0)
+            with self.assertRaises(translation_server.ServerBusy):
+                await server.translate('.I. NUMERUS.IMPRIMO', 'statement')
+            self.assertEqual(504, (await waiting)[0])
+            self.assertEqual((2, 1, 1), (server.statistics.requests, server.statistics.rejected,
+                                         server.statistics.expired))
+            # a worker skips a request whose deadline has passed
+            self.assertEqual(504, translation_server.translate_batch(
+                [('.I. NUMERUS.IMPRIMO', 'statement', {}, time.time() - 1)])[0][0])
+        asyncio.run(run())
@@ -4,6 +4,30 @@ translation to C for each node and and stores this in the `self.c_translation`
 dictionary. The complete program translation will be for the root of the
 tree, which is the `ScriptContext` node.
 
+`Throbac2CVisitor` produces the same translation as a visitor, returning the
+C for each node from its `visit*` method instead of storing it.
+
+Both accept the `constants` found by `constant_folding.fold_constants`; a
+folded expression (arithmetic, logic or a chain of string literals) is
+emitted as its value, and an SI or DUM whose condition
+folded is reduced to the block that would run.
+
+Runtime strings live in the arena in `C/throbac.c`. A function that cannot
+return a LOCUTIO but may build strings takes an arena mark on entry and
+releases back to it when it returns, so those strings don't outlive it.
+
+With `counted_strings=True`, LOCUTIO values are the runtime's length-prefixed
+`__throbac_string` instead of `char*`, and the string operations are the
+`__throbac_string_*` functions, none of which has to scan for a NUL.
+
+With `intern_strings=True`, each distinct string literal is defined once, in
+a table of `static` constants after the includes, and every use refers to it
+by name, so equal literals are the same pointer.
+
+Given the `types` found by `semantic_analysis.infer_types`, the translators
+compare LOCUTIO values by content rather than by pointer, and VERITAS.IMPRIMO
+prints the value of its expression rather than the expression's C text.
+
 Author: OCdt Aaron Brown and OCdt Liethan Velasco
 
 Notes:
@@ -12,12 +36,154 @@ Notes:
 Version: February 9 2023.
 """
 
+from antlr4 import ParserRuleContext
 from throbac.ThrobacListener import ThrobacListener
 from throbac.ThrobacParser import ThrobacParser
+from throbac.ThrobacVisitor import ThrobacVisitor
 
 DIGIT_MAP = {'NIL': '0', 'I': '1', 'II': '2', 'III': '3', 'IV': '4',
              'V': '5', 'VI': '6', 'VII': '7', 'VIII': '8', 'IX': '9'}
 
+COMPARE_OPS = {'IDEM': '==', 'NI.IDEM': '!=', 'INFRA': '<',
+               'INFRA.IDEM': '<=', 'SUPRA': '>', 'SUPRA.IDEM': '>='}
+
+
+# the runtime functions for the string built-ins, on length-prefixed strings
+COUNTED_STRING_FUNCTIONS = {'stringlength': '__throbac_string_length',
+                            'substring': '__throbac_string_substring'}
+
+
+def c_type(throbac_type, counted_strings=False):
+    """
+    The C type used for a Throbac NUMERUS, LOCUTIO or VERITAS.
+    """
+    return ('int' if throbac_type == "NUMERUS" else
+            ('__throbac_string' if counted_strings else 'char*') if throbac_type == "LOCUTIO"
+            else 'bool')
+
+
+def c_string(c_string_literal, counted_strings=False, string_literals=None):
+    """
+    The LOCUTIO value of a C string literal: the literal itself, or the
+    length-prefixed string holding it. If a `string_literals` dictionary
+    is given, the literal is interned in it and referred to by name.
+    """
+    if string_literals is not None:
+        name = string_literals.setdefault(c_string_literal, f'__throbac_literal_{len(string_literals)}')
+        return f'(&{name})' if counted_strings else name
+    if counted_strings:
+        return f'__throbac_string_literal({c_string_literal})'
+    return c_string_literal
+
+
+def c_string_table(string_literals, counted_strings=False):
+    """
+    The C definitions of the interned `string_literals`, one per line and
+    each preceded by a newline, for the top of the generated file.
+    """
+    if not string_literals:
+        return ''
+    if counted_strings:
+        definitions = [f'static struct __throbac_string_header {name} = {{sizeof({literal}) - 1, {literal}}};'
+                       for literal, name in string_literals.items()]
+    else:
+        definitions = [f'static char *const {name} = {literal};'
+                       for literal, name in string_literals.items()]
+    return ''.join(f'\n{definition}' for definition in definitions) + '\n'
+
+
+def c_literal(value, counted_strings=False, string_literals=None):
+    """
+    The C text for a folded NUMERUS (`int`), VERITAS (`bool`) or LOCUTIO
+    (`str`) value.
+    """
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        # note the raw string
+        return c_string('"' + value.replace('\n', r'\n') + '"', counted_strings, string_literals)
+    return str(value)
+
+
+def c_string_compare(op, left, right, counted_strings=False):
+    """
+    The C comparing the LOCUTIO expressions `left` and `right` by content;
+    length-prefixed strings check the lengths first for IDEM and NI.IDEM.
+    """
+    if counted_strings and op in ('IDEM', 'NI.IDEM'):
+        negation = '!' if op == 'NI.IDEM' else ''
+        return f'{negation}__throbac_string_equal({left}, {right})'
+    compare = '__throbac_string_compare' if counted_strings else '__throbac_compare'
+    return f'{compare}({left}, {right}) {COMPARE_OPS[op]} 0'
+
+
+def c_print_bool(expr):
+    """
+    The C printing the VERITAS expression `expr` as true or false.
+    """
+    return f'printf("%s", ({expr}) ? "true" : "false");'
+
+
+def c_concatenation(operands, counted_strings=False):
+    """
+    The C for concatenating the C string expressions in `operands`: a chain
+    of three or more is a single `__throbac_catn` call, which allocates once.
+    """
+    cat = '__throbac_string_cat' if counted_strings else '__throbac_cat'
+    if len(operands) == 2:
+        return f'{cat}({operands[0]}, {operands[1]})'
+    return f'{cat}n({len(operands)}, {", ".join(operands)})'
+
+
+def releases_arena(ctx: ThrobacParser.FuncDefContext):
+    """
+    Whether the function defined by `ctx` should release the strings it
+    builds when it returns: it doesn't return a LOCUTIO, and it has an IUNGO
+    or a call to something other than `stringlength`, either of which may
+    allocate. Throbac has no global variables, so nothing else can keep
+    hold of those strings.
+    """
+    return ((ctx.TYPE() is None or ctx.TYPE().getText() != 'LOCUTIO')
+            and may_allocate(ctx.body()))
+
+
+def may_allocate(ctx):
+    if isinstance(ctx, ThrobacParser.ConcatenationContext):
+        return True
+    if isinstance(ctx, ThrobacParser.FuncCallContext) and ctx.ID().getText() != 'stringlength':
+        return True
+    return any(may_allocate(child) for child in ctx.children or ()
+               if isinstance(child, ParserRuleContext))
+
+
+def c_arena_return(expr):
+    """
+    The C for returning `expr` (None for a bare return) from a function that
+    releases the arena.
+    """
+    if expr is None:
+        return '__throbac_arena_release(__throbac_mark);\nreturn;'
+    return f'return __throbac_arena_return(__throbac_mark, {expr});'
+
+
+def ends_with_return(ctx: ThrobacParser.FuncDefContext):
+    """
+    Whether the last statement of the function defined by `ctx` is a REDEO.
+    """
+    statements = ctx.body().block().statement()
+    return bool(statements) and isinstance(statements[-1], ThrobacParser.ReturnContext)
+
+
+def c_arena_body(body, return_type, ends_with_return):
+    """
+    Wraps the C `body` of a function that releases the arena with taking the
+    mark and, for a void function that can run off its end, releasing it.
+    """
+    body = f'char *__throbac_mark = __throbac_arena_mark();\n{body}'
+    if return_type == 'void' and not ends_with_return:
+        body = f'{body}\n__throbac_arena_release(__throbac_mark);'
+    return body
+
 
 def c_block(node):
     """
@@ -35,8 +201,56 @@ def c_block(node):
 
 class Throbac2CTranslator(ThrobacListener):
 
-    def __init__(self):
+    def __init__(self, constants=None, counted_strings=False, intern_strings=False, types=None):
         self.c_translation = {}
+        self.constants = constants or {}
+        self.types = types
+        self.counted_strings = counted_strings
+        # C string literal -> name, when interning
+        self.string_literals = {} if intern_strings else None
+        # for each concatenation, the C for the operands of its flattened chain
+        self.concatenation_operands = {}
+        # whether the function being translated releases the arena
+        self.releases_arena = False
+
+
+    def folded(self, ctx):
+        """
+        Translates `ctx` as its folded value, if it has one, and says whether
+        it did.
+        """
+        if ctx in self.constants:
+            self.c_translation[ctx] = c_literal(self.constants[ctx], self.counted_strings,
+                                                self.interned_literals(ctx))
+            return True
+        return False
+
+
+    def interned_literals(self, ctx):
+        """
+        The table to intern the string literals of `ctx` in, or None if they
+        aren't interned. They aren't when `ctx` is under a folded expression,
+        or in an SI or DUM block that folding removed, since its translation
+        is never emitted; so the table holds the literals the C uses, in the
+        order `Throbac2CVisitor` numbers them.
+        """
+        if self.string_literals is None:
+            return None
+        child, parent = ctx, ctx.parentCtx
+        while parent is not None:
+            if parent in self.constants:
+                return None
+            if isinstance(parent, (ThrobacParser.IfContext, ThrobacParser.WhileContext)):
+                condition = self.constants.get(parent.expr())
+                if condition is not None and child is not parent.expr():
+                    if isinstance(parent, ThrobacParser.IfContext):
+                        taken = parent.block(0) if condition else parent.block(1)
+                    else:
+                        taken = parent.block() if condition else None
+                    if child is not taken:
+                        return None
+            child, parent = parent, parent.parentCtx
+        return self.string_literals
 
 
     def exitNumber(self, ctx: ThrobacParser.NumberContext):
@@ -49,9 +263,13 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitString(self, ctx: ThrobacParser.StringContext):
+        if self.folded(ctx):
+            return
+
         throbac = ctx.getText()
         c_with_pluses = f'"{throbac.strip("^")}"'
-        self.c_translation[ctx] = c_with_pluses.replace('+', r'\n')  # note the raw string
+        c_with_newlines = c_with_pluses.replace('+', r'\n')  # note the raw string
+        self.c_translation[ctx] = c_string(c_with_newlines, self.counted_strings, self.interned_literals(ctx))
 
 
     def exitScript(self, ctx: ThrobacParser.ScriptContext):
@@ -63,6 +281,9 @@ class Throbac2CTranslator(ThrobacListener):
             # includes the libraries required to run a throbac file
             self.c_translation[ctx] = '#include <stdio.h>\n#include <stdbool.h>\n#include "throbac.h"\n'
 
+            # the interned string literals, if any
+            self.c_translation[ctx] += c_string_table(self.string_literals, self.counted_strings)
+
             # makes the function declarations before the main statement
             for dec in funcDefList:
 
@@ -80,6 +301,10 @@ class Throbac2CTranslator(ThrobacListener):
             self.c_translation[ctx] = ""
 
 
+    def enterFuncDef(self, ctx: ThrobacParser.FuncDefContext):
+        self.releases_arena = releases_arena(ctx)
+
+
     def exitFuncDef(self, ctx: ThrobacParser.FuncDefContext):
 
         # Unpack the namedefs
@@ -95,18 +320,19 @@ class Throbac2CTranslator(ThrobacListener):
         # Get ID token
         this_id = ctx.ID().getText()
 
-        # Get the body translation with tabulations
-        this_body = "\n\t".join(self.c_translation[ctx.body()].splitlines())
-
         # return for TYPE could be none
         if ctx.TYPE() is not None:
-            this_type = ctx.TYPE().getText()
-            this_return = ('int' if this_type == "NUMERUS" else
-                           'char*' if this_type == "LOCUTIO"
-                           else 'bool')
+            this_return = c_type(ctx.TYPE().getText(), self.counted_strings)
         else:
             this_return = "void"
 
+        # Get the body translation with tabulations
+        this_body = self.c_translation[ctx.body()]
+        if self.releases_arena:
+            this_body = c_arena_body(this_body, this_return, ends_with_return(ctx))
+            self.releases_arena = False
+        this_body = "\n\t".join(this_body.splitlines())
+
         self.c_translation[ctx] = f'{this_return} {this_id}({nameDef_str}) {{\n\t{this_body}\n}}'
 
 
@@ -166,9 +392,7 @@ class Throbac2CTranslator(ThrobacListener):
         this_type = ctx.TYPE().getText()
 
         # Determining strings
-        str_id = ('int' if this_type == "NUMERUS" else
-                  'char*' if this_type == "LOCUTIO"
-                  else 'bool')
+        str_id = c_type(this_type, self.counted_strings)
 
         # Setting the translation
         self.c_translation[ctx] = f'{str_id} {this_id}'
@@ -180,7 +404,9 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitBlock(self, ctx: ThrobacParser.BlockContext):
-        statementList = [self.c_translation[this_statement] for this_statement in ctx.statement()]
+        # statements removed by constant folding translate to ''
+        statementList = [self.c_translation[this_statement] for this_statement in ctx.statement()
+                         if self.c_translation[this_statement]]
         self.c_translation[ctx] = '\n'.join(statementList)
 
 
@@ -191,6 +417,10 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitWhile(self, ctx: ThrobacParser.WhileContext):
+        if self.constants.get(ctx.expr()) is False:
+            self.c_translation[ctx] = ''
+            return
+
         expr = self.c_translation[ctx.expr()]
         block = "\n\t".join(self.c_translation[ctx.block()].splitlines())
 
@@ -199,6 +429,13 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitIf(self, ctx: ThrobacParser.IfContext):
+        # a folded condition leaves only the block that would run
+        condition = self.constants.get(ctx.expr())
+        if condition is not None:
+            taken = ctx.block(0) if condition else ctx.block(1)
+            self.c_translation[ctx] = self.c_translation[taken] if taken is not None else ''
+            return
+
         expr = self.c_translation[ctx.expr()]
         block1 = "\n\t".join(self.c_translation[ctx.block(0)].splitlines())
 
@@ -222,7 +459,10 @@ class Throbac2CTranslator(ThrobacListener):
         this_expr = self.c_translation[ctx.expr()]
 
         # Setting translation
-        self.c_translation[ctx] = f'printf("%s", {this_expr});'
+        if self.counted_strings:
+            self.c_translation[ctx] = f'__throbac_string_print({this_expr});'
+        else:
+            self.c_translation[ctx] = f'printf("%s", {this_expr});'
 
 
     def exitPrintBool(self, ctx: ThrobacParser.PrintBoolContext):
@@ -230,12 +470,18 @@ class Throbac2CTranslator(ThrobacListener):
         this_expr = self.c_translation[ctx.expr()]
 
         # Setting translation
-        self.c_translation[ctx] = f'printf("%s", "{this_expr}");'
+        if self.types is not None:
+            self.c_translation[ctx] = c_print_bool(this_expr)
+        else:
+            self.c_translation[ctx] = f'printf("%s", "{this_expr}");'
 
 
     def exitReturn(self, ctx: ThrobacParser.ReturnContext):
         # Account for no expr added in return statement
-        if ctx.expr() is None:
+        if self.releases_arena:
+            self.c_translation[ctx] = c_arena_return(self.c_translation[ctx.expr()]
+                                                     if ctx.expr() is not None else None)
+        elif ctx.expr() is None:
             self.c_translation[ctx] = f"return;"
         else:
             this_expr = self.c_translation[ctx.expr()]
@@ -248,10 +494,19 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitParens(self, ctx: ThrobacParser.ParensContext):
+        if self.folded(ctx):
+            return
+
         self.c_translation[ctx] = f'({self.c_translation[ctx.expr()]})'
+        # a parenthesized chain is still part of an enclosing chain
+        if ctx.expr() in self.concatenation_operands:
+            self.concatenation_operands[ctx] = self.concatenation_operands[ctx.expr()]
 
 
     def exitNegation(self, ctx: ThrobacParser.NegationContext):
+        if self.folded(ctx):
+            return
+
         # Getting expr translation
         expr_text = self.c_translation[ctx.expr()]
         this_op = ctx.op.text
@@ -273,9 +528,16 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitCompare(self, ctx: ThrobacParser.CompareContext):
+        if self.folded(ctx):
+            return
+
         left = self.c_translation[ctx.expr(0)]
         right = self.c_translation[ctx.expr(1)]
 
+        if self.types is not None and self.types.get(ctx.expr(0)) == 'LOCUTIO':
+            self.c_translation[ctx] = c_string_compare(ctx.op.text, left, right, self.counted_strings)
+            return
+
         # determines the type of comparison and generates the appropriate c equivalent
         self.c_translation[ctx] = (f'{left} == {right}'
                                    if ctx.op.text == 'IDEM'
@@ -291,9 +553,16 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
-        left = self.c_translation[ctx.expr(0)]
-        right = self.c_translation[ctx.expr(1)]
-        self.c_translation[ctx] = f'__throbac_cat({left}, {right})'
+        if self.folded(ctx):
+            return
+
+        # a IUNGO b IUNGO c is one chain of three operands, not two nested
+        # concatenations
+        operands = []
+        for operand in ctx.expr():
+            operands.extend(self.concatenation_operands.get(operand, [self.c_translation[operand]]))
+        self.concatenation_operands[ctx] = operands
+        self.c_translation[ctx] = c_concatenation(operands, self.counted_strings)
 
 
     def exitBool(self, ctx: ThrobacParser.BoolContext):
@@ -308,6 +577,9 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        if self.folded(ctx):
+            return
+
         # Retrieve translations of left and right children
         left = self.c_translation[ctx.expr(0)]
         right = self.c_translation[ctx.expr(1)]
@@ -324,6 +596,9 @@ class Throbac2CTranslator(ThrobacListener):
 
 
     def exitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        if self.folded(ctx):
+            return
+
         # gets the values of the left and right node
         left = self.c_translation[ctx.expr(0)]
         right = self.c_translation[ctx.expr(1)]
@@ -336,6 +611,8 @@ class Throbac2CTranslator(ThrobacListener):
 
     def exitFuncCall(self, ctx: ThrobacParser.FuncCallContext):
         this_id = ctx.ID().getText()
+        if self.counted_strings:
+            this_id = COUNTED_STRING_FUNCTIONS.get(this_id, this_id)
 
         # Getting the expressions in a string
         exprList = [self.c_translation[this_expr] for this_expr in ctx.expr()]
@@ -343,3 +620,197 @@ class Throbac2CTranslator(ThrobacListener):
 
         # Setting translation
         self.c_translation[ctx] = f'{this_id}({exprStr})'
+
+
+class Throbac2CVisitor(ThrobacVisitor):
+    """
+    Produces the same C as `Throbac2CTranslator`, but as a visitor: each
+    `visit*` method returns the C for its node directly, so nothing is
+    stored per node. Translate a tree with `Throbac2CVisitor().visit(tree)`.
+    """
+
+    def __init__(self, constants=None, counted_strings=False, intern_strings=False, types=None):
+        self.constants = constants or {}
+        self.types = types
+        self.counted_strings = counted_strings
+        self.string_literals = {} if intern_strings else None
+        self.releases_arena = False
+
+    def visit(self, tree):
+        if tree in self.constants:
+            return c_literal(self.constants[tree], self.counted_strings, self.string_literals)
+        return tree.accept(self)
+
+    def visitNumber(self, ctx: ThrobacParser.NumberContext):
+        throbac_digits = ctx.getText().strip('.').split('.')
+        # str(int(...)) removes leading zeroes, since C doesn't permit them
+        return str(int(''.join(DIGIT_MAP[td] for td in throbac_digits)))
+
+    def visitString(self, ctx: ThrobacParser.StringContext):
+        c_with_pluses = f'"{ctx.getText().strip("^")}"'
+        c_with_newlines = c_with_pluses.replace('+', r'\n')  # note the raw string
+        return c_string(c_with_newlines, self.counted_strings, self.string_literals)
+
+    def visitScript(self, ctx: ThrobacParser.ScriptContext):
+        func_defs = [self.visit(func_def) for func_def in ctx.funcDef()]
+        main = self.visit(ctx.main())
+        if not main:
+            return ''
+
+        # the function declarations are the first line of each definition,
+        # with the trailing " {" replaced by ";"
+        declarations = ''.join(f'\n{func_def.splitlines()[0][:-2]};' for func_def in func_defs)
+        func_defs_str = '\n'.join(func_defs)
+        string_table = c_string_table(self.string_literals, self.counted_strings)
+        return (f'#include <stdio.h>\n#include <stdbool.h>\n#include "throbac.h"\n'
+                f'{string_table}{declarations}\n{main}\n{func_defs_str}')
+
+    def visitFuncDef(self, ctx: ThrobacParser.FuncDefContext):
+        params = ', '.join(self.visit(name_def) for name_def in ctx.nameDef())
+        return_type = (c_type(ctx.TYPE().getText(), self.counted_strings) if ctx.TYPE() is not None
+                       else 'void')
+        self.releases_arena = releases_arena(ctx)
+        body = self.visit(ctx.body())
+        if self.releases_arena:
+            body = c_arena_body(body, return_type, ends_with_return(ctx))
+            self.releases_arena = False
+        body = "\n\t".join(body.splitlines())
+        return f'{return_type} {ctx.ID().getText()}({params}) {{\n\t{body}\n}}'
+
+    def visitMain(self, ctx: ThrobacParser.MainContext):
+        separated_lines = self.visit(ctx.body()).splitlines()
+        if not separated_lines:
+            return "int main(){\n\n}"
+
+        # if there is already a return statement don't create a second one
+        return_str = '' if "return" in separated_lines[-1] else "\treturn 0;\n"
+        body = "\n\t".join(separated_lines)
+        return f'int main() {{\n\t{body}\n{return_str}}}'
+
+    def visitBody(self, ctx: ThrobacParser.BodyContext):
+        block = self.visit(ctx.block())
+        var_block = self.visit(ctx.varBlock())
+        new_line = '\n' if var_block != '' and block != '' else ''
+        return f'{var_block}{new_line}{block}'
+
+    def visitVarDec(self, ctx: ThrobacParser.VarDecContext):
+        throbac_type = ctx.nameDef().TYPE().getText()
+        init_str = ("= 0" if throbac_type == "NUMERUS" else
+                    "= NULL" if throbac_type == "LOCUTIO" else
+                    "= false")
+        return f'{self.visit(ctx.nameDef())} {init_str};'
+
+    def visitNameDef(self, ctx: ThrobacParser.NameDefContext):
+        return f'{c_type(ctx.TYPE().getText(), self.counted_strings)} {ctx.ID().getText()}'
+
+    def visitVarBlock(self, ctx: ThrobacParser.VarBlockContext):
+        return '\n'.join(self.visit(var_dec) for var_dec in ctx.varDec())
+
+    def visitBlock(self, ctx: ThrobacParser.BlockContext):
+        statements = (self.visit(statement) for statement in ctx.statement())
+        return '\n'.join(statement for statement in statements if statement)
+
+    def visitAssignment(self, ctx: ThrobacParser.AssignmentContext):
+        return f'{ctx.ID().getText()} = {self.visit(ctx.expr())};'
+
+    def visitWhile(self, ctx: ThrobacParser.WhileContext):
+        if self.constants.get(ctx.expr()) is False:
+            return ''
+        # the condition first, so string literals are interned in source order
+        expr = self.visit(ctx.expr())
+        block = "\n\t".join(self.visit(ctx.block()).splitlines())
+        return f'while ({expr}) {{\n\t{block}\n}}'
+
+    def visitIf(self, ctx: ThrobacParser.IfContext):
+        condition = self.constants.get(ctx.expr())
+        if condition is not None:
+            taken = ctx.block(0) if condition else ctx.block(1)
+            return self.visit(taken) if taken is not None else ''
+        expr = self.visit(ctx.expr())
+        block1 = "\n\t".join(self.visit(ctx.block(0)).splitlines())
+        c = f'if ({expr}) {{\n\t{block1}\n}}'
+        if ctx.block(1) is not None:
+            block2 = "\n\t".join(self.visit(ctx.block(1)).splitlines())
+            c = f'{c} else {{\n\t{block2}\n}}'
+        return c
+
+    def visitPrintNumber(self, ctx: ThrobacParser.PrintNumberContext):
+        return f'printf("%d", {self.visit(ctx.expr())});'
+
+    def visitPrintString(self, ctx: ThrobacParser.PrintStringContext):
+        if self.counted_strings:
+            return f'__throbac_string_print({self.visit(ctx.expr())});'
+        return f'printf("%s", {self.visit(ctx.expr())});'
+
+    def visitPrintBool(self, ctx: ThrobacParser.PrintBoolContext):
+        if self.types is not None:
+            return c_print_bool(self.visit(ctx.expr()))
+        return f'printf("%s", "{self.visit(ctx.expr())}");'
+
+    def visitReturn(self, ctx: ThrobacParser.ReturnContext):
+        if self.releases_arena:
+            return c_arena_return(self.visit(ctx.expr()) if ctx.expr() is not None else None)
+        if ctx.expr() is None:
+            return "return;"
+        return f"return {self.visit(ctx.expr())};"
+
+    def visitFuncCallStmt(self, ctx: ThrobacParser.FuncCallStmtContext):
+        return self.visit(ctx.funcCall()) + ';'
+
+    def visitParens(self, ctx: ThrobacParser.ParensContext):
+        return f'({self.visit(ctx.expr())})'
+
+    def visitNegation(self, ctx: ThrobacParser.NegationContext):
+        expr_text = self.visit(ctx.expr())
+        if ctx.op.text == 'NI':
+            return f"!({expr_text})"
+        # NEGANS: parenthesize an operand that is already negative
+        return f'-({expr_text})' if expr_text[0] == "-" else "-" + expr_text
+
+    def visitCompare(self, ctx: ThrobacParser.CompareContext):
+        left = self.visit(ctx.expr(0))
+        right = self.visit(ctx.expr(1))
+        if self.types is not None and self.types.get(ctx.expr(0)) == 'LOCUTIO':
+            return c_string_compare(ctx.op.text, left, right, self.counted_strings)
+        return f'{left} {COMPARE_OPS[ctx.op.text]} {right}'
+
+    def visitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
+        return c_concatenation(self.concatenation_operands(ctx), self.counted_strings)
+
+    def concatenation_operands(self, ctx):
+        """
+        The C for the operands of the concatenation chain rooted at `ctx`,
+        looking through nested (and parenthesized) concatenations.
+        """
+        operands = []
+        for operand in ctx.expr():
+            inner = operand.expr() if isinstance(operand, ThrobacParser.ParensContext) else operand
+            if isinstance(inner, ThrobacParser.ConcatenationContext) and operand not in self.constants:
+                operands.extend(self.concatenation_operands(inner))
+            else:
+                operands.append(self.visit(operand))
+        return operands
+
+    def visitBool(self, ctx: ThrobacParser.BoolContext):
+        return "true" if ctx.getText() == "VERUM" else "false"
+
+    def visitVariable(self, ctx: ThrobacParser.VariableContext):
+        return ctx.getText()
+
+    def visitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        op = '+' if ctx.op.text == 'ADDO' else '-'
+        return f'{self.visit(ctx.expr(0))} {op} {self.visit(ctx.expr(1))}'
+
+    def visitFuncCallExpr(self, ctx: ThrobacParser.FuncCallExprContext):
+        return self.visit(ctx.funcCall())
+
+    def visitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        op = '*' if ctx.op.text == 'CONGERO' else '/'
+        return f'{self.visit(ctx.expr(0))} {op} {self.visit(ctx.expr(1))}'
+
+    def visitFuncCall(self, ctx: ThrobacParser.FuncCallContext):
+        args = ', '.join(self.visit(expr) for expr in ctx.expr())
+        name = ctx.ID().getText()
+        if self.counted_strings:
+            name = COUNTED_STRING_FUNCTIONS.get(name, name)
+        return f'{name}({args})'
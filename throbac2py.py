@@ -0,0 +1,245 @@
+"""
+When used as a parse tree Listener on a valid Throbac parse tree, creates a
+translation to Python for each node and stores this in the
+`self.py_translation` dictionary, in the same way `Throbac2CTranslator`
+does for C. Each funcDef becomes a `def`, the main program becomes the
+function `__throbac_main`, which the module calls last, DUM becomes `while`
+and IUNGO becomes `+`.
+
+`compile_source` translates a script and compiles the Python with
+`compile()`, keeping the code object in `CODE_CACHE` under a hash of the
+Throbac source, so running the same script again skips parsing and
+translation. The cache keeps the `MAX_CACHED_CODE` most recently used. `run_source` executes it.
+
+Values follow the C translation and `throbac_vm`: NUMERUS arithmetic wraps
+at 32 bits and PARTIO truncates toward zero, LOCUTIO values compare by
+content, and VERITAS.IMPRIMO prints true or false. Throbac recursion is
+Python recursion, so it's limited by `sys.getrecursionlimit()`.
+"""
+
+from collections import OrderedDict
+import hashlib
+import keyword
+import sys
+import threading
+
+import generic_parser
+from antlr4 import DispatchTableWalker
+from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacListener import ThrobacListener
+from throbac.ThrobacParser import ThrobacParser
+from throbac2c import DIGIT_MAP, COMPARE_OPS
+from throbac_vm import ThrobacRuntimeError, substring, wrap
+
+INITIAL_VALUES = {'NUMERUS': '0', 'LOCUTIO': "''", 'VERITAS': 'False'}
+
+# the names the generated code uses for the runtime; Throbac IDs can't
+# contain '_', so they can't clash with these
+BUILT_IN_FUNCTIONS = {'stringlength': '__throbac_length', 'substring': '__throbac_substring'}
+
+MAX_CACHED_CODE = 256
+
+# Throbac source hash -> code object, least recently used first
+CODE_CACHE = OrderedDict()
+code_cache_lock = threading.Lock()
+
+
+def py_name(throbac_id):
+    """
+    The Python name for a Throbac function or variable.
+    """
+    return throbac_id + '_' if keyword.iskeyword(throbac_id) else throbac_id
+
+
+def py_wrap(expr):
+    """
+    The Python for the NUMERUS `expr` wrapped to a 32-bit signed int. It's
+    inline arithmetic, rather than a call, so CPython can fold it.
+    """
+    return f'(({expr}) + 2147483648 & 4294967295) - 2147483648'
+
+
+def py_block(lines):
+    # Python needs at least one statement in a block
+    return '\n    '.join(lines.splitlines()) if lines else 'pass'
+
+
+def divide(left, right):
+    """
+    `left` PARTIO `right`, truncating toward zero as C does.
+    """
+    if right == 0:
+        raise ThrobacRuntimeError('Division by zero.')
+    quotient = abs(left) // abs(right)
+    return wrap(quotient if (left < 0) == (right < 0) else -quotient)
+
+
+def translate_script(parse_tree):
+    """
+    The Python translation of a script parse tree.
+    """
+    translator = Throbac2PyTranslator()
+    DispatchTableWalker().walk(translator, parse_tree)
+    return translator.py_translation[parse_tree]
+
+
+def compile_source(source):
+    """
+    The code object for Throbac `source`, from `CODE_CACHE` if it's been
+    compiled before.
+    """
+    key = hashlib.sha256(source.encode()).hexdigest()
+    with code_cache_lock:
+        code = CODE_CACHE.get(key)
+        if code is not None:
+            CODE_CACHE.move_to_end(key)
+            return code
+
+    parse_tree = generic_parser.parse(source, 'script', ThrobacLexer, ThrobacParser)
+    code = compile(translate_script(parse_tree), '<throbac>', 'exec')
+    with code_cache_lock:
+        CODE_CACHE[key] = code
+        while len(CODE_CACHE) > MAX_CACHED_CODE:
+            CODE_CACHE.popitem(last=False)
+    return code
+
+
+def run_source(source, out=None):
+    """
+    Compiles (or finds in the cache) and runs Throbac `source`, writing what
+    it prints to `out` (by default standard output).
+    """
+    exec(compile_source(source), {
+        '__throbac_write': (out or sys.stdout).write,
+        '__throbac_str': str,
+        '__throbac_length': len,
+        '__throbac_substring': substring,
+        '__throbac_divide': divide,
+    })
+
+
+class Throbac2PyTranslator(ThrobacListener):
+
+    def __init__(self):
+        self.py_translation = {}
+
+    def exitScript(self, ctx: ThrobacParser.ScriptContext):
+        func_defs = [self.py_translation[func_def] for func_def in ctx.funcDef()]
+        self.py_translation[ctx] = '\n\n'.join(func_defs + [self.py_translation[ctx.main()],
+                                                            '__throbac_main()\n'])
+
+    def exitFuncDef(self, ctx: ThrobacParser.FuncDefContext):
+        params = ', '.join(self.py_translation[name_def] for name_def in ctx.nameDef())
+        body = py_block(self.py_translation[ctx.body()])
+        self.py_translation[ctx] = f'def {py_name(ctx.ID().getText())}({params}):\n    {body}\n'
+
+    def exitMain(self, ctx: ThrobacParser.MainContext):
+        body = py_block(self.py_translation[ctx.body()])
+        self.py_translation[ctx] = f'def __throbac_main():\n    {body}\n'
+
+    def exitBody(self, ctx: ThrobacParser.BodyContext):
+        parts = [self.py_translation[ctx.varBlock()], self.py_translation[ctx.block()]]
+        self.py_translation[ctx] = '\n'.join(part for part in parts if part)
+
+    def exitVarDec(self, ctx: ThrobacParser.VarDecContext):
+        initial_value = INITIAL_VALUES[ctx.nameDef().TYPE().getText()]
+        self.py_translation[ctx] = f'{self.py_translation[ctx.nameDef()]} = {initial_value}'
+
+    def exitNameDef(self, ctx: ThrobacParser.NameDefContext):
+        self.py_translation[ctx] = py_name(ctx.ID().getText())
+
+    def exitVarBlock(self, ctx: ThrobacParser.VarBlockContext):
+        self.py_translation[ctx] = '\n'.join(self.py_translation[var_dec] for var_dec in ctx.varDec())
+
+    def exitBlock(self, ctx: ThrobacParser.BlockContext):
+        self.py_translation[ctx] = '\n'.join(self.py_translation[statement]
+                                             for statement in ctx.statement())
+
+    def exitAssignment(self, ctx: ThrobacParser.AssignmentContext):
+        self.py_translation[ctx] = f'{py_name(ctx.ID().getText())} = {self.py_translation[ctx.expr()]}'
+
+    def exitWhile(self, ctx: ThrobacParser.WhileContext):
+        block = py_block(self.py_translation[ctx.block()])
+        self.py_translation[ctx] = f'while {self.py_translation[ctx.expr()]}:\n    {block}'
+
+    def exitIf(self, ctx: ThrobacParser.IfContext):
+        block = py_block(self.py_translation[ctx.block(0)])
+        self.py_translation[ctx] = f'if {self.py_translation[ctx.expr()]}:\n    {block}'
+        if ctx.block(1) is not None:
+            else_block = py_block(self.py_translation[ctx.block(1)])
+            self.py_translation[ctx] += f'\nelse:\n    {else_block}'
+
+    def exitPrintNumber(self, ctx: ThrobacParser.PrintNumberContext):
+        self.py_translation[ctx] = f'__throbac_write(__throbac_str({self.py_translation[ctx.expr()]}))'
+
+    def exitPrintString(self, ctx: ThrobacParser.PrintStringContext):
+        self.py_translation[ctx] = f'__throbac_write({self.py_translation[ctx.expr()]})'
+
+    def exitPrintBool(self, ctx: ThrobacParser.PrintBoolContext):
+        self.py_translation[ctx] = f"__throbac_write('true' if {self.py_translation[ctx.expr()]} else 'false')"
+
+    def exitReturn(self, ctx: ThrobacParser.ReturnContext):
+        if ctx.expr() is None:
+            self.py_translation[ctx] = 'return'
+        else:
+            self.py_translation[ctx] = f'return {self.py_translation[ctx.expr()]}'
+
+    def exitFuncCallStmt(self, ctx: ThrobacParser.FuncCallStmtContext):
+        self.py_translation[ctx] = self.py_translation[ctx.funcCall()]
+
+    def exitParens(self, ctx: ThrobacParser.ParensContext):
+        self.py_translation[ctx] = f'({self.py_translation[ctx.expr()]})'
+
+    def exitNegation(self, ctx: ThrobacParser.NegationContext):
+        expr = self.py_translation[ctx.expr()]
+        if ctx.op.text == 'NI':
+            self.py_translation[ctx] = f'(not {expr})'
+        else:
+            self.py_translation[ctx] = f'({py_wrap(f"-{expr}")})'
+
+    def exitCompare(self, ctx: ThrobacParser.CompareContext):
+        # parenthesized, since Python would chain a < b < c
+        left = self.py_translation[ctx.expr(0)]
+        right = self.py_translation[ctx.expr(1)]
+        self.py_translation[ctx] = f'({left} {COMPARE_OPS[ctx.op.text]} {right})'
+
+    def exitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
+        left = self.py_translation[ctx.expr(0)]
+        right = self.py_translation[ctx.expr(1)]
+        self.py_translation[ctx] = f'({left} + {right})'
+
+    def exitNumber(self, ctx: ThrobacParser.NumberContext):
+        throbac_digits = ctx.getText().strip('.').split('.')
+        self.py_translation[ctx] = str(int(''.join(DIGIT_MAP[td] for td in throbac_digits)))
+
+    def exitString(self, ctx: ThrobacParser.StringContext):
+        self.py_translation[ctx] = repr(ctx.getText().strip('^').replace('+', '\n'))
+
+    def exitBool(self, ctx: ThrobacParser.BoolContext):
+        self.py_translation[ctx] = 'True' if ctx.getText() == 'VERUM' else 'False'
+
+    def exitVariable(self, ctx: ThrobacParser.VariableContext):
+        self.py_translation[ctx] = py_name(ctx.getText())
+
+    def exitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        left = self.py_translation[ctx.expr(0)]
+        right = self.py_translation[ctx.expr(1)]
+        op = '+' if ctx.op.text == 'ADDO' else '-'
+        self.py_translation[ctx] = f'({py_wrap(f"{left} {op} {right}")})'
+
+    def exitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        left = self.py_translation[ctx.expr(0)]
+        right = self.py_translation[ctx.expr(1)]
+        if ctx.op.text == 'CONGERO':
+            self.py_translation[ctx] = f'({py_wrap(f"{left} * {right}")})'
+        else:
+            self.py_translation[ctx] = f'__throbac_divide({left}, {right})'
+
+    def exitFuncCallExpr(self, ctx: ThrobacParser.FuncCallExprContext):
+        self.py_translation[ctx] = self.py_translation[ctx.funcCall()]
+
+    def exitFuncCall(self, ctx: ThrobacParser.FuncCallContext):
+        name = ctx.ID().getText()
+        function = BUILT_IN_FUNCTIONS.get(name, py_name(name))
+        arguments = ', '.join(self.py_translation[argument] for argument in ctx.expr())
+        self.py_translation[ctx] = f'{function}({arguments})'
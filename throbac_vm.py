@@ -0,0 +1,410 @@
+"""
+Runs Throbac scripts without a C toolchain: `ThrobacCompiler` compiles a
+script parse tree to stack bytecode, one `Function` per funcDef plus one for
+the main program, and `run` executes it in a dispatch loop.
+
+Each instruction is an opcode and an operand, stored as two consecutive
+entries of the function's `array('l')` code; the operand is 0 for opcodes
+that don't use one. Calls don't recurse in Python: the loop keeps its own
+stack of suspended frames.
+
+Values follow the C translation: NUMERUS arithmetic wraps at 32 bits and
+PARTIO truncates toward zero, LOCUTIO values compare by content (as in the
+typed translation), and VERITAS.IMPRIMO prints true or false. LOCUTIO
+variables start out as the empty string rather than NULL.
+"""
+
+from array import array
+from dataclasses import dataclass
+import sys
+
+import generic_parser
+from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacParser import ThrobacParser
+from throbac.ThrobacVisitor import ThrobacVisitor
+from throbac2c import DIGIT_MAP
+
+# opcodes
+CONST = 0           # push constants[operand]
+LOAD = 1            # push local variable operand
+STORE = 2           # pop into local variable operand
+ADD = 3
+SUB = 4
+MUL = 5
+DIV = 6
+NEG = 7
+NOT = 8
+CAT = 9
+EQ = 10
+NE = 11
+LT = 12
+LE = 13
+GT = 14
+GE = 15
+JUMP = 16           # continue at operand
+JUMP_IF_FALSE = 17  # pop, and continue at operand if false
+CALL = 18           # call functions[operand] with its arguments from the stack
+STRINGLENGTH = 19
+SUBSTRING = 20
+RETURN = 21         # return the popped value
+RETURN_NONE = 22
+POP = 23
+PRINT_NUMBER = 24
+PRINT_STRING = 25
+PRINT_BOOL = 26
+
+OPCODE_NAMES = {value: name for name, value in list(globals().items())
+                if name.isupper() and isinstance(value, int)}
+
+COMPARE_OPCODES = {'IDEM': EQ, 'NI.IDEM': NE, 'INFRA': LT,
+                   'INFRA.IDEM': LE, 'SUPRA': GT, 'SUPRA.IDEM': GE}
+
+BUILT_IN_OPCODES = {'stringlength': STRINGLENGTH, 'substring': SUBSTRING}
+
+INITIAL_VALUES = {'NUMERUS': 0, 'LOCUTIO': '', 'VERITAS': False}
+
+
+class ThrobacRuntimeError(Exception):
+    pass
+
+
+@dataclass
+class Function:
+    name: str
+    parameter_count: int
+    # the initial values of the parameters' slots (unused) and the variables
+    initial_locals: list
+    code: array
+    constants: list
+
+    def disassemble(self):
+        """
+        The code as one 'offset OPCODE operand' line per instruction.
+        """
+        return '\n'.join(f'{offset:4} {OPCODE_NAMES[self.code[offset]]} {self.code[offset + 1]}'
+                         for offset in range(0, len(self.code), 2))
+
+
+@dataclass
+class Program:
+    functions: list
+    main: Function
+
+
+def compile_source(source, constants=None):
+    """
+    Parses Throbac `source` as a script and compiles it to a `Program`.
+    """
+    return compile_script(generic_parser.parse(source, 'script', ThrobacLexer, ThrobacParser),
+                          constants)
+
+
+def compile_script(parse_tree, constants=None):
+    """
+    Compiles a script parse tree to a `Program`. Given the `constants` found
+    by `constant_folding.fold_constants`, folded expressions are compiled as
+    their values.
+    """
+    return ThrobacCompiler(constants).visit(parse_tree)
+
+
+class ThrobacCompiler(ThrobacVisitor):
+    """
+    Compiles a script. The `visit*` methods of statements and expressions
+    append instructions to the function being compiled, and return nothing.
+    """
+
+    def __init__(self, constants=None):
+        self.folded_constants = constants or {}
+        self.function_indexes = {}
+        # the function being compiled
+        self.code = None
+        self.constants = None
+        self.local_indexes = None
+
+    def emit(self, opcode, operand=0):
+        self.code.append(opcode)
+        self.code.append(operand)
+
+    def emit_jump(self, opcode):
+        """
+        Emits a jump whose target isn't known yet, returning its offset for
+        `patch`.
+        """
+        self.emit(opcode, -1)
+        return len(self.code) - 2
+
+    def patch(self, jump_offset):
+        # the jump continues at the next instruction to be emitted
+        self.code[jump_offset + 1] = len(self.code)
+
+    def constant(self, value):
+        # bools are ints in Python, so the type is part of the key
+        key = (type(value), value)
+        if key not in self.constants:
+            self.constants[key] = len(self.constants)
+        return self.constants[key]
+
+    def compile_function(self, name, name_defs, body):
+        self.code = array('l')
+        self.constants = {}
+        self.local_indexes = {}
+        initial_locals = []
+        for name_def in name_defs + [var_dec.nameDef() for var_dec in body.varBlock().varDec()]:
+            self.local_indexes[name_def.ID().getText()] = len(initial_locals)
+            initial_locals.append(INITIAL_VALUES[name_def.TYPE().getText()])
+        self.visit(body.block())
+        self.emit(RETURN_NONE)
+        return Function(name, len(name_defs), initial_locals, self.code,
+                        [value for _, value in self.constants])
+
+    def visit(self, tree):
+        if tree in self.folded_constants:
+            self.emit(CONST, self.constant(self.folded_constants[tree]))
+        else:
+            return tree.accept(self)
+
+    def visitScript(self, ctx: ThrobacParser.ScriptContext):
+        # functions can be called before they're defined
+        for func_def in ctx.funcDef():
+            self.function_indexes[func_def.ID().getText()] = len(self.function_indexes)
+        functions = [self.compile_function(func_def.ID().getText(), func_def.nameDef(), func_def.body())
+                     for func_def in ctx.funcDef()]
+        main = self.compile_function('main', [], ctx.main().body())
+        return Program(functions, main)
+
+    def visitBlock(self, ctx: ThrobacParser.BlockContext):
+        for statement in ctx.statement():
+            self.visit(statement)
+
+    def visitAssignment(self, ctx: ThrobacParser.AssignmentContext):
+        self.visit(ctx.expr())
+        self.emit(STORE, self.local_indexes[ctx.ID().getText()])
+
+    def visitWhile(self, ctx: ThrobacParser.WhileContext):
+        start = len(self.code)
+        self.visit(ctx.expr())
+        exit_jump = self.emit_jump(JUMP_IF_FALSE)
+        self.visit(ctx.block())
+        self.emit(JUMP, start)
+        self.patch(exit_jump)
+
+    def visitIf(self, ctx: ThrobacParser.IfContext):
+        self.visit(ctx.expr())
+        else_jump = self.emit_jump(JUMP_IF_FALSE)
+        self.visit(ctx.block(0))
+        if ctx.block(1) is None:
+            self.patch(else_jump)
+        else:
+            end_jump = self.emit_jump(JUMP)
+            self.patch(else_jump)
+            self.visit(ctx.block(1))
+            self.patch(end_jump)
+
+    def visitPrintNumber(self, ctx: ThrobacParser.PrintNumberContext):
+        self.visit(ctx.expr())
+        self.emit(PRINT_NUMBER)
+
+    def visitPrintString(self, ctx: ThrobacParser.PrintStringContext):
+        self.visit(ctx.expr())
+        self.emit(PRINT_STRING)
+
+    def visitPrintBool(self, ctx: ThrobacParser.PrintBoolContext):
+        self.visit(ctx.expr())
+        self.emit(PRINT_BOOL)
+
+    def visitReturn(self, ctx: ThrobacParser.ReturnContext):
+        if ctx.expr() is None:
+            self.emit(RETURN_NONE)
+        else:
+            self.visit(ctx.expr())
+            self.emit(RETURN)
+
+    def visitFuncCallStmt(self, ctx: ThrobacParser.FuncCallStmtContext):
+        self.visit(ctx.funcCall())
+        self.emit(POP)
+
+    def visitFuncCall(self, ctx: ThrobacParser.FuncCallContext):
+        for argument in ctx.expr():
+            self.visit(argument)
+        name = ctx.ID().getText()
+        if name in BUILT_IN_OPCODES:
+            self.emit(BUILT_IN_OPCODES[name])
+        else:
+            self.emit(CALL, self.function_indexes[name])
+
+    def visitFuncCallExpr(self, ctx: ThrobacParser.FuncCallExprContext):
+        self.visit(ctx.funcCall())
+
+    def visitNumber(self, ctx: ThrobacParser.NumberContext):
+        throbac_digits = ctx.getText().strip('.').split('.')
+        self.emit(CONST, self.constant(int(''.join(DIGIT_MAP[td] for td in throbac_digits))))
+
+    def visitString(self, ctx: ThrobacParser.StringContext):
+        self.emit(CONST, self.constant(ctx.getText().strip('^').replace('+', '\n')))
+
+    def visitBool(self, ctx: ThrobacParser.BoolContext):
+        self.emit(CONST, self.constant(ctx.getText() == 'VERUM'))
+
+    def visitVariable(self, ctx: ThrobacParser.VariableContext):
+        self.emit(LOAD, self.local_indexes[ctx.getText()])
+
+    def visitParens(self, ctx: ThrobacParser.ParensContext):
+        self.visit(ctx.expr())
+
+    def visitNegation(self, ctx: ThrobacParser.NegationContext):
+        self.visit(ctx.expr())
+        self.emit(NOT if ctx.op.text == 'NI' else NEG)
+
+    def visitCompare(self, ctx: ThrobacParser.CompareContext):
+        self.visit(ctx.expr(0))
+        self.visit(ctx.expr(1))
+        self.emit(COMPARE_OPCODES[ctx.op.text])
+
+    def visitConcatenation(self, ctx: ThrobacParser.ConcatenationContext):
+        self.visit(ctx.expr(0))
+        self.visit(ctx.expr(1))
+        self.emit(CAT)
+
+    def visitAddSub(self, ctx: ThrobacParser.AddSubContext):
+        self.visit(ctx.expr(0))
+        self.visit(ctx.expr(1))
+        self.emit(ADD if ctx.op.text == 'ADDO' else SUB)
+
+    def visitMulDiv(self, ctx: ThrobacParser.MulDivContext):
+        self.visit(ctx.expr(0))
+        self.visit(ctx.expr(1))
+        self.emit(MUL if ctx.op.text == 'CONGERO' else DIV)
+
+
+def wrap(value):
+    """
+    `value` wrapped to a 32-bit signed int, as C int arithmetic does in
+    practice.
+    """
+    if -0x80000000 <= value <= 0x7fffffff:
+        return value
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def substring(string, start, length):
+    # the same checks, and messages, as substring in C/throbac.c
+    if start < 0 or length < 0:
+        raise ThrobacRuntimeError("Inputted values can't be negative.")
+    if start > len(string) - 1:
+        raise ThrobacRuntimeError('Inputted start index larger than string length.')
+    if start + length > len(string):
+        raise ThrobacRuntimeError('Inputted start index and length exceeds string length.')
+    return string[start:start + length]
+
+
+def run(program, out=None):
+    """
+    Runs a compiled `Program`, writing what it prints to `out` (by default
+    standard output).
+    """
+    write = (out or sys.stdout).write
+    functions = program.functions
+    function = program.main
+    code = function.code
+    constants = function.constants
+    local_values = list(function.initial_locals)
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    frames = []
+    pc = 0
+
+    while True:
+        opcode = code[pc]
+        operand = code[pc + 1]
+        pc += 2
+
+        # roughly in order of how often they run
+        if opcode == LOAD:
+            push(local_values[operand])
+        elif opcode == CONST:
+            push(constants[operand])
+        elif opcode == STORE:
+            local_values[operand] = pop()
+        elif opcode == JUMP_IF_FALSE:
+            if not pop():
+                pc = operand
+        elif opcode == JUMP:
+            pc = operand
+        elif opcode == ADD:
+            right = pop()
+            stack[-1] = wrap(stack[-1] + right)
+        elif opcode == SUB:
+            right = pop()
+            stack[-1] = wrap(stack[-1] - right)
+        elif opcode == LT:
+            right = pop()
+            stack[-1] = stack[-1] < right
+        elif opcode == GT:
+            right = pop()
+            stack[-1] = stack[-1] > right
+        elif opcode == EQ:
+            right = pop()
+            stack[-1] = stack[-1] == right
+        elif opcode == NE:
+            right = pop()
+            stack[-1] = stack[-1] != right
+        elif opcode == LE:
+            right = pop()
+            stack[-1] = stack[-1] <= right
+        elif opcode == GE:
+            right = pop()
+            stack[-1] = stack[-1] >= right
+        elif opcode == MUL:
+            right = pop()
+            stack[-1] = wrap(stack[-1] * right)
+        elif opcode == DIV:
+            right = pop()
+            if right == 0:
+                raise ThrobacRuntimeError('Division by zero.')
+            left = stack[-1]
+            quotient = abs(left) // abs(right)
+            stack[-1] = wrap(quotient if (left < 0) == (right < 0) else -quotient)
+        elif opcode == CAT:
+            right = pop()
+            stack[-1] = stack[-1] + right
+        elif opcode == NEG:
+            stack[-1] = wrap(-stack[-1])
+        elif opcode == NOT:
+            stack[-1] = not stack[-1]
+        elif opcode == CALL:
+            callee = functions[operand]
+            frames.append((function, pc, local_values))
+            function = callee
+            code = callee.code
+            constants = callee.constants
+            local_values = list(callee.initial_locals)
+            if callee.parameter_count:
+                local_values[:callee.parameter_count] = stack[-callee.parameter_count:]
+                del stack[-callee.parameter_count:]
+            pc = 0
+        elif opcode == RETURN or opcode == RETURN_NONE:
+            if opcode == RETURN_NONE:
+                push(None)
+            if not frames:
+                return
+            function, pc, local_values = frames.pop()
+            code = function.code
+            constants = function.constants
+        elif opcode == POP:
+            pop()
+        elif opcode == PRINT_NUMBER:
+            write(str(pop()))
+        elif opcode == PRINT_STRING:
+            write(pop())
+        elif opcode == PRINT_BOOL:
+            write('true' if pop() else 'false')
+        elif opcode == STRINGLENGTH:
+            stack[-1] = len(stack[-1])
+        elif opcode == SUBSTRING:
+            length = pop()
+            start = pop()
+            stack[-1] = substring(stack[-1], start, length)
+        else:
+            raise ThrobacRuntimeError(f'Unknown opcode {opcode} at {pc - 2} in {function.name}.')
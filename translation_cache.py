@@ -0,0 +1,166 @@
+"""
+A memoizing front end for translating Throbac to C. `translate(source, rule)`
+parses `source` from the grammar rule `rule` and walks a
+`Throbac2CTranslator` over it, the same way `bulk_translate.py` does, and
+remembers the C under a hash of the source, the rule and the translation
+options, so translating the same source again skips lexing, parsing and the
+walk.
+
+A `TranslationCache` keeps the most recently used translations in memory,
+up to `max_entries`, and can also keep every translation as a file in
+`disk_dir`, which persists across processes. The key includes a hash of the
+translator's modules, so files left by an older translator are never used.
+`translate` uses the module's `default_cache`.
+
+Sources that don't parse or type check raise as usual and aren't cached.
+
+Version: 2026-10-19
+"""
+
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+import os
+import os.path
+import threading
+
+import constant_folding
+import generic_parser
+import semantic_analysis
+import throbac2c
+from antlr4 import DispatchTableWalker
+from profiling import profiled
+from throbac.ThrobacLexer import ThrobacLexer
+from throbac.ThrobacParser import ThrobacParser
+
+DEFAULT_MAX_ENTRIES = 1024
+
+
+def translator_version():
+    """
+    A hash of the modules that determine a translation.
+    """
+    digest = hashlib.sha256()
+    for module in (throbac2c, constant_folding, semantic_analysis):
+        with open(module.__file__, 'rb') as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+
+TRANSLATOR_VERSION = translator_version()
+
+
+def translate_uncached(source, rule='script', fold=False, counted_strings=False, intern_strings=False,
+                       typed=False):
+    """
+    Translates Throbac `source` to C, parsing it from the grammar rule
+    `rule`. The options are those of `bulk_translate.py`.
+    """
+    parse_tree = generic_parser.parse(source, rule, ThrobacLexer, ThrobacParser)
+    constants = constant_folding.fold_constants(parse_tree) if fold else None
+    types = semantic_analysis.infer_types(parse_tree) if typed else None
+    translator = throbac2c.Throbac2CTranslator(constants, counted_strings, intern_strings, types)
+    with profiled('walk', rule):
+        DispatchTableWalker().walk(translator, parse_tree)
+    return translator.c_translation[parse_tree]
+
+
+@dataclass
+class CacheStatistics:
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self):
+        """
+        The fraction of lookups answered from memory or disk.
+        """
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+
+class TranslationCache:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        if disk_dir is not None:
+            os.makedirs(disk_dir, exist_ok=True)
+        # key -> C, least recently used first
+        self.entries = OrderedDict()
+        self.statistics = CacheStatistics()
+        self.lock = threading.Lock()
+
+    def key(self, source, rule, options):
+        digest = hashlib.sha256(f'{TRANSLATOR_VERSION}\0{rule}\0{options}\0'.encode())
+        digest.update(source.encode())
+        return digest.hexdigest()
+
+    def translate(self, source, rule='script', fold=False, counted_strings=False, intern_strings=False,
+                  typed=False):
+        """
+        The C for `source`, as `translate_uncached` would return it.
+        """
+        options = (fold, counted_strings, intern_strings, typed)
+        key = self.key(source, rule, options)
+        with self.lock:
+            c_text = self.entries.get(key)
+            if c_text is not None:
+                self.entries.move_to_end(key)
+                self.statistics.hits += 1
+                return c_text
+
+        c_text = self.read_disk(key)
+        if c_text is not None:
+            with self.lock:
+                self.statistics.disk_hits += 1
+        else:
+            c_text = translate_uncached(source, rule, *options)
+            self.write_disk(key, c_text)
+            with self.lock:
+                self.statistics.misses += 1
+
+        with self.lock:
+            self.entries[key] = c_text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return c_text
+
+    def read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        try:
+            with open(os.path.join(self.disk_dir, key + '.c')) as c_file:
+                return c_file.read()
+        except FileNotFoundError:
+            return None
+
+    def write_disk(self, key, c_text):
+        if self.disk_dir is None:
+            return
+        path = os.path.join(self.disk_dir, key + '.c')
+        # written under another name and renamed, so readers never see part of it
+        temporary_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as c_file:
+            c_file.write(c_text)
+        os.replace(temporary_path, path)
+
+    def clear(self):
+        """
+        Empties the memory tier and resets the statistics; files on disk stay.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.statistics = CacheStatistics()
+
+
+default_cache = TranslationCache()
+
+
+def translate(source, rule='script', fold=False, counted_strings=False, intern_strings=False, typed=False):
+    """
+    Translates Throbac `source` to C through `default_cache`.
+    """
+    return default_cache.translate(source, rule, fold, counted_strings, intern_strings, typed)
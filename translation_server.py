@@ -0,0 +1,355 @@
+"""
+A long-lived server that translates Throbac to C, so that a job doesn't pay
+for starting Python, importing the parser and warming its DFA cache. It
+speaks a small subset of HTTP/1.1, on localhost or a Unix socket:
+
+    POST /translate   {"source": "...", "rule": "script", "typed": true, "deadline_ms": 500}
+                      -> 200 {"c": "..."}, 422 {"errors": "...", "kind": "syntax" or "type"},
+                         413 when the body is over `max_body` bytes,
+                         503 when the server is too busy, 504 when the deadline passes
+    GET /stats        -> 200 with the `ServerStatistics`
+
+The options are those of `translation_cache.translate`; only "source" is
+required, and "rule" must name a rule of the grammar. The parse and walk
+run in a pool of worker processes, each of which warms the parser up on a
+generated script before taking requests and memoizes its translations with
+`translation_cache`.
+
+Requests waiting for a worker are sent to it in batches of up to
+`batch_size`, gathered over at most `batch_window` seconds, so a burst of
+small requests costs one round trip to a worker per batch. There is at
+most one batch per worker in flight; the rest wait in a queue of at most
+`max_pending` requests, and once it's full new requests are turned away
+with 503 and a Retry-After header. Each request has a deadline
+(`default_deadline`, or its own "deadline_ms"): it gets a 504 when the
+deadline passes, and a worker skips any request in its batch whose
+deadline has already passed.
+
+    python translation_server.py --port 8340 --workers 4
+    python translation_server.py --unix /tmp/throbac.sock
+
+Version: 2026-10-19
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+import json
+import os
+import time
+
+import generic_parser
+import translation_cache
+from corpus_generator import GeneratorOptions, generate
+from semantic_analysis import TypeErrors
+from throbac.ThrobacParser import ThrobacParser
+
+DEFAULT_PORT = 8340
+OPTIONS = ['fold', 'counted_strings', 'intern_strings', 'typed']
+
+DEFAULT_MAX_BODY = 16 * 1024 * 1024
+
+HTTP_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 413: 'Payload Too Large',
+                422: 'Unprocessable Entity', 500: 'Internal Server Error', 503: 'Service Unavailable',
+                504: 'Gateway Timeout'}
+
+
+# -------------------------------------------------------------------------
+# in the worker processes
+
+def warm_up():
+    """
+    Imports the translator and parses a generated script that exercises
+    most of the grammar, so the parser's DFA cache is filled before the
+    first request.
+    """
+    translation_cache.translate_uncached(''.join(generate(GeneratorOptions(functions=8, depth=3))),
+                                         typed=True)
+
+
+def ready():
+    return os.getpid()
+
+
+def translate_batch(jobs):
+    """
+    Translates each (source, rule, options, deadline) job, returning a
+    (status, body) for each: 200 and the C, 422 and the errors, or 504 if
+    its deadline passed before it was reached.
+    """
+    results = []
+    for source, rule, options, deadline in jobs:
+        if time.time() > deadline:
+            results.append((504, {'errors': 'deadline passed before translation'}))
+            continue
+        try:
+            results.append((200, {'c': translation_cache.translate(source, rule, **options)}))
+        except generic_parser.SyntaxErrors as e:
+            # SyntaxErrors only defines __repr__, as the error log
+            results.append((422, {'errors': repr(e), 'kind': 'syntax'}))
+        except TypeErrors as e:
+            results.append((422, {'errors': str(e), 'kind': 'type'}))
+        except Exception as e:
+            results.append((500, {'errors': f'{type(e).__name__}: {e}'}))
+    return results
+
+
+# -------------------------------------------------------------------------
+# in the server process
+
+class ServerBusy(Exception):
+    pass
+
+
+@dataclass
+class ServerStatistics:
+    requests: int = 0
+    translated: int = 0
+    failed: int = 0
+    rejected: int = 0
+    expired: int = 0
+    batches: int = 0
+    batched_requests: int = 0
+
+    @property
+    def mean_batch_size(self):
+        return self.batched_requests / self.batches if self.batches else 0.0
+
+
+@dataclass
+class PendingTranslation:
+    job: tuple
+    deadline: float  # time.time()
+    future: asyncio.Future
+
+
+class TranslationServer:
+
+    def __init__(self, workers=None, batch_size=16, batch_window=0.002, max_pending=1024,
+                 default_deadline=10.0, max_body=DEFAULT_MAX_BODY):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_body = max_body
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.default_deadline = default_deadline
+        self.queue = asyncio.Queue(max_pending)
+        self.statistics = ServerStatistics()
+        self.executor = None
+        self.worker_slots = None
+        self.dispatcher = None
+        self.servers = []
+
+    async def start(self):
+        """
+        Starts the worker processes, waiting until each has warmed up.
+        """
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=warm_up)
+        # one call per worker starts them all, since none is idle yet
+        await asyncio.gather(*[loop.run_in_executor(self.executor, ready) for _ in range(self.workers)])
+        self.worker_slots = asyncio.Semaphore(self.workers)
+        self.dispatcher = asyncio.create_task(self.dispatch())
+
+    async def listen(self, host='127.0.0.1', port=DEFAULT_PORT, path=None):
+        """
+        Accepts HTTP connections on `path`, a Unix socket, if it's given, or
+        else on `host` and `port`.
+        """
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle_connection, path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        self.servers.append(server)
+        return server
+
+    async def close(self):
+        for server in self.servers:
+            server.close()
+            await server.wait_closed()
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+        if self.executor is not None:
+            # waiting for the worker processes to exit would block the loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: self.executor.shutdown(cancel_futures=True))
+
+    async def translate(self, source, rule='script', deadline=None, **options):
+        """
+        The (status, body) for translating `source`, as for POST /translate.
+        `deadline` is in seconds from now.
+        """
+        self.statistics.requests += 1
+        deadline = time.time() + (deadline if deadline is not None else self.default_deadline)
+        pending = PendingTranslation((source, rule, options, deadline), deadline,
+                                     asyncio.get_running_loop().create_future())
+        try:
+            self.queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            self.statistics.rejected += 1
+            raise ServerBusy() from None
+        try:
+            status, body = await asyncio.wait_for(pending.future, max(0.0, deadline - time.time()))
+        except asyncio.TimeoutError:
+            status, body = 504, {'errors': 'deadline passed'}
+        if status == 200:
+            self.statistics.translated += 1
+        elif status == 504:
+            self.statistics.expired += 1
+        else:
+            self.statistics.failed += 1
+        return status, body
+
+    async def dispatch(self):
+        """
+        Sends the queued requests to the workers in batches.
+        """
+        while True:
+            batch = [await self.queue.get()]
+            if self.queue.empty():
+                # give a burst a moment to arrive
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            # requests whose deadline has passed are already answered
+            batch = [pending for pending in batch if not pending.future.done()]
+            if not batch:
+                continue
+            await self.worker_slots.acquire()
+            self.statistics.batches += 1
+            self.statistics.batched_requests += len(batch)
+            asyncio.create_task(self.run_batch(batch))
+
+    async def run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, translate_batch,
+                                                 [pending.job for pending in batch])
+        except Exception as e:
+            results = [(500, {'errors': f'worker failed: {type(e).__name__}: {e}'})] * len(batch)
+        finally:
+            self.worker_slots.release()
+        for pending, result in zip(batch, results):
+            if not pending.future.done():
+                pending.future.set_result(result)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader, self.max_body)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                if body is None:
+                    # the body wasn't read, so the connection can't be reused
+                    status, response, extra_headers = 413, {'errors': f'body over {self.max_body} bytes'}, {}
+                    keep_alive = False
+                else:
+                    status, response, extra_headers = await self.respond(method, target, body)
+                    keep_alive = headers.get('connection', '').lower() != 'close'
+                write_response(writer, status, response, extra_headers, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, method, target, body):
+        if method == 'GET' and target == '/stats':
+            statistics = asdict(self.statistics)
+            statistics['mean_batch_size'] = self.statistics.mean_batch_size
+            statistics['pending'] = self.queue.qsize()
+            return 200, statistics, {}
+        if method != 'POST' or target != '/translate':
+            return 404, {'errors': f'no {method} {target}'}, {}
+        try:
+            request = json.loads(body)
+            source = request['source']
+            options = {option: bool(request.get(option, False)) for option in OPTIONS}
+            deadline = request['deadline_ms'] / 1000 if 'deadline_ms' in request else None
+            rule = request.get('rule', 'script')
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'errors': f'bad request: {e}'}, {}
+        if not isinstance(source, str):
+            return 400, {'errors': 'bad request: "source" must be a string'}, {}
+        # the parser calls the method named `rule`, so it must be a grammar rule
+        if rule not in ThrobacParser.ruleNames:
+            return 400, {'errors': f'bad request: {rule!r} is not a rule of the grammar'}, {}
+        try:
+            status, response = await self.translate(source, rule, deadline, **options)
+        except ServerBusy:
+            return 503, {'errors': 'too many pending translations'}, {'Retry-After': '1'}
+        return status, response, {}
+
+
+async def read_request(reader, max_body=DEFAULT_MAX_BODY):
+    """
+    The (method, target, headers, body) of the next HTTP request, or None
+    at the end of the connection. The body is None, and isn't read, if it's
+    longer than `max_body` bytes.
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    headers = {}
+    while True:
+        line = (await reader.readline()).decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length', 0))
+    if length < 0:
+        raise ValueError(f'bad content-length {length}')
+    if length > max_body:
+        return method, target, headers, None
+    body = await reader.readexactly(length)
+    return method, target, headers, body.decode()
+
+
+def write_response(writer, status, body, extra_headers, keep_alive):
+    content = json.dumps(body).encode()
+    headers = {'Content-Type': 'application/json', 'Content-Length': str(len(content)),
+               'Connection': 'keep-alive' if keep_alive else 'close', **extra_headers}
+    head = f'HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n'
+    head += ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+    writer.write(head.encode('latin-1') + b'\r\n' + content)
+
+
+async def serve(args):
+    server = TranslationServer(args.workers, args.batch_size, args.batch_window_ms / 1000,
+                               args.max_pending, args.deadline_ms / 1000, args.max_body)
+    await server.start()
+    listener = await server.listen(args.host, args.port, args.unix)
+    where = args.unix or f'http://{args.host}:{args.port}'
+    print(f'translating on {where} with {server.workers} workers')
+    try:
+        await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='Serve Throbac to C translations.')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    arg_parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead')
+    arg_parser.add_argument('--workers', type=int, default=None,
+                            help='worker processes (by default, one per CPU)')
+    arg_parser.add_argument('--batch-size', type=int, default=16, help='the most requests per batch')
+    arg_parser.add_argument('--batch-window-ms', type=float, default=2.0,
+                            help='how long to wait for a batch to fill')
+    arg_parser.add_argument('--max-pending', type=int, default=1024,
+                            help='queued requests before new ones are turned away')
+    arg_parser.add_argument('--deadline-ms', type=float, default=10000.0,
+                            help='the deadline of requests that don\'t give one')
+    arg_parser.add_argument('--max-body', type=int, default=DEFAULT_MAX_BODY,
+                            help='the largest request body, in bytes, before 413')
+    args = arg_parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass